@@ -12,17 +12,19 @@ from PIL import Image, ImageTk
 import config
 from utils.face_recognizer_utils import (
     load_face_detector, collect_dataset, train_recognizer,
-    load_recognizer_model, load_id_mapping, save_id_mapping, get_name_for_id, save_name_for_id
+    load_recognizer_model, load_id_mapping, save_id_mapping, id_mapping_lock, get_name_for_id, save_name_for_id
 )
 from database.database_manager import (
-    load_attendance, save_attendance, summarize_checkin_checkout,
-    update_user_name_in_attendance
+    update_user_name_in_attendance, apply_attendance_mutations, clear_attendance, query_attendance, user_report,
+    archive_attendance
 )
+from database.attendance_queue import flush_attendance_queue
+from database.attendance_export import iter_record_export_chunks, filter_attendance_search, attendance_record_status
 
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
-from report_window import ReportWindow
+from report_window import ReportWindow, ExportProgress, ask_export_path
 
 class AdminFunctions:
     def __init__(self, master_root, video_label, status_label, result_label, names_dict):
@@ -238,58 +240,35 @@ class AdminFunctions:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         tree.configure(yscrollcommand=scrollbar.set)
 
+        # Bộ lọc đang hiển thị, dùng lại khi xuất dữ liệu
+        current_filters = {'search_term': "", 'start_date': None, 'end_date': None}
+
         # Hàm load_data được cập nhật để nhận tham số tìm kiếm và lọc
         def load_data(search_term="", start_date=None, end_date=None):
+            current_filters.update(search_term=search_term, start_date=start_date, end_date=end_date)
             for i in tree.get_children():
                 tree.delete(i)
             
-            df = load_attendance()
+            # Chờ các lượt chấm công đang ghi nền (nếu có) để danh sách hiển thị đầy đủ
+            flush_attendance_queue(timeout=5)
+            # Lọc theo ngày bằng tìm nhị phân trên dữ liệu đã sắp theo thời gian (không so sánh từng dòng)
+            df = query_attendance(start=start_date, end=end_date)
             
             if not df.empty:
-                df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-                if 'CheckInTime' in df.columns:
-                    df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
-                if 'CheckOutTime' in df.columns:
-                    df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
-
                 # Áp dụng tìm kiếm
-                if search_term:
-                    df = df[
-                        df['UserID'].astype(str).str.lower().str.contains(search_term) |
-                        df['Name'].astype(str).str.lower().str.contains(search_term)
-                    ]
-                
-                # Áp dụng lọc theo ngày tháng
-                if start_date:
-                    df = df[df['Timestamp'].dt.date >= start_date]
-                if end_date:
-                    df = df[df['Timestamp'].dt.date <= end_date]
+                df = filter_attendance_search(df, search_term)
 
                 df = df.sort_values(by=['UserID', 'Timestamp']).reset_index(drop=True)
+                # Mỗi dòng là một ca: trạng thái tra theo cờ vào/ra, các cột hiển thị định dạng theo cả cột
+                display_data = zip(
+                    df['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+                    df['UserID'],
+                    df['Name'],
+                    df['CheckInTime'].dt.strftime('%H:%M:%S').fillna(''),
+                    df['CheckOutTime'].dt.strftime('%H:%M:%S').fillna(''),
+                    attendance_record_status(df),
+                )
 
-                display_data = []
-                for index, row in df.iterrows():
-                    current_status = ""
-                    if row['CheckType'] == "Check-in":
-                        if pd.notna(row['CheckOutTime']):
-                            current_status = "Đã hoàn thành"
-                        else:
-                            current_status = "Đang làm việc"
-                    elif row['CheckType'] == "Check-out":
-                        if pd.notna(row['CheckInTime']): 
-                            current_status = "Đã hoàn thành"
-                        else: 
-                            current_status = "Chỉ Check-out (Không Check-in)"
-
-                    display_data.append((
-                        row['Timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                        row['UserID'],
-                        row['Name'],
-                        row['CheckInTime'].strftime('%H:%M:%S') if pd.notna(row['CheckInTime']) else '',
-                        row['CheckOutTime'].strftime('%H:%M:%S') if pd.notna(row['CheckOutTime']) else '',
-                        current_status
-                    ))
-                
                 for row_data in display_data:
                     tree.insert("", tk.END, values=row_data)
         
@@ -302,40 +281,50 @@ class AdminFunctions:
         ttk.Button(button_panel_frame, text="Làm mới", command=apply_filters).pack(pady=5, fill=tk.X) 
         ttk.Button(button_panel_frame, text="Xóa bản ghi đã chọn", command=lambda: self._delete_selected_attendance_record(tree, apply_filters)).pack(pady=5, fill=tk.X)
         ttk.Button(button_panel_frame, text="Xóa tất cả", command=lambda: self._clear_all_attendance_records(apply_filters)).pack(pady=5, fill=tk.X)
+        export_progress = ExportProgress(attendance_window)
+        ttk.Button(button_panel_frame, text="Xuất dữ liệu...", command=lambda: self._export_attendance_records(export_progress, current_filters)).pack(pady=5, fill=tk.X)
         ttk.Button(button_panel_frame, text="Đóng", command=attendance_window.destroy).pack(side=tk.BOTTOM, pady=5, fill=tk.X)
 
+    def _export_attendance_records(self, export_progress, filters):
+        """Xuất các bản ghi chấm công theo bộ lọc đang hiển thị ra Excel/CSV/Parquet (ghi theo luồng trong luồng nền)."""
+        file_path = ask_export_path("Xuất dữ liệu chấm công")
+        if not file_path:
+            return
+        filters = dict(filters)
+        export_progress.start(
+            file_path,
+            lambda: iter_record_export_chunks(filters['search_term'], filters['start_date'], filters['end_date']),
+            before_export=lambda: flush_attendance_queue(timeout=5),
+        )
+
 
     # Chuyển các hàm xóa bản ghi chấm công thành phương thức của lớp
     def _delete_selected_attendance_record(self, tree_view, refresh_func):
-        selected_item = tree_view.selection()
-        if not selected_item:
+        selected_items = tree_view.selection()
+        if not selected_items:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn một bản ghi để xóa.")
             return
 
-        if messagebox.askyesno("Xác nhận xóa", "Bạn có chắc chắn muốn xóa bản ghi này?"):
-            values = tree_view.item(selected_item, 'values')
-            timestamp_str = values[0]
-            user_id_to_delete = values[1]
-
-            df = load_attendance()
-            # Cần đảm bảo định dạng timestamp khớp với format của file và pd.to_datetime
-            timestamp_dt = pd.to_datetime(timestamp_str) # Sử dụng pd.to_datetime
-            
-            # Lọc chính xác bản ghi cần xóa
-            df_filtered = df[(df['UserID'] == user_id_to_delete) & (df['Timestamp'] == timestamp_dt)]
-            
-            if not df_filtered.empty:
-                df = df.drop(df_filtered.index)
-                save_attendance(df)
-                messagebox.showinfo("Thành công", "Đã xóa bản ghi.")
+        if messagebox.askyesno("Xác nhận xóa", f"Bạn có chắc chắn muốn xóa {len(selected_items)} bản ghi đã chọn?"):
+            records_to_delete = []
+            for item in selected_items:
+                values = tree_view.item(item, 'values')
+                timestamp_str = values[0]
+                user_id_to_delete = values[1]
+                # Cần đảm bảo định dạng timestamp khớp với format của file và pd.to_datetime
+                records_to_delete.append((user_id_to_delete, pd.to_datetime(timestamp_str)))
+
+            # Xóa chính xác các bản ghi theo (UserID, Timestamp) trong một lần ghi
+            deleted = apply_attendance_mutations(delete_records=records_to_delete)['deleted']
+            if deleted > 0:
+                messagebox.showinfo("Thành công", f"Đã xóa {deleted} bản ghi.")
                 refresh_func() # Gọi hàm refresh_func (apply_filters) để cập nhật
             else:
                 messagebox.showwarning("Lỗi", "Không tìm thấy bản ghi để xóa.")
 
     def _clear_all_attendance_records(self, refresh_func):
         if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn xóa TẤT CẢ các bản ghi chấm công?"):
-            df = pd.DataFrame(columns=['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime'])
-            save_attendance(df)
+            clear_attendance()
             messagebox.showinfo("Thành công", "Đã xóa tất cả các bản ghi chấm công.")
             refresh_func() # Gọi hàm refresh_func (apply_filters) để cập nhật
 
@@ -343,6 +332,20 @@ class AdminFunctions:
         self.stop_capture()
         ReportWindow(self.master_root) 
 
+    def archive_old_attendance(self):
+        """Chuyển các ca chấm công đã đóng cũ hơn config.ATTENDANCE_ARCHIVE_AFTER_DAYS ngày sang lưu trữ nén."""
+        days = config.ATTENDANCE_ARCHIVE_AFTER_DAYS
+        if not messagebox.askyesno("Xác nhận", f"Chuyển các bản ghi chấm công đã đóng cũ hơn {days} ngày sang lưu trữ?\n"
+                                               "Báo cáo và danh sách chấm công vẫn đọc được dữ liệu đã lưu trữ."):
+            return
+        flush_attendance_queue(timeout=5)
+        try:
+            moved = archive_attendance(days)
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể lưu trữ dữ liệu chấm công: {e}")
+            return
+        messagebox.showinfo("Lưu trữ", f"Đã chuyển {moved} bản ghi chấm công sang lưu trữ.")
+
     # --- HÀM QUẢN LÝ NGƯỜI DÙNG MỚI/CẬP NHẬT ---
     def show_user_management_window(self):
         """Hiển thị cửa sổ quản lý người dùng (thêm sửa xóa, xem ảnh)."""
@@ -480,9 +483,11 @@ class AdminFunctions:
                 # 3. Cập nhật file .name.txt
                 save_name_for_id(user_id_to_edit, new_name)
 
-                # 4. Cập nhật id_mapping.txt
-                current_id_mapping[numeric_id] = new_original_id_name
-                save_id_mapping(current_id_mapping)
+                # 4. Cập nhật id_mapping.txt (tải lại trong khóa để không ghi đè thay đổi của tiến trình khác)
+                with id_mapping_lock():
+                    current_id_mapping = load_id_mapping()
+                    current_id_mapping[numeric_id] = new_original_id_name
+                    save_id_mapping(current_id_mapping)
                 self._load_names_from_id_mapping() # Cập nhật lại self.names
 
                 # 5. Cập nhật các bản ghi chấm công
@@ -501,15 +506,16 @@ class AdminFunctions:
         edit_dialog.focus_set()
 
     def _delete_user_from_system(self, tree_view, refresh_func):
-        selected_item = tree_view.selection()
-        if not selected_item:
+        selected_items = tree_view.selection()
+        if not selected_items:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn một người dùng để xóa.")
             return
 
-        user_id_to_delete = tree_view.item(selected_item, 'values')[0]
-        user_name_to_delete = tree_view.item(selected_item, 'values')[1]
+        # Có thể chọn nhiều người dùng để xóa cùng lúc
+        users_to_delete = [tuple(tree_view.item(item, 'values')[:2]) for item in selected_items]
+        users_text = ", ".join(f"'{user_name}' (ID: {user_id})" for user_id, user_name in users_to_delete)
 
-        if not messagebox.askyesno("Xác nhận xóa", f"Bạn có chắc chắn muốn xóa '{user_name_to_delete}' (ID: {user_id_to_delete}) khỏi hệ thống?\n"
+        if not messagebox.askyesno("Xác nhận xóa", f"Bạn có chắc chắn muốn xóa {users_text} khỏi hệ thống?\n"
                                                       "Hành động này sẽ xóa:\n"
                                                       "- Ảnh khuôn mặt trong dataset\n"
                                                       "- Bản ghi tên (.name.txt)\n"
@@ -518,49 +524,51 @@ class AdminFunctions:
                 return
 
         try:
+            user_ids_to_delete = [user_id for user_id, _ in users_to_delete]
+
             # Bước 1: Xóa thư mục ảnh và file .name.txt trong dataset
-            folder_name_to_delete = None
-            for num_id, original_id_name in load_id_mapping().items(): 
-                if original_id_name.startswith(user_id_to_delete + '_'):
-                    folder_name_to_delete = original_id_name
-                    break
-            
-            if folder_name_to_delete:
-                dataset_path_to_delete = os.path.join(config.DATASET_PATH, folder_name_to_delete)
-                if os.path.exists(dataset_path_to_delete):
-                    shutil.rmtree(dataset_path_to_delete)
-                    print(f"Đã xóa thư mục dataset: {dataset_path_to_delete}")
-            else:
-                print(f"Không tìm thấy thư mục dataset cho ID: {user_id_to_delete}")
-            
-            name_file_path = os.path.join(config.DATASET_PATH, f"User.{user_id_to_delete}.name.txt")
-            if os.path.exists(name_file_path):
-                os.remove(name_file_path)
-                print(f"Đã xóa file tên: {name_file_path}")
-
-            # Bước 2: Xóa người dùng khỏi id_mapping.txt (tải lại, xóa, lưu lại)
-            current_id_mapping = load_id_mapping()
-            numeric_id_found = None
-            for num_id, original_id_name in list(current_id_mapping.items()):
-                if original_id_name.startswith(user_id_to_delete + '_'):
-                    numeric_id_found = num_id
-                    del current_id_mapping[num_id]
-                    break
-            if numeric_id_found is not None:
-                save_id_mapping(current_id_mapping)
-                print(f"Đã xóa ID {user_id_to_delete} khỏi id_mapping.")
+            id_mapping = load_id_mapping()
+            for user_id_to_delete in user_ids_to_delete:
+                folder_name_to_delete = None
+                for num_id, original_id_name in id_mapping.items(): 
+                    if original_id_name.startswith(user_id_to_delete + '_'):
+                        folder_name_to_delete = original_id_name
+                        break
+                
+                if folder_name_to_delete:
+                    dataset_path_to_delete = os.path.join(config.DATASET_PATH, folder_name_to_delete)
+                    if os.path.exists(dataset_path_to_delete):
+                        shutil.rmtree(dataset_path_to_delete)
+                        print(f"Đã xóa thư mục dataset: {dataset_path_to_delete}")
+                else:
+                    print(f"Không tìm thấy thư mục dataset cho ID: {user_id_to_delete}")
+                
+                name_file_path = os.path.join(config.DATASET_PATH, f"User.{user_id_to_delete}.name.txt")
+                if os.path.exists(name_file_path):
+                    os.remove(name_file_path)
+                    print(f"Đã xóa file tên: {name_file_path}")
+
+            # Bước 2: Xóa các người dùng khỏi id_mapping.txt (tải lại, xóa, lưu lại một lần)
+            with id_mapping_lock():
+                current_id_mapping = load_id_mapping()
+                removed_ids = []
+                for num_id, original_id_name in list(current_id_mapping.items()):
+                    if any(original_id_name.startswith(user_id + '_') for user_id in user_ids_to_delete):
+                        removed_ids.append(original_id_name)
+                        del current_id_mapping[num_id]
+                if removed_ids:
+                    save_id_mapping(current_id_mapping)
+            if removed_ids:
+                print(f"Đã xóa {', '.join(removed_ids)} khỏi id_mapping.")
             else:
-                print(f"Không tìm thấy {user_id_to_delete} trong id_mapping để xóa.")
+                print(f"Không tìm thấy {', '.join(user_ids_to_delete)} trong id_mapping để xóa.")
 
-            # Bước 3: Xóa các bản ghi chấm công của người dùng này
-            df_attendance = load_attendance()
-            initial_rows = len(df_attendance)
-            df_attendance = df_attendance[df_attendance['UserID'] != user_id_to_delete]
-            if len(df_attendance) < initial_rows:
-                save_attendance(df_attendance)
-                print(f"Đã xóa các bản ghi chấm công của {user_id_to_delete}.")
+            # Bước 3: Xóa các bản ghi chấm công của những người dùng này trong một lần ghi
+            deleted_rows = apply_attendance_mutations(delete_user_ids=user_ids_to_delete)['deleted']
+            if deleted_rows > 0:
+                print(f"Đã xóa {deleted_rows} bản ghi chấm công của {', '.join(user_ids_to_delete)}.")
 
-            messagebox.showinfo("Thành công", f"Đã xóa '{user_name_to_delete}' (ID: {user_id_to_delete}) thành công.\n"
+            messagebox.showinfo("Thành công", f"Đã xóa {users_text} thành công.\n"
                                               "Vui lòng huấn luyện lại model để thay đổi có hiệu lực.")
             refresh_func() 
             self._update_main_window_labels("Người dùng đã xóa. Cần Train lại Model.")
@@ -708,40 +716,23 @@ class AdminFunctions:
         user_id_from_tree = values[0].strip() # Lấy ID từ Treeview và loại bỏ khoảng trắng
         user_name = values[1]
 
-        df_attendance = load_attendance() # Tải toàn bộ dữ liệu chấm công
+        # Lấy UserID từ Treeview. UserID trong Treeview có dạng "ID_Name" (e.g., SS2_HoSang)
+        # Chúng ta cần lấy phần ID để lọc các bản ghi 'ID' hoặc 'ID_Tên' trong dữ liệu chấm công.
+        user_id_for_query = user_id_from_tree.split('_')[0].strip().upper()
 
-        if not df_attendance.empty:
-            df_attendance['UserID'] = df_attendance['UserID'].astype(str) # Đảm bảo cột 'UserID' là kiểu chuỗi
-            
-            # Lấy UserID từ Treeview. UserID trong Treeview có dạng "ID_Name" (e.g., SS2_HoSang)
-            # Chúng ta cần lấy phần ID số để so sánh với UserID_Extracted trong df_attendance.
-            user_id_numeric_for_comparison = user_id_from_tree.split('_')[0].strip().upper()
-
-            # Tạo một cột tạm thời 'ExtractedUserID' bằng cách cắt chuỗi 'UserID' tại dấu '_'
-            # và chuyển nó thành chữ hoa để so sánh.
-            df_attendance['ExtractedUserID'] = df_attendance['UserID'].apply(lambda x: x.split('_')[0]).str.upper()
-
-            # Lọc DataFrame dựa trên cột 'ExtractedUserID' mới tạo này
-            df_user_detailed_attendance = df_attendance[df_attendance['ExtractedUserID'] == user_id_numeric_for_comparison]
-        else:
-            df_user_detailed_attendance = pd.DataFrame() 
-
-        if df_user_detailed_attendance.empty:
-            messagebox.showinfo("Thông báo", f"Không có dữ liệu chấm công chi tiết nào cho người dùng '{user_name}' (ID: {user_id_from_tree}).")
-            return
-
-        # Sử dụng hàm summarize_checkin_checkout để tạo báo cáo tổng hợp cho người dùng này
-        df_user_summary = summarize_checkin_checkout(df_user_detailed_attendance.copy()) # Truyền bản sao để tránh cảnh báo
+        # Lấy các dòng của người dùng này qua query_attendance (chỉ mục theo người dùng + tìm nhị phân theo thời gian),
+        # báo cáo tổng hợp và chỉ số biểu đồ được tính trên đúng các dòng đó
+        flush_attendance_queue(timeout=5)
+        df_user_summary, metrics = user_report(user_id_for_query)
 
         if df_user_summary.empty:
-            messagebox.showinfo("Thông báo", f"Không có dữ liệu báo cáo tổng hợp cho người dùng '{user_name}' (ID: {user_id_from_tree}).")
+            messagebox.showinfo("Thông báo", f"Không có dữ liệu chấm công chi tiết nào cho người dùng '{user_name}' (ID: {user_id_from_tree}).")
             return
 
         # Hiển thị báo cáo trong một cửa sổ mới
-        # TRUYỀN THÊM df_user_detailed_attendance (dữ liệu chi tiết đã lọc)
-        self._display_single_user_report_window(user_name, df_user_summary, df_user_detailed_attendance)
+        self._display_single_user_report_window(user_name, df_user_summary, metrics)
 
-    def _display_single_user_report_window(self, user_name, df_summary, df_user_detailed_attendance):
+    def _display_single_user_report_window(self, user_name, df_summary, metrics):
         report_window = tk.Toplevel(self.master_root)
         report_window.title(f"Báo cáo Chấm công của {user_name}")
         report_window.geometry("1400x700") # Kích thước lớn hơn để chứa biểu đồ
@@ -794,9 +785,6 @@ class AdminFunctions:
         chart_container_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         ttk.Label(chart_container_frame, text="Biểu đồ Chấm công", font=("Arial", 14, "bold")).pack(pady=5)
 
-        # Tính toán các chỉ số cần thiết cho biểu đồ
-        metrics = self._calculate_attendance_metrics(df_user_detailed_attendance)
-
         # --- BIỂU ĐỒ 1: TỔNG GIỜ LÀM VIỆC MỖI NGÀY ---
         if not metrics['daily_work_hours'].empty:
             fig1, ax1 = plt.subplots(figsize=(6, 3)) # Kích thước biểu đồ
@@ -841,59 +829,28 @@ class AdminFunctions:
         else:
             ttk.Label(chart_container_frame, text="Không có dữ liệu đi muộn để hiển thị biểu đồ.").pack(pady=10)
 
+        # --- BIỂU ĐỒ 3: SỐ GIỜ TĂNG CA THEO NGÀY (chỉ hiện khi có tăng ca) ---
+        if not metrics['overtime_hours_by_day'].empty:
+            fig3, ax3 = plt.subplots(figsize=(6, 3))
+            metrics['overtime_hours_by_day'].plot(kind='bar', ax=ax3, color='mediumseagreen')
+            ax3.set_title('Số giờ tăng ca mỗi ngày', fontsize=10)
+            ax3.set_xlabel('Ngày', fontsize=8)
+            ax3.set_ylabel('Số giờ', fontsize=8)
+            ax3.tick_params(axis='x', rotation=45, labelsize=7)
+            ax3.tick_params(axis='y', labelsize=7)
+            plt.tight_layout()
+
+            canvas3 = FigureCanvasTkAgg(fig3, master=chart_container_frame)
+            canvas_widget3 = canvas3.get_tk_widget()
+            canvas_widget3.pack(fill=tk.BOTH, expand=True, pady=5)
+            toolbar3 = NavigationToolbar2Tk(canvas3, chart_container_frame)
+            toolbar3.update()
+            canvas_widget3.pack(pady=2)
+
         
                
 
 
     def _on_user_tree_select(self, event):
         # Phương thức này được gọi mỗi khi có sự thay đổi lựa chọn trong Treeview
-        pass 
-
-
-    def _calculate_attendance_metrics(self, df_user_attendance):
-        """Tính toán các chỉ số chấm công cần thiết cho biểu đồ."""
-        metrics = {}
-
-        df_temp = df_user_attendance.copy() 
-
-        # Chuyển đổi các cột liên quan sang kiểu datetime object
-        df_temp['Timestamp'] = pd.to_datetime(df_temp['Timestamp'], errors='coerce')
-        df_temp['CheckInTime'] = pd.to_datetime(df_temp['CheckInTime'], errors='coerce')
-        df_temp['CheckOutTime'] = pd.to_datetime(df_temp['CheckOutTime'], errors='coerce')
-
-        # Gỡ bỏ các dòng mà việc chuyển đổi datetime bị lỗi (NaT) cho các cột thiết yếu
-        df_temp.dropna(subset=['Timestamp', 'CheckInTime', 'CheckOutTime'], inplace=True)
-
-    # --- 1. Tổng giờ làm việc hàng ngày ---
-        completed_shifts = df_temp[
-            (df_temp['CheckType'] == 'Check-in') & 
-            (df_temp['CheckInTime'].notna()) & 
-            (df_temp['CheckOutTime'].notna())
-        ].copy() 
-
-        if not completed_shifts.empty:
-            completed_shifts['WorkDuration'] = completed_shifts['CheckOutTime'] - completed_shifts['CheckInTime']
-            completed_shifts['WorkDuration_minutes'] = completed_shifts['WorkDuration'].dt.total_seconds() / 60
-
-            daily_work_hours = completed_shifts.groupby(completed_shifts['Timestamp'].dt.date)['WorkDuration_minutes'].sum() / 60
-            metrics['daily_work_hours'] = daily_work_hours
-        else:
-            metrics['daily_work_hours'] = pd.Series(dtype=float) 
-
-    # --- 2. Số lần đi muộn theo ngày (ví dụ: nếu check-in sau 8:00 AM) ---
-        start_work_time_threshold = datetime.time(8, 0, 0) # Ví dụ: 8:00 AM
-
-        check_in_records = df_temp[
-            (df_temp['CheckType'] == 'Check-in') & 
-            (df_temp['CheckInTime'].notna())
-        ].copy() 
-
-        if not check_in_records.empty:
-            late_check_ins_records = check_in_records[
-                check_in_records['CheckInTime'].dt.time > start_work_time_threshold
-            ]
-            metrics['late_check_in_count_by_day'] = late_check_ins_records.groupby(late_check_ins_records['Timestamp'].dt.date).size()
-        else:
-            metrics['late_check_in_count_by_day'] = pd.Series(dtype=int) 
-
-        return metrics
\ No newline at end of file
+        pass 
\ No newline at end of file
@@ -8,14 +8,14 @@ import time
 
 # Import từ các module đã tách
 from admin.admin_functions import AdminFunctions
-from database.database_manager import load_attendance, save_attendance
+from database.database_manager import compact_attendance_journal
 from utils.face_recognizer_utils import get_name_for_id
 import config # Import config.py
 
 class AdminApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("Hệ thống nhận dạng khuôn mặt - ADMIN PANEL")
+        self.root.title("Hệ thống nhận dạng khuôn mặt - ADMIN PANEL" + (f" - Chi nhánh {config.SITE_ID}" if config.SITE_ID else ""))
         self.root.geometry("1200x800") # Kích thước cửa sổ gợi ý
 
         # Đảm bảo các thư mục cần thiết tồn tại
@@ -85,7 +85,11 @@ class AdminApp:
 
         btn_manage_users = tk.Button(admin_button_frame, text="👥 Quản lý Người dùng", command=self.admin_functions.show_user_management_window,
                                      bg="#607D8B", fg="white", font=("Helvetica", 12, "bold"), width=25, height=2)
-        btn_manage_users.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
+        btn_manage_users.grid(row=2, column=0, padx=10, pady=10)
+
+        btn_archive = tk.Button(admin_button_frame, text="🗄️ Lưu trữ dữ liệu cũ", command=self.admin_functions.archive_old_attendance,
+                                bg="#795548", fg="white", font=("Helvetica", 12, "bold"), width=25, height=2)
+        btn_archive.grid(row=2, column=1, padx=10, pady=10)
 
     def on_close(self):
         """Dừng camera và thoát ứng dụng khi đóng cửa sổ."""
@@ -93,7 +97,8 @@ class AdminApp:
             if self.admin_functions.is_capturing:
                 self.admin_functions.stop_capture()
             # Không cần stop main_functions ở đây vì AdminApp không chạy nó
-            save_attendance(load_attendance()) # Đảm bảo lưu dữ liệu cuối cùng
+            # Gộp journal vào các phân vùng tháng trước khi thoát (không ghi lại toàn bộ lịch sử và lưu trữ)
+            compact_attendance_journal()
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể lưu lịch sử chấm công: {str(e)}")
         finally:
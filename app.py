@@ -8,7 +8,8 @@ import time
 # Import từ các module đã tách
 from admin.admin_functions import AdminFunctions
 from main.main_functions import MainFunctions
-from database.database_manager import record_attendance, load_attendance, save_attendance
+from database.database_manager import compact_attendance_journal
+from database.attendance_queue import stop_attendance_queue
 from utils.face_recognizer_utils import get_name_for_id
 import config # Import config.py
 
@@ -111,7 +112,8 @@ class FaceRecognitionApp:
         """Dừng camera và thoát ứng dụng khi đóng cửa sổ."""
         try:
             self.stop_all_processes()
-            save_attendance(load_attendance()) # Đảm bảo lưu dữ liệu cuối cùng
+            stop_attendance_queue(timeout=10) # Ghi nốt các lượt chấm công còn trong hàng đợi
+            compact_attendance_journal() # Gộp journal vào các phân vùng tháng trước khi thoát
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể lưu lịch sử chấm công: {str(e)}")
         finally:
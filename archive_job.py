@@ -0,0 +1,20 @@
+# archive_job.py
+# Chuyển các ca chấm công đã đóng cũ hơn N ngày sang lưu trữ nén, để chạy định kỳ
+# (cron / Task Scheduler), ví dụ: python archive_job.py --days 90
+# Mặc định chỉ chạy cho chi nhánh config.SITE_ID; --all-sites chạy lần lượt cho mọi chi nhánh.
+import argparse
+
+import config
+from database.database_manager import archive_attendance, fan_out_sites
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lưu trữ dữ liệu chấm công cũ")
+    parser.add_argument('--days', type=int, default=config.ATTENDANCE_ARCHIVE_AFTER_DAYS,
+                        help="Chuyển các ca đã đóng cũ hơn số ngày này (mặc định theo config)")
+    parser.add_argument('--all-sites', action='store_true', help="Lưu trữ cho mọi chi nhánh trong config.SITES_DIR")
+    args = parser.parse_args()
+    if args.all_sites:
+        for site_id, moved in fan_out_sites(lambda: archive_attendance(args.days)):
+            print(f"Chi nhánh '{site_id}': {moved} dòng đã lưu trữ")
+    else:
+        archive_attendance(args.days)
@@ -0,0 +1,95 @@
+"""
+Đo tác động của lưu trữ lạnh (archive_attendance) lên các thao tác thường ngày với lịch sử dài:
+  - record:  độ trễ ghi một lượt chấm công (record_attendance_batch một lượt),
+  - startup: get_user_states() trong tiến trình mới (như _load_initial_latest_attendance của main_app),
+  - recent:  query_attendance 7 ngày gần nhất trong tiến trình mới (phải nạp dữ liệu vào cache),
+trước và sau khi chuyển các ca cũ hơn --days ngày sang lưu trữ. Mỗi phép đo startup/recent chạy trong một
+tiến trình mới (spawn) để không dùng lại cache.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_archive --rows 1000000 --history-days 730 --format parquet
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import config
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _dir_size_mb(path):
+    if not os.path.isdir(path):
+        return 0.0
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+
+def _cold_measure(result_queue, data_dir, snapshot_format):
+    """Chạy trong tiến trình mới: thời gian get_user_states() và query_attendance 7 ngày gần nhất."""
+    with benchmark_store(data_dir, snapshot_format), contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        database_manager.get_user_states()
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        rows = len(database_manager.query_attendance(start=datetime.now().date() - timedelta(days=7)))
+        recent = time.perf_counter() - start
+    result_queue.put((startup, recent, rows))
+
+def _measure(label, data_dir, snapshot_format, n_punches):
+    spawn = multiprocessing.get_context('spawn')
+    result_queue = spawn.Queue()
+    process = spawn.Process(target=_cold_measure, args=(result_queue, data_dir, snapshot_format))
+    process.start()
+    startup, recent, recent_rows = result_queue.get()
+    process.join()
+
+    latencies = []
+    # Các lượt cách nhau hơn cửa sổ bỏ trùng để lượt nào cũng được ghi
+    step = timedelta(seconds=config.ATTENDANCE_DEDUP_WINDOW_SECONDS + 1)
+    first_time = datetime.now()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n_punches):
+            check_type = "Check-in" if i % 2 == 0 else "Check-out"
+            start = time.perf_counter()
+            database_manager.record_attendance_batch([("BENCH_User", "User", check_type, first_time + i * step)])
+            latencies.append(time.perf_counter() - start)
+
+    hot_mb = _dir_size_mb(database_manager.current_store().ATTENDANCE_PARTITION_DIR)
+    archive_mb = _dir_size_mb(database_manager.current_store().ATTENDANCE_ARCHIVE_DIR)
+    print(f"{label:>8} {statistics.median(latencies) * 1000:>12.2f} {startup * 1000:>12.1f} "
+          f"{recent * 1000:>11.0f} {recent_rows:>8} {hot_mb:>8.1f} {archive_mb:>11.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lưu trữ lạnh dữ liệu chấm công")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--days', type=int, default=config.ATTENDANCE_ARCHIVE_AFTER_DAYS, help="Lưu trữ các ca cũ hơn số ngày này")
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='csv')
+    parser.add_argument('--punches', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, args.format):
+        start = pd.Timestamp(datetime.now()).normalize() - pd.Timedelta(days=args.history_days)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database_manager.save_attendance(
+                make_attendance(args.rows, n_users=args.users, days=args.history_days, start=start))
+
+        print(f"rows={args.rows} history={args.history_days} ngày format={args.format}, lưu trữ ca cũ hơn {args.days} ngày")
+        print(f"{'':>8} {'record (ms)':>12} {'startup (ms)':>12} {'recent (ms)':>11} {'k':>8} {'hot MB':>8} {'archive MB':>11}")
+        _measure('trước', data_dir, args.format, args.punches)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            moved = database_manager.archive_attendance(args.days)
+            archive_time = time.perf_counter() - start_time
+        _measure('sau', data_dir, args.format, args.punches)
+        print(f"archive_attendance: {moved} dòng, {archive_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Đo bộ nhớ và thời gian đổi dạng của dữ liệu chấm công đã nạp:
+  - object:      UserID/Name/CheckType là chuỗi Python trên từng dòng (như đọc attendance.csv với pandas < 3),
+  - string:      kiểu chuỗi mặc định của pandas khi đọc CSV (pyarrow str với pandas 3),
+  - categorical: như phân vùng parquet/feather (_typed_attendance),
+  - compact:     CompactAttendance (mã người dùng int32 + bảng phụ tên, giây epoch int64, mã CheckType int8),
+cùng thời gian to_compact / from_compact (toàn bộ và chỉ một ngày).
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.bench_compact_memory --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from database.database_manager import _typed_attendance
+from database.attendance_compact import to_compact, from_compact
+from benchmarks.synthetic_data import make_attendance
+
+def _frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ của dạng gọn CompactAttendance")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--users', type=int, default=300)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_attendance(n_rows, n_users=args.users)
+        as_object = df.astype({'UserID': object, 'Name': object, 'CheckType': object})
+        as_string = df.astype({'UserID': 'str', 'Name': 'str', 'CheckType': 'str'})
+        as_categorical = _typed_attendance(df.copy())
+        compact, to_ms = _timed(lambda: to_compact(as_string))
+        restored, from_ms = _timed(lambda: from_compact(compact))
+        one_day = np.flatnonzero(compact.frame['Timestamp'].to_numpy() // 86400 == compact.frame['Timestamp'].iat[0] // 86400)
+        _, from_day_ms = _timed(lambda: from_compact(compact, one_day))
+
+        # Đổi qua lại không mất dữ liệu
+        for col in df.columns:
+            if not restored[col].astype(object).equals(df[col].astype(object)):
+                raise SystemExit(f"Cột {col} khác sau khi đổi qua lại")
+
+        print(f"rows={n_rows} users={args.users}")
+        for label, size_mb in [('object', _frame_mb(as_object)), ('string', _frame_mb(as_string)),
+                               ('categorical', _frame_mb(as_categorical)), ('compact', compact.memory_usage() / 2**20)]:
+            print(f"  {label:>12}: {size_mb:8.1f} MB  ({size_mb * 2**20 / n_rows:5.1f} byte/dòng)")
+        print(f"  to_compact: {to_ms:.0f} ms, from_compact: {from_ms:.0f} ms (toàn bộ), "
+              f"{from_day_ms:.2f} ms ({len(one_day)} dòng một ngày)")
+
+if __name__ == "__main__":
+    main()
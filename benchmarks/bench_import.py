@@ -0,0 +1,82 @@
+"""
+Đo tốc độ nhập hàng loạt (import_attendance) từ file CSV của máy chấm công cũ:
+  - import: đọc/kiểm tra theo khối, loại trùng, ghép ca và ghi một lần (số dòng/giây trên cả file),
+  - từng lượt: ghi lần lượt qua record_attendance_batch (đường của kiosk) trên --baseline lượt đầu, quy ra dòng/giây.
+File nhập gồm --users người, mỗi ngày một lượt vào và một lượt ra, thêm ~5% lượt chạm máy lặp lại để có trùng.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_import --rows 1000000 --format parquet
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from database import database_manager
+from benchmarks.synthetic_data import benchmark_store
+
+def _make_punch_file(path, n_rows, n_users, seed=0):
+    """File CSV (EmployeeCode, PunchTime, Direction) với khoảng n_rows lượt."""
+    rng = np.random.default_rng(seed)
+    n_days = max(1, n_rows // (2 * n_users))
+    day_starts = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(n_days), unit='D')
+    users = np.repeat(np.arange(1, n_users + 1), n_days)
+    days = np.tile(day_starts.to_numpy(), n_users)
+    check_in = days + pd.to_timedelta(8 * 3600 + rng.integers(0, 3600, len(days)), unit='s').to_numpy()
+    check_out = check_in + pd.to_timedelta(rng.integers(7 * 3600, 10 * 3600, len(days)), unit='s').to_numpy()
+    repeat = rng.random(len(days)) < 0.05
+    df = pd.DataFrame({
+        'EmployeeCode': np.concatenate([users, users, users[repeat]]),
+        'PunchTime': np.concatenate([check_in, check_out, check_in[repeat] + np.timedelta64(15, 's')]),
+        'Direction': ['in'] * len(days) + ['out'] * len(days) + ['in'] * int(repeat.sum()),
+    })
+    df['EmployeeCode'] = 'NV' + df['EmployeeCode'].astype(str).str.zfill(5)
+    df['PunchTime'] = df['PunchTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    df.sample(frac=1, random_state=seed).to_csv(path, index=False)
+    return len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nhập hàng loạt dữ liệu chấm công")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='csv')
+    parser.add_argument('--baseline', type=int, default=2000, help="Số lượt ghi từng lượt để so sánh")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        punch_file = os.path.join(data_dir, 'punches.csv')
+        n_rows = _make_punch_file(punch_file, args.rows, args.users)
+        user_ids = [f'NV{u:05d}_User{u}' for u in range(1, args.users + 1)]
+
+        with benchmark_store(os.path.join(data_dir, 'store'), args.format), contextlib.redirect_stdout(io.StringIO()):
+            stats = database_manager.import_attendance(punch_file, known_user_ids=user_ids)
+            # Nhập lại cùng file: mọi lượt đều đã có
+            again = database_manager.import_attendance(punch_file, known_user_ids=user_ids)
+
+        punches = pd.read_csv(punch_file, nrows=args.baseline)
+        punches = punches.assign(PunchTime=pd.to_datetime(punches['PunchTime'])).sort_values('PunchTime')
+        with benchmark_store(os.path.join(data_dir, 'baseline'), args.format), contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for code, punch_time, direction in punches.itertuples(index=False):
+                check_type = "Check-in" if direction == 'in' else "Check-out"
+                database_manager.record_attendance_batch([(code + '_User', 'User', check_type, punch_time.to_pydatetime())])
+            baseline = len(punches) / (time.perf_counter() - start)
+
+        print(f"rows={n_rows} users={args.users} format={args.format}")
+        print(f"  import:     {stats['elapsed_seconds']:.2f}s (đọc/kiểm tra {stats['parse_seconds']:.2f}s), "
+              f"{stats['rows_per_second']:,.0f} dòng/giây -> {stats['rows_written']} dòng, "
+              f"{stats['duplicates_in_file']} lượt trùng trong file")
+        print(f"  nhập lại:   {again['elapsed_seconds']:.2f}s, {again['rows_per_second']:,.0f} dòng/giây, "
+              f"{again['duplicates_existing']} lượt đã có, {again['rows_written']} dòng ghi")
+        print(f"  từng lượt:  {baseline:,.0f} dòng/giây ({len(punches)} lượt đầu, journal + gộp theo "
+              f"JOURNAL_COMPACT_THRESHOLD={config.JOURNAL_COMPACT_THRESHOLD}); import nhanh hơn "
+              f"{stats['rows_per_second'] / baseline:,.0f} lần")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Khả năng mở rộng của báo cáo song song trên toàn bộ lịch sử theo số tiến trình:
+  - summary: summarize_attendance_parallel (tổng hợp theo người dùng),
+  - metrics: attendance_metrics_parallel (giờ làm theo ngày, số lần đi muộn).
+Mỗi số tiến trình được so với workers=1 (tính tuần tự trong tiến trình hiện tại); kết quả phải giống hệt nhau.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_parallel_report --rows 3000000 --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _same_metrics(metrics, other):
+    return all(metrics[key].index.equals(other[key].index)
+               and np.allclose(metrics[key].to_numpy(float), other[key].to_numpy(float)) for key in metrics)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark báo cáo song song theo số tiến trình")
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='parquet')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    workers_list = sorted(set([1] + args.workers))
+
+    with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, args.format):
+        with contextlib.redirect_stdout(io.StringIO()):
+            database_manager.save_attendance(make_attendance(args.rows, n_users=args.users, days=args.days))
+        database_manager.invalidate_attendance_cache()
+
+        print(f"rows={args.rows} users={args.users} days={args.days} format={args.format} cpu={os.cpu_count()}")
+        print(f"{'workers':>8} {'summary (s)':>12} {'x':>6} {'metrics (s)':>12} {'x':>6}")
+        base = None
+        for workers in workers_list:
+            summary_time, summary = _best_time(
+                lambda: database_manager.summarize_attendance_parallel(workers=workers), args.repeat)
+            metrics_time, metrics = _best_time(
+                lambda: database_manager.attendance_metrics_parallel(workers=workers), args.repeat)
+            if base is None:
+                base = (summary_time, summary, metrics_time, metrics)
+            elif not summary.equals(base[1]) or not _same_metrics(metrics, base[3]):
+                raise SystemExit(f"Kết quả với {workers} tiến trình khác với tính tuần tự")
+            print(f"{workers:>8} {summary_time:>12.2f} {base[0] / summary_time:>6.2f} "
+                  f"{metrics_time:>12.2f} {base[2] / metrics_time:>6.2f}")
+
+if __name__ == "__main__":
+    main()
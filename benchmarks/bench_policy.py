@@ -0,0 +1,93 @@
+"""
+Đi muộn / tăng ca theo (người dùng, ngày) cho cả công ty trong một năm:
+  - legacy: cách cũ, từng người dùng một (query_attendance rồi so giờ check-in với mốc 8:00 cố định), như khi mở cửa
+            sổ biểu đồ của một người; đo trên --sample người dùng rồi nhân lên cho cả công ty (cột 'legacy (ước)'),
+  - policy: attendance_policy_report trên toàn bộ công ty với bảng quy định theo nhóm/người dùng (lần đầu trong tiến
+            trình phải đọc dữ liệu vào cache, ghi riêng ở cột 'load'),
+  - metrics: attendance_metrics_chunked (biểu đồ đi muộn/tăng ca theo ngày của cả công ty, đọc luồng theo khối).
+Với quy định mặc định (8:00, không có thời gian cho phép) số (người dùng, ngày) đi muộn phải khớp cách cũ trên mẫu.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_policy --users 3000 --days 365
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from datetime import time as time_of_day
+
+import numpy as np
+import pandas as pd
+
+from database import database_manager
+from database.attendance_policy import AttendancePolicy, POLICY_COLUMNS
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _policy_table(user_ids):
+    """Ba nhóm với giờ vào ca khác nhau, mỗi người một nhóm, cộng vài người có quy định riêng."""
+    groups = pd.DataFrame({'Group': ['Kho', 'VanPhong', 'BanHang'], 'ShiftStart': ['07:00', '08:30', '09:00'],
+                           'GraceMinutes': ['5', '10', '0'], 'OvertimeAfterHours': ['8', '8', '7']})
+    users = pd.DataFrame({'UserID': user_ids, 'Group': groups['Group'].to_numpy()[np.arange(len(user_ids)) % 3]})
+    users.loc[::50, 'ShiftStart'] = '07:30'
+    return pd.concat([groups, users], ignore_index=True).reindex(columns=POLICY_COLUMNS)
+
+def _legacy_late_days(user_id):
+    """Số ngày đi muộn của một người theo cách cũ: check-in đầu tiên trong ngày sau 8:00."""
+    df_user = database_manager.query_attendance(user_id)
+    check_in = pd.to_datetime(df_user['CheckInTime']).dropna()
+    first_in = check_in.groupby(check_in.dt.date).min()
+    return int((first_in.dt.time > time_of_day(8, 0, 0)).sum())
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark đi muộn/tăng ca cho cả công ty")
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--shifts-per-day', type=float, default=0.9, help="số ca trung bình mỗi người mỗi ngày")
+    parser.add_argument('--sample', type=int, default=100, help="số người dùng đo theo cách cũ")
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='parquet')
+    args = parser.parse_args()
+    rows = int(args.users * args.days * args.shifts_per_day)
+
+    with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, args.format):
+        df = make_attendance(rows, n_users=args.users, days=args.days)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database_manager.save_attendance(df)
+        database_manager.invalidate_attendance_cache()
+        user_ids = np.sort(df['UserID'].astype(str).unique())
+        print(f"rows={rows} users={args.users} days={args.days} format={args.format}")
+
+        start = time.perf_counter()
+        database_manager.query_attendance(start=df['Timestamp'].min())
+        load_time = time.perf_counter() - start
+
+        # Quy định mặc định: so với cách cũ trên mẫu người dùng
+        sample = user_ids[np.linspace(0, len(user_ids) - 1, min(args.sample, len(user_ids))).astype(int)]
+        start = time.perf_counter()
+        legacy = {user_id: _legacy_late_days(user_id) for user_id in sample}
+        legacy_time = (time.perf_counter() - start) / len(sample) * len(user_ids)
+
+        start = time.perf_counter()
+        report = database_manager.attendance_policy_report(policy=AttendancePolicy())
+        default_time = time.perf_counter() - start
+        late_days = report[report['Late']].groupby('UserID').size()
+        if any(int(late_days.get(user_id, 0)) != count for user_id, count in legacy.items()):
+            raise SystemExit("Số ngày đi muộn theo quy định mặc định khác với cách cũ")
+
+        # Bảng quy định theo nhóm/người dùng đọc từ file
+        _policy_table(user_ids).to_csv(database_manager.current_store().ATTENDANCE_POLICY_FILE, index=False)
+        start = time.perf_counter()
+        report = database_manager.attendance_policy_report()
+        policy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        metrics = database_manager.attendance_metrics_chunked()
+        metrics_time = time.perf_counter() - start
+
+        print(f"{'load (s)':>9} {'legacy (ước, s)':>16} {'mặc định (s)':>13} {'quy định (s)':>13} {'metrics (s)':>12}")
+        print(f"{load_time:>9.2f} {legacy_time:>16.1f} {default_time:>13.2f} {policy_time:>13.2f} {metrics_time:>12.2f}")
+        print(f"(người dùng, ngày)={len(report)} đi muộn={int(report['Late'].sum())} "
+              f"tăng ca={int(report['Overtime'].sum())} ngày có biểu đồ={len(metrics['late_check_in_count_by_day'])}")
+
+if __name__ == "__main__":
+    main()
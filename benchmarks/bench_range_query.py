@@ -0,0 +1,74 @@
+"""
+So sánh truy vấn khoảng ngày (và theo người dùng) trên dữ liệu đã nạp vào bộ nhớ:
+  - mask:  cách cũ, so sánh df['Timestamp'].dt.date với ngày bắt đầu/kết thúc trên toàn bộ n dòng,
+  - query: query_attendance (tìm nhị phân searchsorted trên dữ liệu đã sắp theo thời gian, O(log n + k)).
+Lần query đầu tiên dựng chỉ mục (thời gian ghi riêng ở cột 'index'), các lần sau dùng lại.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_range_query --rows 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from datetime import timedelta
+
+
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _mask_query(df, user_id, start_date, end_date):
+    """Cách lọc cũ của giao diện admin: tạo đối tượng date cho từng dòng rồi so sánh."""
+    dates = df['Timestamp'].dt.date
+    mask = (dates >= start_date) & (dates <= end_date)
+    if user_id:
+        user_ids = df['UserID'].astype(str)
+        mask &= (user_ids == user_id) | user_ids.str.startswith(user_id + '_')
+    return df[mask]
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark truy vấn khoảng ngày: lọc bằng mask so với searchsorted")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'query':>12} {'k':>8} {'mask (ms)':>10} {'index (ms)':>11} {'query (ms)':>11} {'x':>7}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp_dir, benchmark_store(tmp_dir):
+            with contextlib.redirect_stdout(io.StringIO()):
+                database_manager.save_attendance(make_attendance(n_rows, n_users=args.users, days=args.days))
+            df = database_manager.load_attendance()
+
+            # Dựng cache + chỉ mục một lần
+            start = time.perf_counter()
+            database_manager.query_attendance(start=df['Timestamp'].min())
+            index_time = time.perf_counter() - start
+
+            first_day = df['Timestamp'].min().date()
+            cases = [
+                ('1 ngày', None, first_day + timedelta(days=args.days // 2), first_day + timedelta(days=args.days // 2)),
+                ('1 tuần', None, first_day + timedelta(days=7), first_day + timedelta(days=13)),
+                ('user+tháng', 'NV00001', first_day + timedelta(days=30), first_day + timedelta(days=59)),
+            ]
+            for label, user_id, start_date, end_date in cases:
+                mask_time, expected = _best_time(lambda: _mask_query(df, user_id, start_date, end_date), args.repeat)
+                query_time, result = _best_time(
+                    lambda: database_manager.query_attendance(user_id, start_date, end_date), args.repeat)
+                if len(result) != len(expected):
+                    raise SystemExit(f"Kết quả khác nhau ({label}): {len(result)} != {len(expected)}")
+                print(f"{n_rows:>10} {label:>12} {len(result):>8} {mask_time * 1000:>10.1f} {index_time * 1000:>11.1f} "
+                      f"{query_time * 1000:>11.2f} {mask_time / query_time:>7.0f}")
+
+if __name__ == "__main__":
+    main()
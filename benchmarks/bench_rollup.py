@@ -0,0 +1,76 @@
+"""
+So sánh giờ công theo người dùng x ngày/tuần/tháng cho cả công ty trong một quý:
+  - raw:    cách cũ, lấy các dòng của quý (query_attendance) rồi tính compute_attendance_metrics cho từng người dùng,
+  - rollup: get_work_hours từ bảng giờ công đã tổng hợp (lần đầu trong tiến trình phải đọc file bảng giờ công,
+            ghi riêng ở cột 'load').
+Cả hai cách cho cùng số giờ (được kiểm tra).
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_rollup --rows 1000000
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from database import database_manager
+from database.attendance_stats import compute_attendance_metrics
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _raw_work_hours(start_date, end_date):
+    """Giờ làm việc theo (người dùng, ngày) tính lại từ các dòng chấm công của khoảng ngày."""
+    df = database_manager.query_attendance(start=start_date, end=end_date)
+    hours = {}
+    for user_id, df_user in df.groupby(df['UserID'].astype(str), observed=True):
+        for day, value in compute_attendance_metrics(df_user)['daily_work_hours'].items():
+            hours[(user_id, day)] = value
+    return hours
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bảng giờ công tổng hợp so với tính lại từ dữ liệu chấm công")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='parquet')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, args.format):
+        df = make_attendance(args.rows, n_users=args.users, days=args.days)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database_manager.save_attendance(df)
+        start_date = (df['Timestamp'].min() + pd.Timedelta(days=args.days // 2)).date()
+        end_date = start_date + pd.Timedelta(days=90)
+        database_manager.invalidate_attendance_cache()
+
+        start = time.perf_counter()
+        database_manager.get_work_hours('day', start_date, end_date)
+        load_time = time.perf_counter() - start
+        raw_time, raw_hours = _best_time(lambda: _raw_work_hours(start_date, end_date), max(1, args.repeat // 2))
+
+        print(f"rows={args.rows} users={args.users}, một quý {start_date} -> {end_date}, format={args.format}")
+        print(f"{'kỳ':>6} {'dòng':>8} {'raw (ms)':>10} {'load (ms)':>10} {'rollup (ms)':>12} {'x':>7}")
+        for period in ['day', 'week', 'month']:
+            rollup_time, result = _best_time(
+                lambda: database_manager.get_work_hours(period, start_date, end_date), args.repeat)
+            if period == 'day':
+                got = dict(zip(zip(result['UserID'], result['Period'].dt.date), result['WorkHours']))
+                if got.keys() != raw_hours.keys() or not np.allclose([got[key] for key in raw_hours], list(raw_hours.values())):
+                    raise SystemExit("Giờ công từ bảng tổng hợp khác với tính lại từ dữ liệu")
+            print(f"{period:>6} {len(result):>8} {raw_time * 1000:>10.0f} {load_time * 1000:>10.1f} "
+                  f"{rollup_time * 1000:>12.2f} {raw_time / rollup_time:>7.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+So sánh thời gian tải dữ liệu chấm công giữa các định dạng phân vùng: csv, parquet, feather.
+
+Mỗi định dạng được ghi vào một thư mục tạm riêng, sau đó đo:
+  - tải toàn bộ (load_attendance() khi cache trong tiến trình còn trống),
+  - tải một tháng (load_attendance(start_date, end_date) chỉ mở một phân vùng).
+
+Chạy từ thư mục gốc dự án (parquet/feather cần pyarrow):
+    python -m benchmarks.bench_snapshot_load --rows 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+FORMATS = ['csv', 'parquet', 'feather']
+
+def _timed(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+def _dir_size_mb(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tải phân vùng chấm công theo định dạng")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--users', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'format':>8} {'size (MB)':>10} {'full load (s)':>14} {'one month (s)':>14}")
+    for n_rows in args.rows:
+        df = make_attendance(n_rows, n_users=args.users)
+        month_start = df['Timestamp'].min().normalize().replace(day=1)
+        month_end = month_start + pd.offsets.MonthEnd(0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for snapshot_format in FORMATS:
+                with benchmark_store(os.path.join(tmp_dir, snapshot_format), snapshot_format):
+                    _timed(database_manager.save_attendance, df)
+                    if database_manager._snapshot_format() != snapshot_format:
+                        print(f"{n_rows:>10} {snapshot_format:>8} {'(thiếu pyarrow, bỏ qua)':>40}")
+                        continue
+
+                    database_manager.invalidate_attendance_cache()
+                    loaded, full_time = _timed(database_manager.load_attendance)
+                    database_manager.invalidate_attendance_cache()
+                    _, month_time = _timed(database_manager.load_attendance, start_date=month_start, end_date=month_end)
+                    assert len(loaded) == n_rows
+                    size_mb = _dir_size_mb(database_manager.current_store().ATTENDANCE_PARTITION_DIR)
+                    print(f"{n_rows:>10} {snapshot_format:>8} {size_mb:>10.1f} {full_time:>14.3f} {month_time:>14.3f}")
+
+if __name__ == "__main__":
+    main()
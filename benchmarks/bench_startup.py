@@ -0,0 +1,74 @@
+"""
+Thời gian khởi động màn hình chính của kiosk (bảng chấm công) theo số tháng dữ liệu, sau khi tiến trình vừa mở:
+  - today:   get_today_attendance, đọc file trạng thái hôm nay (cách hiện tại),
+  - index:   get_user_states, đọc chỉ mục trạng thái người dùng (cách cũ) khi chỉ mục còn khớp dữ liệu,
+  - rebuild: get_user_states khi mất chỉ mục (cách cũ phải dựng lại từ toàn bộ lịch sử).
+Mỗi kho có --users người, mỗi ngày một ca cho tới hôm qua, và hôm nay mỗi người một lượt Check-in.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.bench_startup --months 1 6 24 60
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+def _cold_start():
+    """Bỏ mọi trạng thái trong tiến trình như khi kiosk vừa khởi động."""
+    store = database_manager.current_store()
+    store.user_state = None
+    store.user_state_key = None
+    database_manager.invalidate_attendance_cache()
+
+def _cold_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        _cold_start()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark khởi động màn hình chính theo số tháng dữ liệu")
+    parser.add_argument('--months', type=int, nargs='+', default=[1, 6, 24, 60])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='csv')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    today = date.today()
+    print(f"users={args.users} format={args.format}")
+    print(f"{'tháng':>6} {'dòng':>9} {'today (ms)':>11} {'index (ms)':>11} {'rebuild (ms)':>13}")
+    for months in args.months:
+        days = months * 30
+        with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, args.format):
+            df = make_attendance(args.users * days, n_users=args.users, days=days,
+                                 start=str(today - timedelta(days=days)))
+            morning = datetime.combine(today, datetime.min.time()) + timedelta(hours=7)
+            punches = [(user_id, name, "Check-in", morning + timedelta(seconds=i))
+                       for i, (user_id, name) in enumerate(df[['UserID', 'Name']].drop_duplicates().itertuples(index=False))]
+            with contextlib.redirect_stdout(io.StringIO()):
+                database_manager.save_attendance(df)
+                database_manager.record_attendance_batch(punches)
+
+                today_time, today_users = _cold_time(database_manager.get_today_attendance, args.repeat)
+                index_time, states = _cold_time(database_manager.get_user_states, args.repeat)
+
+                def rebuild():
+                    os.remove(database_manager.current_store().ATTENDANCE_INDEX_FILE)
+                    return database_manager.get_user_states()
+                rebuild_time, _ = _cold_time(rebuild, max(1, args.repeat // 2))
+            if len(today_users) != len(punches):
+                raise SystemExit("Trạng thái hôm nay không đủ các lượt vừa ghi")
+            print(f"{months:>6} {len(df):>9} {today_time * 1000:>11.2f} {index_time * 1000:>11.2f} "
+                  f"{rebuild_time * 1000:>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+So sánh bộ nhớ đỉnh (peak RSS) khi tính báo cáo tổng hợp + chỉ số biểu đồ trên toàn bộ lịch sử:
+  - load:   cách hiện tại, load_attendance() rồi summarize_checkin_checkout/compute_attendance_metrics,
+  - stream: đọc luồng theo khối (summarize_attendance_chunked/attendance_metrics_chunked).
+Mỗi phép đo (và cả bước sinh dữ liệu) chạy trong một tiến trình mới (spawn) để peak RSS không bị ảnh hưởng
+bởi lần đo trước; 'baseline' là tiến trình chỉ import các module (mức nền của python + pandas).
+
+Chạy từ thư mục gốc dự án (dữ liệu được sinh theo từng tháng vào thư mục tạm):
+    python -m benchmarks.bench_streaming_memory --rows 1000000 10000000 --format parquet
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import config
+from database import database_manager
+from benchmarks.synthetic_data import make_attendance, benchmark_store
+
+MODES = ['baseline', 'load', 'stream']
+
+def _peak_rss_mb():
+    """Peak RSS của tiến trình hiện tại (MB), None nếu không đo được trên hệ điều hành này."""
+    try:
+        import resource
+    except ImportError: # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _write_history(data_dir, snapshot_format, n_rows, n_users, months):
+    """Sinh n_rows dòng trải đều trên months tháng, ghi từng tháng một để không phải giữ cả lịch sử trong bộ nhớ."""
+    month_starts = pd.date_range('2023-01-01', periods=months, freq='MS')
+    with benchmark_store(data_dir, snapshot_format), contextlib.redirect_stdout(io.StringIO()):
+        os.makedirs(database_manager.current_store().ATTENDANCE_PARTITION_DIR)
+        for i, month_start in enumerate(month_starts):
+            rows = n_rows // months + (1 if i < n_rows % months else 0)
+            df_month = make_attendance(rows, n_users=n_users, days=28, seed=i, start=month_start)
+            database_manager._write_partition(month_start.strftime(database_manager.PARTITION_MONTH_FORMAT), df_month)
+
+def _measure(result_queue, data_dir, snapshot_format, mode, chunk_rows):
+    """Chạy trong tiến trình con: tính báo cáo theo mode, gửi về (số người dùng, thời gian, peak RSS MB)."""
+    start = time.perf_counter()
+    n_users = 0
+    with benchmark_store(data_dir, snapshot_format), contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'load':
+            df = database_manager.load_attendance()
+            summary = database_manager.summarize_checkin_checkout(df)
+            database_manager.compute_attendance_metrics(df)
+            n_users = len(summary)
+        elif mode == 'stream':
+            summary = database_manager.summarize_attendance_chunked(chunk_rows=chunk_rows)
+            database_manager.attendance_metrics_chunked(chunk_rows=chunk_rows)
+            n_users = len(summary)
+    result_queue.put((n_users, time.perf_counter() - start, _peak_rss_mb()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ đỉnh: tải toàn bộ so với đọc luồng theo khối")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--months', type=int, default=24, help="Số tháng lịch sử (số phân vùng)")
+    parser.add_argument('--format', choices=sorted(database_manager.PARTITION_EXTENSIONS), default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=config.ATTENDANCE_STREAM_CHUNK_ROWS)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    if _peak_rss_mb() is None:
+        raise SystemExit("Không đo được peak RSS trên hệ điều hành này (cần module resource hoặc psutil).")
+
+    # Trên Linux peak RSS của tiến trình con tính cả bộ nhớ của tiến trình cha lúc tạo nó,
+    # nên tiến trình chính không tự sinh dữ liệu
+    spawn = multiprocessing.get_context('spawn')
+    print(f"format={args.format} months={args.months} chunk_rows={args.chunk_rows}")
+    print(f"{'rows':>10} {'mode':>9} {'users':>6} {'time (s)':>9} {'peak RSS (MB)':>14}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, 'store')
+            writer = spawn.Process(
+                target=_write_history, args=(data_dir, args.format, n_rows, args.users, args.months))
+            writer.start()
+            writer.join()
+            for mode in args.modes:
+                result_queue = spawn.Queue()
+                process = spawn.Process(
+                    target=_measure, args=(result_queue, data_dir, args.format, mode, args.chunk_rows))
+                process.start()
+                process.join()
+                if process.exitcode != 0:
+                    # Thường là hết bộ nhớ (MemoryError hoặc bị hệ điều hành dừng tiến trình)
+                    print(f"{n_rows:>10} {mode:>9} {f'(lỗi, exit code {process.exitcode})':>31}")
+                    continue
+                n_users, elapsed, peak_mb = result_queue.get()
+                print(f"{n_rows:>10} {mode:>9} {n_users:>6} {elapsed:>9.2f} {peak_mb:>14.0f}")
+
+if __name__ == "__main__":
+    main()
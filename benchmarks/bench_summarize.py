@@ -0,0 +1,101 @@
+"""
+So sánh summarize_checkin_checkout (vector hóa) với cách cũ lặp iterrows theo từng người dùng.
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.bench_summarize --rows 100000 1000000 5000000
+Cách cũ chỉ chạy tới --legacy-max-rows dòng vì quá chậm với dữ liệu lớn.
+"""
+import argparse
+import contextlib
+import io
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+import config
+from database.database_manager import summarize_checkin_checkout
+from benchmarks.synthetic_data import make_attendance
+
+def legacy_summarize_checkin_checkout(df_attendance):
+    """Bản cũ của summarize_checkin_checkout (lặp theo người dùng + iterrows), giữ lại để so sánh."""
+    df = df_attendance.copy()
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+    df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
+    df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
+    df.dropna(subset=['Timestamp'], inplace=True)
+    df = df.sort_values(by=['UserID', 'Timestamp'], kind='stable')
+
+    summary_data = []
+    for user_id in df['UserID'].unique():
+        user_df = df[df['UserID'] == user_id].copy()
+        name = user_df['Name'].iloc[-1]
+        total_check_in = user_df['CheckInTime'].count()
+        total_check_out = user_df['CheckOutTime'].count()
+
+        total_work_duration = timedelta(0)
+        valid_pairs_count = 0
+        df_filtered_for_duration = user_df.dropna(subset=['CheckInTime', 'CheckOutTime'], how='all')
+        current_check_in_time = None
+        for index, row in df_filtered_for_duration.iterrows():
+            if pd.notna(row['CheckInTime']):
+                current_check_in_time = row['CheckInTime']
+            if pd.notna(row['CheckOutTime']) and current_check_in_time is not None:
+                if row['CheckOutTime'] > current_check_in_time:
+                    duration = row['CheckOutTime'] - current_check_in_time
+                    if duration <= timedelta(seconds=config.MAX_WORK_SESSION_HOURS):
+                        total_work_duration += duration
+                        valid_pairs_count += 1
+                current_check_in_time = None
+
+        avg_work_duration = total_work_duration / valid_pairs_count if valid_pairs_count > 0 else timedelta(0)
+
+        status = "Chưa có dữ liệu chấm công"
+        latest_record = user_df.iloc[-1]
+        is_check_in_recorded = pd.notna(latest_record['CheckInTime'])
+        is_check_out_recorded = pd.notna(latest_record['CheckOutTime'])
+        if is_check_in_recorded and is_check_out_recorded:
+            status = f"Đã về (Check-out lúc {latest_record['CheckOutTime'].strftime('%H:%M')})"
+        elif is_check_in_recorded and not is_check_out_recorded:
+            status = f"Đang làm việc (Check-in lúc {latest_record['CheckInTime'].strftime('%H:%M')})"
+        elif not is_check_in_recorded and is_check_out_recorded:
+            status = f"Chỉ Check-out (lúc {latest_record['CheckOutTime'].strftime('%H:%M')})"
+
+        summary_data.append({
+            'UserID': user_id,
+            'Name': name,
+            'TotalCheckIn': total_check_in,
+            'TotalCheckOut': total_check_out,
+            'AvgWorkDuration': str(avg_work_duration).split('.')[0] if valid_pairs_count > 0 else '-',
+            'Status': status,
+        })
+    return pd.DataFrame(summary_data)
+
+def _timed(func, *args):
+    # Tắt output (bản cũ in rất nhiều dòng DEBUG) để chỉ đo thời gian tính toán
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark summarize_checkin_checkout")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--legacy-max-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'vectorized (s)':>15} {'legacy (s)':>12} {'speedup':>9}  same output")
+    for n_rows in args.rows:
+        df = make_attendance(n_rows, n_users=args.users)
+        new_summary, new_time = _timed(summarize_checkin_checkout, df)
+        if n_rows <= args.legacy_max_rows:
+            old_summary, old_time = _timed(legacy_summarize_checkin_checkout, df)
+            same = new_summary.astype(str).equals(old_summary.astype(str))
+            print(f"{n_rows:>10} {new_time:>15.3f} {old_time:>12.3f} {old_time / new_time:>8.1f}x  {same}")
+        else:
+            print(f"{n_rows:>10} {new_time:>15.3f} {'-':>12} {'-':>9}  -")
+
+if __name__ == "__main__":
+    main()
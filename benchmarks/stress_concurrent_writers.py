@@ -0,0 +1,102 @@
+"""
+Kiểm tra ghi đồng thời từ nhiều tiến trình: N tiến trình "kiosk" cùng ghi lượt chấm công, đồng thời
+một tiến trình "admin" liên tục đổi tên một người dùng và gộp journal (đọc - sửa - ghi lại toàn bộ).
+Cuối cùng kiểm tra không mất dòng nào và các tổng theo người dùng vẫn khớp với dữ liệu.
+
+Chạy từ thư mục gốc dự án (dữ liệu ghi vào thư mục tạm):
+    python -m benchmarks.stress_concurrent_writers --writers 4 --punches 500
+    python -m benchmarks.stress_concurrent_writers --backend sqlite
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import database_manager
+from benchmarks.synthetic_data import benchmark_store
+
+USERS_PER_WRITER = 5
+ADMIN_USER_ID = 'ADMIN0_Admin'
+
+def _writer(data_dir, backend, writer_id, n_punches, batch_size):
+    """Ghi n_punches lượt xen kẽ Check-in/Check-out cho USERS_PER_WRITER người dùng riêng của tiến trình này."""
+    base_time = datetime(2026, 1, 1) + timedelta(days=writer_id)
+    punches = []
+    for i in range(n_punches):
+        user = i % USERS_PER_WRITER
+        round_number = i // USERS_PER_WRITER
+        check_type = "Check-in" if round_number % 2 == 0 else "Check-out"
+        punch_time = base_time + timedelta(minutes=round_number * 10, seconds=user)
+        punches.append((f"W{writer_id}U{user}_Worker", "Worker", check_type, punch_time))
+
+    with benchmark_store(data_dir, backend=backend), contextlib.redirect_stdout(io.StringIO()):
+        for start in range(0, len(punches), batch_size):
+            database_manager.record_attendance_batch(punches[start:start + batch_size])
+
+def _admin(data_dir, backend, stop_event):
+    """Mô phỏng admin: đổi tên và gộp journal liên tục trong khi các kiosk đang ghi."""
+    rounds = 0
+    with benchmark_store(data_dir, backend=backend), contextlib.redirect_stdout(io.StringIO()):
+        while not stop_event.is_set():
+            database_manager.update_user_name_in_attendance(ADMIN_USER_ID, f"Admin{rounds}")
+            database_manager.compact_attendance_journal()
+            rounds += 1
+    return rounds
+
+def _expected_rows(n_punches):
+    """Số dòng mong đợi: mỗi Check-in tạo một dòng, Check-out cập nhật dòng đang mở."""
+    rows = 0
+    for user in range(USERS_PER_WRITER):
+        user_punches = len(range(user, n_punches, USERS_PER_WRITER))
+        rows += (user_punches + 1) // 2
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test ghi đồng thời nhiều tiến trình")
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--punches', type=int, default=500, help="Số lượt chấm công mỗi tiến trình ghi")
+    parser.add_argument('--batch-size', type=int, default=1, help="Số lượt mỗi lần ghi (group commit)")
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir, benchmark_store(data_dir, backend=args.backend):
+        with contextlib.redirect_stdout(io.StringIO()):
+            database_manager.record_attendance_batch([(ADMIN_USER_ID, "Admin", "Check-in", datetime(2025, 12, 31, 8))])
+
+        stop_event = multiprocessing.Event()
+        admin = multiprocessing.Process(target=_admin, args=(data_dir, args.backend, stop_event))
+        writers = [
+            multiprocessing.Process(target=_writer, args=(data_dir, args.backend, writer_id, args.punches, args.batch_size))
+            for writer_id in range(args.writers)
+        ]
+
+        start = time.perf_counter()
+        admin.start()
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        admin.join()
+
+        failed = [process.exitcode for process in writers + [admin] if process.exitcode != 0]
+        database_manager.invalidate_attendance_cache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = database_manager.load_attendance()
+            summary_ok = database_manager.verify_attendance_summary()
+
+        expected = args.writers * _expected_rows(args.punches) + 1
+        total_punches = args.writers * args.punches
+        print(f"backend={args.backend} writers={args.writers} punches/writer={args.punches} batch={args.batch_size}")
+        print(f"  thời gian: {elapsed:.2f}s, thông lượng: {total_punches / elapsed:.0f} lượt/giây")
+        print(f"  số dòng: {len(df)} / mong đợi {expected}, tổng hợp khớp: {summary_ok}, tiến trình lỗi: {failed}")
+        if failed or len(df) != expected or not summary_ok:
+            raise SystemExit("THẤT BẠI: có dữ liệu bị mất hoặc sai lệch")
+        print("  OK: không mất dòng nào")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import contextlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+from database import database_manager
+
+ATTENDANCE_COLUMNS = ['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime']
+
+def make_attendance(n_rows, n_users=300, days=365, seed=0, start='2025-01-01'):
+    """
+    Tạo dữ liệu chấm công giả lập có cùng schema với attendance.csv.
+    Khoảng 88% dòng là ca đã đóng (check-in có CheckOutTime), 7% ca còn mở,
+    5% là check-out lẻ (không có check-in). Một phần nhỏ ca dài hơn 12 giờ.
+    """
+    rng = np.random.default_rng(seed)
+    user_codes = rng.integers(0, n_users, n_rows)
+    day = rng.integers(0, days, n_rows)
+    # Giờ vào ca quanh 8h sáng, tính bằng giây
+    start_seconds = (7 * 3600 + rng.integers(0, 3 * 3600, n_rows)).astype(np.int64)
+    timestamps = (pd.Timestamp(start).to_datetime64().astype('datetime64[s]')
+                  + (day.astype(np.int64) * 86400 + start_seconds).astype('timedelta64[s]'))
+
+    kind = rng.random(n_rows)
+    is_orphan_out = kind < 0.05
+    is_open = (kind >= 0.05) & (kind < 0.12)
+    # Ca làm 4-10 giờ, khoảng 1% ca kéo dài 13-20 giờ (vượt MAX_WORK_SESSION_HOURS)
+    work_seconds = rng.integers(4 * 3600, 10 * 3600, n_rows)
+    long_shift = rng.random(n_rows) < 0.01
+    work_seconds[long_shift] = rng.integers(13 * 3600, 20 * 3600, long_shift.sum())
+
+    check_in = timestamps.copy()
+    check_out = timestamps + work_seconds.astype('timedelta64[s]')
+    check_out[is_orphan_out] = timestamps[is_orphan_out]
+    nat = np.datetime64('NaT', 's')
+    check_in[is_orphan_out] = nat
+    check_out[is_open] = nat
+
+    # Như khi ghi thật, check-out ngay sau một ca đang mở của cùng người dùng sẽ đóng ca đó, nên check-out lẻ chỉ
+    # đứng sau dòng đã đóng: đóng các ca mở đứng ngay trước một check-out lẻ (số dòng giữ nguyên)
+    order = np.lexsort((timestamps.view(np.int64), user_codes))
+    same_user = user_codes[order][1:] == user_codes[order][:-1]
+    close = order[:-1][same_user & is_open[order][:-1] & is_orphan_out[order][1:]]
+    check_out[close] = timestamps[close] + work_seconds[close].astype('timedelta64[s]')
+
+    user_ids = np.array([f"NV{i:05d}_User{i}" for i in range(n_users)], dtype=object)
+    names = np.array([f"User{i}" for i in range(n_users)], dtype=object)
+    df = pd.DataFrame({
+        'UserID': user_ids[user_codes],
+        'Name': names[user_codes],
+        'Timestamp': timestamps,
+        'CheckType': np.where(is_orphan_out, 'Check-out', 'Check-in'),
+        'CheckInTime': check_in,
+        'CheckOutTime': check_out,
+    })
+    return df.sort_values('Timestamp', kind='stable').reset_index(drop=True)[ATTENDANCE_COLUMNS]
+
+@contextlib.contextmanager
+def benchmark_store(data_dir, snapshot_format='csv', backend='csv'):
+    """
+    Dùng data_dir (thư mục tạm của benchmark) làm kho chấm công trong khối with: data_dir được coi là thư mục dữ liệu
+    của một chi nhánh (database_manager.site_scope), nên mọi đường dẫn theo chi nhánh (config.site_path: phân vùng,
+    journal, chỉ mục, lưu trữ, outbox, SQLite, khóa...) đều nằm trong đó. Gọi lại trong tiến trình con (spawn) với
+    cùng data_dir để dùng chung kho.
+    """
+    config.STORAGE_BACKEND = backend
+    config.ATTENDANCE_SNAPSHOT_FORMAT = snapshot_format
+    data_dir = os.path.abspath(data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    sites_dir = config.SITES_DIR
+    config.SITES_DIR = os.path.dirname(data_dir)
+    try:
+        with database_manager.site_scope(os.path.basename(data_dir)):
+            database_manager.invalidate_attendance_cache()
+            try:
+                yield data_dir
+            finally:
+                # Không giữ cache của kho tạm sau khi quay lại chi nhánh trước
+                database_manager.invalidate_attendance_cache()
+    finally:
+        config.SITES_DIR = sites_dir
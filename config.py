@@ -1,22 +1,128 @@
 import os
+import socket
 import cv2 
 
 # Base directory for data (thư mục gốc của dự án )
 # Đảm bảo BASE_DIR là thư mục chứa admin_app.py, main_app.py, và các thư mục con như database, utils, v.v.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # Lấy thư mục chứa file config.py
 
+# Chi nhánh (site) của máy này. Mỗi chi nhánh có dữ liệu chấm công, dataset và model nhận diện riêng trong
+# SITES_DIR/<SITE_ID>, nên kiosk chỉ tải và ghi phần dữ liệu của chi nhánh mình. Đặt bằng biến môi trường
+# ATTENDANCE_SITE_ID (ví dụ ATTENDANCE_SITE_ID=HN python main_app.py) hoặc sửa trực tiếp ở đây.
+# Để trống = một chi nhánh như trước, mọi dữ liệu nằm ngay trong BASE_DIR.
+SITE_ID = os.environ.get("ATTENDANCE_SITE_ID", "")
+SITES_DIR = os.path.join(BASE_DIR, "sites")
+
+def site_data_dir(site_id):
+    """Thư mục dữ liệu của chi nhánh site_id ('' = BASE_DIR)."""
+    return os.path.join(SITES_DIR, site_id) if site_id else BASE_DIR
+
+def site_path(site_id, path):
+    """Đường dẫn tương ứng với `path` (một đường dẫn dữ liệu của chi nhánh hiện tại, ví dụ MODEL_FILE) ở chi nhánh site_id."""
+    return os.path.join(site_data_dir(site_id), os.path.relpath(path, DATA_DIR))
+
+# Thư mục dữ liệu của chi nhánh hiện tại: mọi đường dẫn dữ liệu bên dưới nằm trong thư mục này
+DATA_DIR = site_data_dir(SITE_ID)
+
 # Paths for dataset and trainer
-DATASET_PATH = os.path.join(BASE_DIR, "dataset")
-TRAINER_PATH = os.path.join(BASE_DIR, "trainer")
+DATASET_PATH = os.path.join(DATA_DIR, "dataset")
+TRAINER_PATH = os.path.join(DATA_DIR, "trainer")
 
 # Model file for face recognition
 MODEL_FILE = os.path.join(TRAINER_PATH, "trainer.yml")
 
 # ID mapping file
 ID_MAPPING_FILE = os.path.join(TRAINER_PATH, "id_mapping.txt")
+ID_MAPPING_LOCK_FILE = ID_MAPPING_FILE + ".lock"
+
+# Attendance CSV file (định dạng cũ một file; lần chạy đầu được tách sang ATTENDANCE_PARTITION_DIR)
+ATTENDANCE_FILE = os.path.join(DATA_DIR, "attendance.csv") 
+
+# Thư mục phân vùng dữ liệu chấm công theo tháng: attendance/YYYY-MM.csv.
+# Đọc theo khoảng ngày chỉ mở các tháng giao với khoảng đó.
+ATTENDANCE_PARTITION_DIR = os.path.join(DATA_DIR, "attendance")
+
+# Định dạng file phân vùng: "csv", hoặc "parquet"/"feather" (cần cài pyarrow) để lưu sẵn kiểu
+# datetime64/category, đọc không phải parse. Dữ liệu CSV vẫn xuất được bằng export_attendance_csv().
+ATTENDANCE_SNAPSHOT_FORMAT = "csv"
+
+# Nhật ký ghi nối (append-only journal): mỗi lượt chấm công chỉ ghi thêm một dòng vào đây,
+# các phân vùng tháng chỉ được ghi lại khi gộp (compaction)
+ATTENDANCE_JOURNAL_FILE = os.path.join(DATA_DIR, "attendance.journal.csv")
+
+# Chỉ mục trạng thái theo người dùng (ca đang mở, check-in/check-out gần nhất), cập nhật sau mỗi lượt chấm công
+ATTENDANCE_INDEX_FILE = os.path.join(DATA_DIR, "attendance.index.json")
+
+# Giờ công theo (người dùng, ngày) đã tổng hợp sẵn cho các phân vùng (các ca đóng sau lần gộp journal gần nhất được
+# cộng thêm khi đọc), để báo cáo giờ công ngày/tuần/tháng không phải quét dữ liệu chấm công
+ATTENDANCE_ROLLUP_FILE = os.path.join(DATA_DIR, "attendance.rollup.json")
+
+# Lượt Check-in/Check-out gần nhất trong ngày của từng người, cập nhật sau mỗi lượt chấm công, để màn hình chính của
+# kiosk khởi động chỉ đọc một file nhỏ thay vì dữ liệu chấm công (qua ngày mới thì coi như rỗng)
+ATTENDANCE_TODAY_FILE = os.path.join(DATA_DIR, "attendance.today.json")
 
-# Attendance CSV file
-ATTENDANCE_FILE = os.path.join(BASE_DIR, "attendance.csv") 
+# Bảng quy định giờ vào ca / đi muộn / tăng ca (CSV các cột UserID, Group, ShiftStart, GraceMinutes, OvertimeAfterHours).
+# Dòng chỉ có Group là quy định của nhóm; dòng có UserID (ghi đầy đủ 'ID_Tên' hoặc chỉ 'ID') là quy định riêng của
+# người dùng, kèm Group nếu người đó thuộc nhóm. Ô để trống lấy theo nhóm rồi theo giá trị mặc định bên dưới.
+ATTENDANCE_POLICY_FILE = os.path.join(DATA_DIR, "attendance_policy.csv")
+DEFAULT_SHIFT_START = "08:00"      # Giờ vào ca mặc định (HH:MM)
+DEFAULT_LATE_GRACE_MINUTES = 0     # Số phút được phép vào muộn
+DEFAULT_OVERTIME_AFTER_HOURS = 8   # Số giờ làm trong ngày trước khi tính tăng ca
+
+# File khóa dùng chung giữa các tiến trình (kiosk, admin) khi đọc/ghi dữ liệu chấm công
+ATTENDANCE_LOCK_FILE = os.path.join(DATA_DIR, "attendance.lock")
+
+# Số bản ghi trong journal trước khi tự động gộp vào các phân vùng tháng
+JOURNAL_COMPACT_THRESHOLD = 5000
+
+# Hàng đợi ghi nền cho lượt chấm công từ camera: số lượt tối đa đang chờ ghi,
+# thời gian (giây) gom các lượt đến gần nhau và số lượt tối đa ghi trong một lần (một fsync/transaction)
+ATTENDANCE_QUEUE_MAXSIZE = 1000
+ATTENDANCE_FLUSH_INTERVAL = 0.2
+ATTENDANCE_FLUSH_BATCH = 100
+# Một nhóm ghi lỗi được thử lại tối đa ATTENDANCE_FLUSH_MAX_RETRIES lần (cách nhau 1 giây); sau đó các lượt của nhóm
+# được thử ghi riêng từng lượt, lượt vẫn lỗi được ghi vào ATTENDANCE_DEAD_LETTER_FILE (CSV các cột UserID, Name,
+# Timestamp, CheckType, Error; nhập lại được bằng `python import_attendance.py`) để các lượt sau không bị chặn
+ATTENDANCE_FLUSH_MAX_RETRIES = 5
+ATTENDANCE_DEAD_LETTER_FILE = os.path.join(DATA_DIR, "attendance.deadletter.csv")
+
+# Lưu trữ lạnh: các ca đã đóng cũ hơn ATTENDANCE_ARCHIVE_AFTER_DAYS ngày được chuyển (archive_attendance,
+# chạy từ nút trong admin hoặc `python archive_job.py`) khỏi các phân vùng "nóng" mà kiosk ghi vào, sang các
+# phân vùng tháng nén trong ATTENDANCE_ARCHIVE_DIR. Chỉ đọc tới lưu trữ khi khoảng ngày cần đến dữ liệu cũ.
+ATTENDANCE_ARCHIVE_DIR = os.path.join(DATA_DIR, "attendance_archive")
+ATTENDANCE_ARCHIVE_AFTER_DAYS = 90
+
+# Nhập hàng loạt (import_attendance / `python import_attendance.py`): lượt cách một lượt khác của cùng người dùng
+# (trong file hoặc đã lưu) không quá số giây này được coi là trùng và bị bỏ
+IMPORT_DEDUP_WINDOW_SECONDS = 60
+
+# Đồng bộ offline-first lên kho trung tâm. CENTRAL_STORE_DIR là thư mục dự án (BASE_DIR) của máy trung tâm, thường
+# là thư mục chia sẻ mạng (khi thử nghiệm có thể là một thư mục bất kỳ trên máy); None = không đồng bộ.
+# Kiosk ghi mỗi lượt vào kho cục bộ và outbox ATTENDANCE_OUTBOX_FILE, một luồng nền gửi phần mới sau mốc
+# ATTENDANCE_SYNC_STATE_FILE mỗi SYNC_INTERVAL_SECONDS giây (tối đa SYNC_BATCH_ROWS lượt một lô) vào
+# ATTENDANCE_INBOX_DIR của chi nhánh ở kho trung tâm; máy trung tâm gộp inbox bằng `python sync_job.py --merge`.
+CENTRAL_STORE_DIR = os.environ.get("ATTENDANCE_CENTRAL_DIR") or None
+# Mã kiosk, là một phần khóa bỏ trùng (UserID, Timestamp, KioskID) khi gộp
+KIOSK_ID = os.environ.get("ATTENDANCE_KIOSK_ID") or socket.gethostname()
+ATTENDANCE_OUTBOX_FILE = os.path.join(DATA_DIR, "attendance.outbox.csv")
+ATTENDANCE_SYNC_STATE_FILE = os.path.join(DATA_DIR, "attendance.sync.json")
+ATTENDANCE_INBOX_DIR = os.path.join(DATA_DIR, "attendance_inbox")
+SYNC_INTERVAL_SECONDS = 30
+SYNC_BATCH_ROWS = 10_000
+
+# Số dòng tối đa mỗi khối khi đọc luồng lịch sử chấm công (iter_attendance_chunks) cho báo cáo bộ nhớ giới hạn
+ATTENDANCE_STREAM_CHUNK_ROWS = 100_000
+
+# Số tiến trình tính báo cáo trên toàn bộ lịch sử (summarize_attendance_parallel, attendance_metrics_parallel,
+# verify_attendance_summary): dữ liệu được chia theo phân vùng tháng (và theo băm UserID khi ít tháng hơn số tiến
+# trình), mỗi tiến trình tự đọc phần của mình. 1 = tính tuần tự trong tiến trình hiện tại, 0 = bằng số lõi CPU.
+REPORT_WORKERS = 1
+
+# Kiểu lưu trữ dữ liệu chấm công: "csv" (phân vùng tháng + journal) hoặc "sqlite"
+STORAGE_BACKEND = "csv"
+
+# File SQLite khi STORAGE_BACKEND = "sqlite" (lần đầu mở sẽ tự di chuyển dữ liệu CSV sang)
+SQLITE_DB_FILE = os.path.join(DATA_DIR, "attendance.db")
 
 # Face detection cascade classifier 
 FACE_DETECTOR_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
@@ -34,6 +140,12 @@ CHECKOUT_SOUND = os.path.join(SOUNDS_FOLDER, "checkout.mp3")
 # Thời gian cooldown (giây) giữa các lần chấm công cho cùng một người
 COOLDOWN_TIME = 10 
 
+# Lượt chấm công cùng loại (Check-in/Check-out) của cùng người dùng cách lượt cùng loại gần nhất đã lưu không quá số
+# giây này bị bỏ khi ghi (tra trong chỉ mục trạng thái người dùng của kho, nên đúng cả khi kiosk khởi động lại hay
+# nhiều camera/tiến trình cùng ghi); 0 = không bỏ trùng. Bằng COOLDOWN_TIME để lượt nào kiosk đã nhận (cách lượt
+# trước hơn COOLDOWN_TIME giây) và báo thành công cũng được ghi, không bị hàng đợi bỏ âm thầm
+ATTENDANCE_DEDUP_WINDOW_SECONDS = COOLDOWN_TIME
+
 # Số lượng ảnh mẫu để thu thập cho mỗi người
 NUM_IMAGES_TO_CAPTURE = 30 
 
@@ -0,0 +1,123 @@
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+# Dạng gọn trong bộ nhớ của dữ liệu chấm công:
+#   - mỗi dòng chỉ giữ mã người dùng (int32) trỏ vào bảng phụ (UserID, Name), thay vì lặp lại hai chuỗi trên từng dòng,
+#   - ba cột thời gian là số giây epoch int64 (NO_TIME cho ô trống), không phải đối tượng Timestamp,
+#   - CheckType là mã int8 của CheckType.
+# Chỉ dùng bên trong (cache và các đường tính báo cáo của database_manager); ra ngoài API (load_attendance,
+# query_attendance) vẫn là DataFrame chấm công quen thuộc với cột chuỗi (object) và datetime64[ns], đổi qua lại bằng
+# to_compact / from_compact.
+
+# Giá trị cho ô thời gian trống: trùng với biểu diễn int64 của NaT, nên đổi sang datetime64 chỉ là đổi kiểu
+NO_TIME = np.iinfo(np.int64).min
+# Mã CheckType khi thiếu hoặc không hợp lệ
+NO_CHECK_TYPE = -1
+
+COMPACT_TIME_COLUMNS = ['Timestamp', 'CheckInTime', 'CheckOutTime']
+
+class CheckType(IntEnum):
+    CHECK_IN = 0
+    CHECK_OUT = 1
+
+    @property
+    def label(self):
+        """Giá trị lưu trong cột CheckType ('Check-in'/'Check-out')."""
+        return CHECK_TYPE_LABELS[self]
+
+CHECK_TYPE_LABELS = {CheckType.CHECK_IN: "Check-in", CheckType.CHECK_OUT: "Check-out"}
+CHECK_TYPE_DTYPE = pd.CategoricalDtype(list(CHECK_TYPE_LABELS.values()))
+# Nhãn CheckType theo mã; phần tử cuối là None để mã NO_CHECK_TYPE (-1) ra ô trống
+_CHECK_TYPE_VALUES = np.array(list(CHECK_TYPE_LABELS.values()) + [None], dtype=object)
+
+class CompactAttendance:
+    """
+    Dữ liệu chấm công dạng gọn:
+      frame: DataFrame các cột UserCode (int32), Timestamp/CheckInTime/CheckOutTime (int64 giây epoch), CheckType (int8),
+      users: bảng phụ, index là UserCode, các cột UserID và Name (mỗi cặp (UserID, Name) khác nhau một mã).
+    """
+
+    def __init__(self, frame, users):
+        self.frame = frame
+        self.users = users
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    def memory_usage(self):
+        """Tổng số byte (tính cả chuỗi trong bảng phụ)."""
+        return int(self.frame.memory_usage(deep=True).sum() + self.users.memory_usage(deep=True).sum())
+
+def epoch_seconds(values):
+    """Cột thời gian (datetime hoặc chuỗi) -> mảng int64 số giây epoch, ô trống/lỗi -> NO_TIME. Phần lẻ dưới giây bị bỏ."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors='coerce')
+    return pd.Series(values).to_numpy(dtype='datetime64[s]').view(np.int64)
+
+def from_epoch_seconds(values):
+    """Mảng int64 số giây epoch -> datetime64[s] (NO_TIME -> NaT), không sao chép dữ liệu."""
+    return np.asarray(values, dtype=np.int64).view('datetime64[s]')
+
+def check_type_codes(values):
+    """Cột CheckType (chuỗi) -> mảng mã int8 của CheckType; giá trị khác -> NO_CHECK_TYPE."""
+    values = pd.Series(values).astype(object).to_numpy()
+    codes = np.full(len(values), NO_CHECK_TYPE, dtype=np.int8)
+    for check_type, label in CHECK_TYPE_LABELS.items():
+        codes[values == label] = check_type
+    return codes
+
+def check_type_code(check_type):
+    """Mã int8 của một CheckType (nhận CheckType/mã số hoặc nhãn 'Check-in'/'Check-out'); ValueError nếu không hợp lệ."""
+    if isinstance(check_type, str):
+        for member, label in CHECK_TYPE_LABELS.items():
+            if label == check_type:
+                return member.value
+        raise ValueError(f"Loại chấm công không hợp lệ: '{check_type}'")
+    return CheckType(check_type).value
+
+def to_compact(df):
+    """DataFrame chấm công (các cột ATTENDANCE_COLUMNS) -> CompactAttendance, giữ nguyên thứ tự dòng."""
+    user_codes, user_ids = pd.factorize(df['UserID'].astype(str))
+    name_codes, names = pd.factorize(df['Name'])
+    # Mỗi cặp (UserID, Name) một mã; name_codes = -1 (Name trống) được dời lên 0
+    pair_keys = user_codes.astype(np.int64) * (len(names) + 1) + (name_codes + 1)
+    codes, unique_keys = pd.factorize(pair_keys)
+    # Phần tử cuối là None, để vị trí -1 (Name trống) ra None
+    name_values = np.append(np.asarray(names, dtype=object), None)
+    users = pd.DataFrame({
+        'UserID': np.asarray(user_ids, dtype=object)[unique_keys // (len(names) + 1)],
+        'Name': name_values[unique_keys % (len(names) + 1) - 1],
+    }).rename_axis('UserCode')
+
+    frame = pd.DataFrame({'UserCode': codes.astype(np.int32)})
+    for col in COMPACT_TIME_COLUMNS:
+        frame[col] = epoch_seconds(df[col])
+    frame['CheckType'] = check_type_codes(df['CheckType'])
+    return CompactAttendance(frame, users)
+
+def from_compact(compact, rows=None):
+    """
+    CompactAttendance -> DataFrame chấm công như đọc từ CSV: UserID/Name/CheckType là chuỗi (object), thời gian
+    datetime64[ns] (NaT cho ô trống). rows (slice hoặc mảng vị trí) chỉ đổi các dòng đó, để lấy k dòng không phải
+    đổi cả bảng.
+    """
+    def column(col):
+        values = compact.frame[col].to_numpy()
+        return values if rows is None else values[rows]
+
+    # Tra bảng phụ theo mã: mỗi dòng nhận đối tượng chuỗi dùng chung của bảng phụ, không tạo chuỗi mới
+    codes = column('UserCode')
+    return pd.DataFrame({
+        'UserID': compact.users['UserID'].to_numpy(dtype=object)[codes],
+        'Name': compact.users['Name'].to_numpy(dtype=object)[codes],
+        'Timestamp': from_epoch_seconds(column('Timestamp')).astype('datetime64[ns]'),
+        'CheckType': _CHECK_TYPE_VALUES[column('CheckType')],
+        'CheckInTime': from_epoch_seconds(column('CheckInTime')).astype('datetime64[ns]'),
+        'CheckOutTime': from_epoch_seconds(column('CheckOutTime')).astype('datetime64[ns]'),
+    })
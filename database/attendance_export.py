@@ -0,0 +1,322 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+from database.database_manager import (
+    iter_attendance_chunks, get_attendance_summary, get_work_hours, get_user_states, TIME_FORMAT,
+    site_scope, attendance_policy_report
+)
+from database.attendance_compact import epoch_seconds
+from database.attendance_sessions import session_flags, SESSION_CLOSED, SESSION_OPEN, SESSION_CHECKOUT_ONLY
+
+# Xuất báo cáo theo luồng: dữ liệu được đọc và ghi từng khối (xlsx ở chế độ write-only, CSV, Parquet),
+# nên bộ nhớ không phụ thuộc số dòng xuất ra. Các hàm ở đây không đụng tới Tk, giao diện gọi chúng
+# trong một luồng nền và nhận tiến độ qua progress_callback.
+
+# Phần mở rộng file -> định dạng xuất
+EXPORT_FORMATS = {'.xlsx': 'xlsx', '.csv': 'csv', '.parquet': 'parquet'}
+
+# Số dòng tối đa của một sheet Excel (tính cả dòng tiêu đề); vượt quá thì ghi tiếp sang sheet mới
+XLSX_MAX_ROWS = 1_048_576
+
+# Trạng thái hiển thị của một dòng chấm công theo trạng thái ca (phần vào/ra của SessionFlag)
+RECORD_STATUS_LABELS = np.full(SESSION_CLOSED + 1, "", dtype=object)
+RECORD_STATUS_LABELS[SESSION_CLOSED] = "Đã hoàn thành"
+RECORD_STATUS_LABELS[SESSION_OPEN] = "Đang làm việc"
+RECORD_STATUS_LABELS[SESSION_CHECKOUT_ONLY] = "Chỉ Check-out (Không Check-in)"
+
+# Cột báo cáo tổng hợp khi xuất
+SUMMARY_EXPORT_COLUMNS = {
+    'UserID': 'Mã Nhân Viên',
+    'Name': 'Tên Nhân Viên',
+    'TotalCheckIn': 'Tổng số lần Check-in',
+    'TotalCheckOut': 'Tổng số lần Check-out',
+    'AvgWorkDuration': 'Thời gian làm việc trung bình',
+    'Status': 'Trạng thái chung',
+}
+
+# Cột dữ liệu chấm công chi tiết khi xuất (giống bảng trong cửa sổ Quản lý Chấm công)
+RECORD_EXPORT_COLUMNS = {
+    'Timestamp': 'Thời gian',
+    'UserID': 'Mã NV',
+    'Name': 'Tên',
+    'CheckType': 'Loại',
+    'CheckInTime': 'Check-in',
+    'CheckOutTime': 'Check-out',
+    'Status': 'Trạng thái',
+}
+
+# Cột bảng giờ công (get_work_hours) khi xuất, và tên kỳ tổng hợp hiển thị
+WORK_HOURS_EXPORT_COLUMNS = {
+    'UserID': 'Mã Nhân Viên',
+    'Name': 'Tên Nhân Viên',
+    'Period': 'Kỳ (ngày bắt đầu)',
+    'WorkHours': 'Số giờ làm việc',
+    'Sessions': 'Số ca',
+}
+WORK_HOURS_PERIODS = {'day': 'Ngày', 'week': 'Tuần', 'month': 'Tháng'}
+
+# Cột bảng đi muộn/tăng ca theo (người dùng, ngày) (attendance_policy_report) khi xuất
+POLICY_EXPORT_COLUMNS = {
+    'UserID': 'Mã Nhân Viên',
+    'Name': 'Tên Nhân Viên',
+    'Day': 'Ngày',
+    'FirstCheckIn': 'Check-in đầu tiên',
+    'ShiftStart': 'Giờ vào ca',
+    'Late': 'Đi muộn',
+    'LateMinutes': 'Số phút muộn',
+    'WorkMinutes': 'Số phút làm việc',
+    'Overtime': 'Tăng ca',
+    'OvertimeMinutes': 'Số phút tăng ca',
+}
+
+# Cột chi nhánh khi xuất báo cáo gộp nhiều chi nhánh (sites khác None)
+SITE_EXPORT_COLUMNS = {'SiteID': 'Chi nhánh'}
+
+class ExportCancelled(Exception):
+    """Lần xuất bị hủy giữa chừng (file đích không bị tạo/ghi đè)."""
+
+def export_format_for_path(file_path):
+    """Định dạng xuất theo phần mở rộng của file_path; ValueError nếu không hỗ trợ."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Không hỗ trợ xuất ra định dạng '{ext}'. Hãy chọn .xlsx, .csv hoặc .parquet.")
+    return EXPORT_FORMATS[ext]
+
+def _require_module(module, export_format):
+    if importlib.util.find_spec(module) is None:
+        raise RuntimeError(f"Xuất ra {export_format} cần cài thư viện '{module}' (pip install {module}).")
+
+def attendance_record_status(df):
+    """
+    Trạng thái hiển thị của từng dòng chấm công, giống cột 'Trạng thái' của bảng Quản lý Chấm công. Mỗi dòng là một ca
+    nên trạng thái chỉ phụ thuộc cờ vào/ra của ca (tra bảng RECORD_STATUS_LABELS theo cờ).
+    """
+    flags = session_flags(epoch_seconds(df['CheckInTime']), epoch_seconds(df['CheckOutTime']))
+    return pd.Series(RECORD_STATUS_LABELS[flags & SESSION_CLOSED], index=df.index)
+
+def filter_attendance_search(df, search_term):
+    """Lọc theo chuỗi tìm kiếm (không phân biệt hoa thường) trong UserID hoặc Name."""
+    if not search_term:
+        return df
+    search_term = search_term.lower()
+    return df[
+        df['UserID'].astype(str).str.lower().str.contains(search_term, regex=False) |
+        df['Name'].astype(str).str.lower().str.contains(search_term, regex=False)
+    ]
+
+def _export_columns(columns, sites):
+    """Cột xuất (tên gốc -> tên hiển thị), thêm cột chi nhánh ở đầu khi gộp nhiều chi nhánh."""
+    return columns if sites is None else {**SITE_EXPORT_COLUMNS, **columns}
+
+def _iter_site_frames(read, sites):
+    """
+    Bảng read() của kho hiện tại (sites None), hoặc của từng chi nhánh trong sites lần lượt với cột 'SiteID' ở đầu
+    (giống merge_site_frames): mỗi lúc chỉ giữ bảng của một chi nhánh trong bộ nhớ.
+    """
+    if sites is None:
+        yield read()
+        return
+    for site_id in sites:
+        with site_scope(site_id):
+            df = read()
+        df.insert(0, 'SiteID', site_id)
+        yield df
+
+def _iter_frame_chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def iter_summary_export_chunks(chunk_rows=None, sites=None):
+    """
+    Báo cáo tổng hợp (từ các tổng đã lưu theo người dùng) đã đổi tên cột để xuất, theo từng khối.
+    sites = danh sách chi nhánh thì đọc lần lượt báo cáo của các chi nhánh đó (thêm cột chi nhánh).
+    """
+    chunk_rows = chunk_rows or config.ATTENDANCE_STREAM_CHUNK_ROWS
+    columns = _export_columns(SUMMARY_EXPORT_COLUMNS, sites)
+    for df_summary in _iter_site_frames(get_attendance_summary, sites):
+        df_summary['AvgWorkDuration'] = df_summary['AvgWorkDuration'].apply(
+            lambda x: str(x).split(' days')[-1].strip() if pd.notna(x) else '-'
+        )
+        yield from _iter_frame_chunks(df_summary.rename(columns=columns)[list(columns.values())], chunk_rows)
+
+def _work_hours_with_names(period, start_date, end_date):
+    df_hours = get_work_hours(period, start_date, end_date)
+    names = {user_id: state['Name'] for user_id, state in get_user_states().items()}
+    df_hours['Name'] = df_hours['UserID'].map(names)
+    return df_hours
+
+def iter_work_hours_export_chunks(period='day', start_date=None, end_date=None, chunk_rows=None, sites=None):
+    """
+    Bảng giờ công theo người dùng và kỳ (ngày/tuần/tháng) đã đổi tên cột để xuất, theo từng khối.
+    sites = danh sách chi nhánh thì đọc lần lượt giờ công của các chi nhánh đó (thêm cột chi nhánh).
+    """
+    chunk_rows = chunk_rows or config.ATTENDANCE_STREAM_CHUNK_ROWS
+    columns = _export_columns(WORK_HOURS_EXPORT_COLUMNS, sites)
+    for df_hours in _iter_site_frames(lambda: _work_hours_with_names(period, start_date, end_date), sites):
+        df_hours['Period'] = pd.to_datetime(df_hours['Period']).dt.date
+        df_hours['WorkHours'] = df_hours['WorkHours'].round(2)
+        yield from _iter_frame_chunks(df_hours.rename(columns=columns)[list(columns.values())], chunk_rows)
+
+def _policy_report_with_names(start_date, end_date):
+    df_policy = attendance_policy_report(start=start_date, end=end_date)
+    names = {user_id: state['Name'] for user_id, state in get_user_states().items()}
+    df_policy['Name'] = df_policy['UserID'].map(names)
+    return df_policy
+
+def iter_policy_export_chunks(start_date=None, end_date=None, chunk_rows=None, sites=None):
+    """
+    Bảng đi muộn/tăng ca theo người dùng và ngày (theo bảng quy định của từng chi nhánh) đã đổi tên cột để xuất,
+    theo từng khối. sites = danh sách chi nhánh thì đọc lần lượt bảng của các chi nhánh đó (thêm cột chi nhánh).
+    """
+    chunk_rows = chunk_rows or config.ATTENDANCE_STREAM_CHUNK_ROWS
+    columns = _export_columns(POLICY_EXPORT_COLUMNS, sites)
+    for df_policy in _iter_site_frames(lambda: _policy_report_with_names(start_date, end_date), sites):
+        df_policy['Day'] = pd.to_datetime(df_policy['Day']).dt.date
+        df_policy['FirstCheckIn'] = pd.to_datetime(df_policy['FirstCheckIn']).dt.strftime(TIME_FORMAT)
+        for col in ('Late', 'Overtime'):
+            df_policy[col] = np.where(df_policy[col].astype(bool), "Có", "")
+        yield from _iter_frame_chunks(df_policy.rename(columns=columns)[list(columns.values())], chunk_rows)
+
+def iter_record_export_chunks(search_term="", start_date=None, end_date=None, chunk_rows=None):
+    """
+    Dữ liệu chấm công chi tiết để xuất, với cùng bộ lọc như cửa sổ Quản lý Chấm công
+    (khoảng ngày và chuỗi tìm kiếm), đọc theo khối từ iter_attendance_chunks (theo thứ tự thời gian).
+    """
+    for chunk in iter_attendance_chunks(start_date=start_date, end_date=end_date, chunk_rows=chunk_rows):
+        chunk = filter_attendance_search(chunk, search_term)
+        if chunk.empty:
+            continue
+        chunk = chunk.assign(Status=attendance_record_status(chunk))
+        yield chunk.rename(columns=RECORD_EXPORT_COLUMNS)[list(RECORD_EXPORT_COLUMNS.values())]
+
+def _plain_values(df):
+    """Bản sao của khối với các cột category đổi về giá trị thường (các khối có thể có tập category khác nhau)."""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df
+
+class _CsvExportWriter:
+    def __init__(self, path):
+        # utf-8-sig để Excel mở đúng tên tiếng Việt
+        self._file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self._header = True
+
+    def write(self, df):
+        df = _plain_values(df)
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].dt.strftime(TIME_FORMAT)
+        df.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+class _XlsxExportWriter:
+    """Ghi xlsx bằng openpyxl ở chế độ write-only: từng dòng được ghi thẳng ra file tạm, không giữ cả bảng trong bộ nhớ."""
+
+    def __init__(self, path):
+        _require_module('openpyxl', 'Excel')
+        from openpyxl import Workbook
+
+        self._path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = 0
+        self._columns = None
+
+    def _new_sheet(self):
+        index = len(self._workbook.worksheets) + 1
+        self._sheet = self._workbook.create_sheet(title="Sheet1" if index == 1 else f"Sheet{index}")
+        self._sheet.append(self._columns)
+        self._sheet_rows = 1
+
+    def write(self, df):
+        if self._columns is None:
+            self._columns = [str(col) for col in df.columns]
+            self._new_sheet()
+        df = _plain_values(df)
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                # Timestamp -> datetime của Python (NaT -> ô trống)
+                df[col] = pd.Series(df[col].dt.to_pydatetime(), index=df.index, dtype=object)
+        df = df.astype(object).where(df.notna(), None)
+        for row in df.itertuples(index=False, name=None):
+            if self._sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self._sheet.append(row)
+            self._sheet_rows += 1
+
+    def close(self):
+        if self._sheet is None:
+            self._workbook.create_sheet(title="Sheet1")
+        self._workbook.save(self._path)
+
+class _ParquetExportWriter:
+    def __init__(self, path):
+        _require_module('pyarrow', 'Parquet')
+        self._path = path
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = _plain_values(df)
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = pq.ParquetWriter(self._path, table.schema)
+        else:
+            # Mọi khối phải cùng schema với khối đầu (ví dụ cột toàn NaT ở khối sau)
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+_WRITERS = {'csv': _CsvExportWriter, 'xlsx': _XlsxExportWriter, 'parquet': _ParquetExportWriter}
+
+def export_chunks(chunks, file_path, progress_callback=None, cancel_event=None):
+    """
+    Ghi lần lượt các khối DataFrame (cùng cột) ra file_path theo định dạng của phần mở rộng.
+    Ghi vào file tạm rồi mới thay thế file đích, nên xuất hỏng/bị hủy không để lại file dở dang.
+    progress_callback(rows_written) được gọi sau mỗi khối; cancel_event (threading.Event) được kiểm tra
+    trước mỗi khối, nếu đã set thì dừng và ném ExportCancelled.
+    Trả về số dòng đã ghi; không có dòng nào thì không tạo file.
+    """
+    writer_class = _WRITERS[export_format_for_path(file_path)]
+    tmp_file = file_path + '.tmp'
+    rows_written = 0
+    writer = writer_class(tmp_file)
+    try:
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            writer.write(chunk)
+            rows_written += len(chunk)
+            if progress_callback is not None:
+                progress_callback(rows_written)
+        writer.close()
+        if rows_written == 0:
+            _remove_tmp_file(tmp_file)
+            return 0
+        os.replace(tmp_file, file_path)
+    except BaseException:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        _remove_tmp_file(tmp_file)
+        raise
+    return rows_written
+
+def _remove_tmp_file(tmp_file):
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
@@ -0,0 +1,292 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from database.attendance_compact import CheckType, CHECK_TYPE_DTYPE, NO_CHECK_TYPE, NO_TIME, from_epoch_seconds
+
+# Nhập hàng loạt lượt chấm công từ máy chấm công cũ (CSV/Excel): đọc theo khối, chuẩn hóa và kiểm tra vector hóa,
+# ánh xạ mã nhân viên bên ngoài sang UserID, loại lượt trùng và ghép check-in/check-out thành các dòng chấm công.
+# Các hàm ở đây chỉ làm việc trên mảng/DataFrame, không đụng tới kho dữ liệu; phần đọc dữ liệu đã có và
+# ghi một lần nằm ở database_manager.import_attendance.
+
+# Tên cột chấp nhận trong file nhập (so sánh không phân biệt hoa thường, bỏ khoảng trắng hai đầu)
+IMPORT_COLUMN_ALIASES = {
+    'code': ['usercode', 'userid', 'employeecode', 'employeeid', 'code', 'id', 'mã nv', 'mã nhân viên'],
+    'time': ['timestamp', 'punchtime', 'time', 'datetime', 'thời gian'],
+    'type': ['checktype', 'type', 'direction', 'inout', 'loại'],
+}
+
+# Giá trị cột loại (đã viết thường) -> CheckType; máy chấm công thường ghi 0 = vào, 1 = ra
+CHECK_TYPE_ALIASES = {
+    'check-in': CheckType.CHECK_IN, 'checkin': CheckType.CHECK_IN, 'in': CheckType.CHECK_IN,
+    'i': CheckType.CHECK_IN, '0': CheckType.CHECK_IN, 'vào': CheckType.CHECK_IN, 'vao': CheckType.CHECK_IN,
+    'check-out': CheckType.CHECK_OUT, 'checkout': CheckType.CHECK_OUT, 'out': CheckType.CHECK_OUT,
+    'o': CheckType.CHECK_OUT, '1': CheckType.CHECK_OUT, 'ra': CheckType.CHECK_OUT,
+}
+
+# Lý do loại bỏ một dòng của file nhập
+REJECT_MISSING_CODE = "Thiếu mã nhân viên"
+REJECT_UNKNOWN_CODE = "Mã nhân viên không khớp"
+REJECT_BAD_TIME = "Thời gian không hợp lệ"
+REJECT_BAD_TYPE = "Loại chấm công không hợp lệ"
+
+IMPORT_FORMATS = {'.csv': 'csv', '.xlsx': 'xlsx'}
+
+# Khóa ghép (người dùng, thời gian) thành một số int64: các người dùng cách nhau 2^40 giây nên so khoảng cách
+# thời gian trên khóa không bao giờ lẫn sang người khác
+_USER_KEY_SHIFT = 40
+
+class ImportPunches:
+    """
+    Các lượt chấm công đã chuẩn hóa (mảng song song, mỗi lượt 13 byte): user là vị trí trong danh sách UserID (int32),
+    time là giây epoch (int64), check_type là mã CheckType (int8, NO_CHECK_TYPE nếu file không ghi loại).
+    """
+
+    def __init__(self, user, time, check_type):
+        self.user = user
+        self.time = time
+        self.check_type = check_type
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def concat(cls, parts):
+        if not parts:
+            return cls(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.int8))
+        return cls(np.concatenate([p.user for p in parts]), np.concatenate([p.time for p in parts]),
+                   np.concatenate([p.check_type for p in parts]))
+
+    def take(self, positions):
+        return ImportPunches(self.user[positions], self.time[positions], self.check_type[positions])
+
+def import_format_for_path(file_path):
+    """Định dạng nhập theo phần mở rộng của file_path; ValueError nếu không hỗ trợ."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in IMPORT_FORMATS:
+        raise ValueError(f"Không hỗ trợ nhập từ định dạng '{ext}'. Hãy dùng .csv hoặc .xlsx.")
+    return IMPORT_FORMATS[ext]
+
+def _find_columns(columns):
+    """Tên cột trong file cho 'code'/'time'/'type' theo IMPORT_COLUMN_ALIASES ('type' có thể thiếu)."""
+    normalized = {str(col).strip().lower(): col for col in columns}
+    found = {}
+    for role, aliases in IMPORT_COLUMN_ALIASES.items():
+        found[role] = next((normalized[alias] for alias in aliases if alias in normalized), None)
+    missing = [role for role in ('code', 'time') if found[role] is None]
+    if missing:
+        raise ValueError(f"File nhập thiếu cột {', '.join(missing)}. Các cột có trong file: {list(columns)}")
+    return found
+
+def _iter_xlsx_chunks(file_path, chunk_rows):
+    """Đọc mọi sheet của file xlsx ở chế độ read-only (từng dòng, không nạp cả workbook), mỗi khối chunk_rows dòng."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = [str(col) if col is not None else '' for col in header]
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)])
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_import_chunks(file_path, chunk_rows):
+    """Đọc file nhập (CSV hoặc xlsx) theo từng khối DataFrame; CSV đọc mọi cột dạng chuỗi."""
+    if import_format_for_path(file_path) == 'xlsx':
+        yield from _iter_xlsx_chunks(file_path, chunk_rows)
+        return
+    yield from pd.read_csv(file_path, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunk_rows)
+
+def build_code_map(user_ids, user_map=None):
+    """
+    Bảng tra mã bên ngoài -> vị trí trong user_ids (danh sách UserID). Mỗi UserID khớp với chính nó và với phần mã
+    trước dấu '_' (ví dụ 'SS1' -> 'SS1_SangHo') nếu phần mã đó không trùng giữa nhiều người.
+    user_map (mã bên ngoài -> UserID) được ưu tiên; UserID trong user_map chưa có trong user_ids được thêm vào cuối.
+    Trả về (code_map, user_ids).
+    """
+    user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+    positions = {user_id: i for i, user_id in enumerate(user_ids)}
+    prefixes = pd.Series([user_id.split('_', 1)[0] for user_id in user_ids], dtype=object)
+    unique_prefix = ~prefixes.duplicated(keep=False)
+    code_map = {prefix: i for i, prefix in enumerate(prefixes) if unique_prefix.iat[i]}
+    code_map.update(positions)
+    for code, user_id in (user_map or {}).items():
+        user_id = str(user_id).strip()
+        if user_id not in positions:
+            positions[user_id] = len(user_ids)
+            user_ids.append(user_id)
+        code_map[str(code).strip()] = positions[user_id]
+    return code_map, user_ids
+
+def read_user_map(file_path):
+    """File ánh xạ mã (CSV hai cột: mã bên ngoài, UserID; có dòng tiêu đề) -> dict."""
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    if df.shape[1] < 2:
+        raise ValueError(f"File ánh xạ {file_path} cần hai cột: mã bên ngoài, UserID.")
+    return dict(zip(df.iloc[:, 0].str.strip(), df.iloc[:, 1].str.strip()))
+
+def _check_type_codes(values):
+    """Cột loại của file nhập -> (mã CheckType int8, NO_CHECK_TYPE nếu ô trống; mặt nạ giá trị không nhận ra)."""
+    text = values.astype(str).str.strip().str.lower()
+    empty = values.isna() | (text == '') | (text == 'none') | (text == 'nan')
+    # Excel có thể trả số 0/1 dạng float
+    text = text.str.replace(r'\.0$', '', regex=True)
+    mapped = text.map({alias: int(code) for alias, code in CHECK_TYPE_ALIASES.items()})
+    invalid = mapped.isna() & ~empty
+    return mapped.fillna(NO_CHECK_TYPE).to_numpy(dtype=np.int8), invalid.to_numpy()
+
+def _epoch_seconds(values, time_format):
+    """Cột thời gian của file nhập -> giây epoch int64 (NO_TIME nếu trống/lỗi). Mặc định nhận ISO 8601."""
+    if pd.api.types.infer_dtype(values, skipna=True) in ('datetime', 'datetime64', 'date'):
+        # Ô ngày giờ của Excel
+        values = pd.to_datetime(values, errors='coerce')
+    elif not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values.astype(str).str.strip(), format=time_format or 'ISO8601', errors='coerce')
+    return pd.Series(values).to_numpy(dtype='datetime64[s]').view(np.int64)
+
+def parse_import_chunk(chunk, code_map, rejected, time_format=None):
+    """
+    Chuẩn hóa và kiểm tra một khối của file nhập (vector hóa). Dòng lỗi bị bỏ và được đếm vào rejected
+    (dict lý do -> số dòng). Trả về ImportPunches của các dòng hợp lệ.
+    """
+    columns = _find_columns(chunk.columns)
+    codes = chunk[columns['code']].astype(str).str.strip()
+    # Excel có thể trả mã số dạng float ('101.0')
+    codes = codes.str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+    missing_code = (chunk[columns['code']].isna() | (codes == '') | (codes == 'None')).to_numpy()
+    user = codes.map(code_map)
+    unknown_code = user.isna().to_numpy() & ~missing_code
+    times = _epoch_seconds(chunk[columns['time']], time_format)
+    bad_time = times == NO_TIME
+    if columns['type'] is not None:
+        check_type, bad_type = _check_type_codes(chunk[columns['type']])
+    else:
+        check_type, bad_type = np.full(len(chunk), NO_CHECK_TYPE, dtype=np.int8), np.zeros(len(chunk), dtype=bool)
+
+    # Mỗi dòng lỗi chỉ được đếm một lần, theo lý do đầu tiên
+    invalid = np.zeros(len(chunk), dtype=bool)
+    for reason, mask in [(REJECT_MISSING_CODE, missing_code), (REJECT_UNKNOWN_CODE, unknown_code),
+                         (REJECT_BAD_TIME, bad_time), (REJECT_BAD_TYPE, bad_type)]:
+        count = int((mask & ~invalid).sum())
+        if count:
+            rejected[reason] = rejected.get(reason, 0) + count
+        invalid |= mask
+    valid = ~invalid
+    return ImportPunches(user.to_numpy()[valid].astype(np.int32), times[valid], check_type[valid])
+
+def _keys(user, time):
+    return (user.astype(np.int64) << _USER_KEY_SHIFT) + time
+
+def sort_punches(punches):
+    """Sắp xếp theo (người dùng, thời gian)."""
+    return punches.take(np.argsort(_keys(punches.user, punches.time), kind='stable'))
+
+def _keep_mask(keys, window_seconds):
+    """Mặt nạ giữ lại của các khóa đã sắp xếp: bỏ khóa cách khóa giữ lại ngay trước đó không quá window_seconds."""
+    keep = np.ones(len(keys), dtype=bool)
+    if len(keys) < 2:
+        return keep
+    gaps = np.diff(keys)
+    # Mỗi lượt sát lượt trước được so với lượt giữ lại gần nhất (lượt đầu chuỗi), không chỉ với lượt liền trước;
+    # chỉ duyệt các lượt sát nhau (thường rất ít), các lượt khác được giữ nguyên
+    last_kept = None
+    for i in np.flatnonzero(gaps <= window_seconds) + 1:
+        previous = keys[i - 1] if keep[i - 1] else last_kept
+        if keys[i] - previous <= window_seconds:
+            keep[i] = False
+            last_kept = previous
+    return keep
+
+def drop_duplicate_punches(punches, window_seconds):
+    """
+    Bỏ các lượt trong file cách lượt giữ lại ngay trước đó của cùng người dùng không quá window_seconds giây
+    (chạm máy nhiều lần, file xuất chồng lên nhau). punches phải đã sắp xếp theo sort_punches.
+    Trả về (punches còn lại, số lượt bị bỏ).
+    """
+    keep = _keep_mask(_keys(punches.user, punches.time), window_seconds)
+    if keep.all():
+        return punches, 0
+    return punches.take(keep), int((~keep).sum())
+
+def drop_repeated_punches(punches, window_seconds):
+    """
+    Như drop_duplicate_punches nhưng so theo (người dùng, loại chấm công), giống bỏ trùng khi ghi từng lượt
+    (record_attendance_batch): lượt cách lượt cùng loại giữ lại ngay trước đó không quá window_seconds giây bị bỏ.
+    Giữ nguyên thứ tự của punches. Trả về (punches còn lại, số lượt bị bỏ).
+    """
+    if not window_seconds or window_seconds <= 0:
+        return punches, 0
+    order = np.lexsort((punches.time, punches.check_type, punches.user))
+    keep = np.empty(len(punches), dtype=bool)
+    user_type = punches.user[order].astype(np.int64) * 2 + punches.check_type[order]
+    keep[order] = _keep_mask(_keys(user_type, punches.time[order]), window_seconds)
+    if keep.all():
+        return punches, 0
+    return punches.take(keep), int((~keep).sum())
+
+def drop_existing_punches(punches, existing_user, existing_time, window_seconds):
+    """
+    Bỏ các lượt cách một lượt đã có trong kho (existing_user/existing_time: mảng vị trí UserID và giây epoch của mọi
+    CheckInTime/CheckOutTime đã lưu) của cùng người dùng không quá window_seconds giây: tìm nhị phân lượt đã có gần nhất.
+    Trả về (punches còn lại, số lượt bị bỏ).
+    """
+    if len(punches) == 0 or len(existing_time) == 0:
+        return punches, 0
+    existing_keys = np.sort(_keys(existing_user, existing_time))
+    keys = _keys(punches.user, punches.time)
+    right = np.searchsorted(existing_keys, keys)
+    left = np.clip(right - 1, 0, len(existing_keys) - 1)
+    right = np.clip(right, 0, len(existing_keys) - 1)
+    nearest = np.minimum(np.abs(existing_keys[left] - keys), np.abs(existing_keys[right] - keys))
+    duplicate = nearest <= window_seconds
+    return punches.take(~duplicate), int(duplicate.sum())
+
+def pair_punches(punches, user_ids, names):
+    """
+    Ghép lượt đã sắp xếp (sort_punches) thành các dòng chấm công, theo cùng quy tắc với record_attendance:
+    check-out đóng check-in liền trước của cùng người dùng (ghi CheckOutTime vào dòng check-in), check-out không có
+    check-in liền trước thành dòng 'Check-out' riêng. Lượt không ghi loại được suy ra bằng cách xen kẽ vào/ra theo
+    thứ tự trong ngày của từng người dùng (lượt thứ nhất vào, thứ hai ra, ...).
+    names: tên theo vị trí trong user_ids. Trả về (DataFrame các cột ATTENDANCE_COLUMNS, số ca đã ghép).
+    """
+    user, time, check_type = punches.user, punches.time, punches.check_type.copy()
+    unknown = check_type == NO_CHECK_TYPE
+    if unknown.any():
+        # Thứ tự của lượt trong nhóm (người dùng, ngày): dữ liệu đã sắp xếp nên nhóm là các đoạn liền nhau
+        day_keys = _keys(user, time // 86400)
+        starts = np.r_[True, day_keys[1:] != day_keys[:-1]]
+        positions = np.arange(len(day_keys))
+        rank = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+        check_type[unknown] = np.where(rank[unknown] % 2 == 0, CheckType.CHECK_IN, CheckType.CHECK_OUT)
+
+    is_in = check_type == CheckType.CHECK_IN
+    same_user_as_prev = np.r_[False, user[1:] == user[:-1]]
+    closes_prev = ~is_in & same_user_as_prev & np.r_[False, is_in[:-1]]
+    closed_next = np.r_[closes_prev[1:], False]
+
+    rows = np.flatnonzero(is_in | ~closes_prev)
+    row_is_in = is_in[rows]
+    check_out = np.where(row_is_in, np.where(closed_next[rows], np.r_[time[1:], NO_TIME][rows], NO_TIME), time[rows])
+    user_id_dtype = pd.CategoricalDtype(user_ids)
+    df = pd.DataFrame({
+        'UserID': pd.Categorical.from_codes(user[rows], dtype=user_id_dtype),
+        'Name': pd.Categorical(np.asarray(names, dtype=object)[user[rows]]),
+        'Timestamp': from_epoch_seconds(time[rows].copy()),
+        'CheckType': pd.Categorical.from_codes(np.where(row_is_in, CheckType.CHECK_IN, CheckType.CHECK_OUT).astype(np.int8),
+                                               dtype=CHECK_TYPE_DTYPE),
+        'CheckInTime': from_epoch_seconds(np.where(row_is_in, time[rows], NO_TIME)),
+        'CheckOutTime': from_epoch_seconds(check_out),
+    })
+    return df, int(closes_prev.sum())
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+import config
+from database.attendance_compact import from_epoch_seconds
+from database.attendance_sessions import SessionFlag, SESSION_CLOSED, user_index, session_days, seconds_of_day
+
+# Quy định giờ vào ca, đi muộn và tăng ca cho cả công ty, tính vector hóa trên bảng ca (SessionTable):
+#   - bảng quy định gồm các dòng theo nhóm (chỉ có Group) và theo người dùng (có UserID, kèm Group nếu thuộc nhóm);
+#     mỗi trường để trống được lấy theo nhóm của người dùng rồi theo giá trị mặc định trong config;
+#   - mỗi (người dùng, ngày) có lượt vào ca được đánh giá một lần: đi muộn nếu lượt vào đầu tiên trong ngày sau giờ
+#     vào ca cộng thời gian cho phép, tăng ca là phần giờ làm của các ca đã đóng (tính vào ngày vào ca) vượt ngưỡng.
+# Quy định được tra một lần cho mỗi người dùng, mọi phép tính theo ca/ngày là phép tính trên mảng.
+
+# Cột của bảng quy định (file config.ATTENDANCE_POLICY_FILE): ShiftStart dạng 'HH:MM' (hoặc 'HH:MM:SS'),
+# GraceMinutes là số phút được phép vào muộn, OvertimeAfterHours là số giờ làm trong ngày trước khi tính tăng ca
+POLICY_COLUMNS = ['UserID', 'Group', 'ShiftStart', 'GraceMinutes', 'OvertimeAfterHours']
+# Các trường quy định (sau khi đổi đơn vị sang giây) lấy theo người dùng -> nhóm -> mặc định
+POLICY_FIELDS = ['ShiftStart', 'GraceSeconds', 'OvertimeSeconds']
+
+# Kết quả đánh giá: một dòng cho mỗi (người dùng, ngày) có lượt vào ca
+POLICY_REPORT_COLUMNS = ['UserID', 'Day', 'FirstCheckIn', 'ShiftStart', 'Late', 'LateMinutes', 'WorkMinutes',
+                         'Overtime', 'OvertimeMinutes']
+
+def _time_of_day_seconds(values):
+    """Chuỗi 'HH:MM' hoặc 'HH:MM:SS' -> số giây trong ngày (float, NaN nếu trống/sai)."""
+    parts = pd.Series(values, dtype=object).astype(str).str.strip().str.split(':', expand=True)
+    parts = parts.reindex(columns=range(3)).apply(pd.to_numeric, errors='coerce')
+    seconds = parts[0] * 3600 + parts[1] * 60 + parts[2].fillna(0)
+    valid = parts[0].between(0, 23) & parts[1].between(0, 59) & parts[2].fillna(0).between(0, 59)
+    return seconds.where(valid).to_numpy(dtype=float)
+
+def _format_time_of_day(seconds):
+    """Mảng số giây trong ngày -> chuỗi 'HH:MM:SS' (chỉ định dạng các giá trị khác nhau)."""
+    values, inverse = np.unique(seconds, return_inverse=True)
+    labels = np.array([f"{value // 3600:02d}:{value // 60 % 60:02d}:{value % 60:02d}" for value in values], dtype=object)
+    return labels[inverse]
+
+class AttendancePolicy:
+    """
+    Bảng quy định đã chuẩn hóa:
+      users:   DataFrame index UserID, cột Group và POLICY_FIELDS (giây, NaN = lấy theo nhóm/mặc định),
+      groups:  DataFrame index Group, cột POLICY_FIELDS (NaN = lấy theo mặc định),
+      default: dict POLICY_FIELDS -> giây.
+    """
+
+    def __init__(self, users=None, groups=None, default=None):
+        empty = pd.DataFrame(columns=POLICY_FIELDS, dtype=float)
+        self.users = users if users is not None else empty.assign(Group=pd.Series(dtype=object))
+        self.groups = groups if groups is not None else empty
+        self.default = default if default is not None else default_policy_values()
+
+    @classmethod
+    def from_table(cls, table):
+        """Tạo từ bảng quy định (DataFrame các cột POLICY_COLUMNS, giá trị dạng chuỗi/số như trong file CSV)."""
+        table = table.reindex(columns=POLICY_COLUMNS)
+        user_id = table['UserID'].astype(object).where(table['UserID'].notna(), '').astype(str).str.strip()
+        group = table['Group'].astype(object).where(table['Group'].notna(), '').astype(str).str.strip()
+        fields = pd.DataFrame({
+            'ShiftStart': _time_of_day_seconds(table['ShiftStart'].where(table['ShiftStart'].notna(), '')),
+            'GraceSeconds': pd.to_numeric(table['GraceMinutes'], errors='coerce').to_numpy(dtype=float) * 60,
+            'OvertimeSeconds': pd.to_numeric(table['OvertimeAfterHours'], errors='coerce').to_numpy(dtype=float) * 3600,
+        }, index=table.index)
+
+        is_user = user_id != ''
+        is_group = ~is_user & (group != '')
+        # Dòng ghi sau ghi đè dòng ghi trước của cùng người dùng/nhóm
+        users = fields[is_user].assign(Group=group[is_user].replace('', None)).set_index(user_id[is_user].to_numpy())
+        users = users[~users.index.duplicated(keep='last')]
+        groups = fields[is_group].set_index(group[is_group].to_numpy())
+        groups = groups[~groups.index.duplicated(keep='last')]
+        return cls(users, groups)
+
+    def resolve(self, user_ids):
+        """
+        Quy định của từng UserID trong user_ids (mảng): DataFrame các cột POLICY_FIELDS (giây, int64), cùng thứ tự.
+        UserID dạng 'ID_Tên' khớp cả dòng quy định ghi UserID đầy đủ lẫn dòng chỉ ghi 'ID'.
+        """
+        user_ids = pd.Index(pd.Series(user_ids, dtype=object).astype(str))
+        short_ids = pd.Index(user_ids.str.split('_', n=1).str[0])
+        # Dòng ghi đúng UserID ưu tiên hơn dòng chỉ ghi phần mã trước '_'
+        own = self.users.reindex(user_ids).set_axis(user_ids)
+        own = own.fillna(self.users.reindex(short_ids).set_axis(user_ids))
+        group_rules = self.groups.reindex(own['Group'].to_numpy()).set_axis(user_ids)
+        resolved = pd.DataFrame(index=user_ids)
+        for field in POLICY_FIELDS:
+            resolved[field] = own[field].fillna(group_rules[field]).fillna(self.default[field]).astype(np.int64)
+        return resolved
+
+def default_policy_values():
+    """Quy định mặc định từ config (giờ vào ca, số phút cho phép vào muộn, số giờ trước khi tính tăng ca)."""
+    return {
+        'ShiftStart': int(_time_of_day_seconds([config.DEFAULT_SHIFT_START])[0]),
+        'GraceSeconds': int(config.DEFAULT_LATE_GRACE_MINUTES * 60),
+        'OvertimeSeconds': int(config.DEFAULT_OVERTIME_AFTER_HOURS * 3600),
+    }
+
+def read_policy_file(path):
+    """Bảng quy định từ file CSV (cột POLICY_COLUMNS); chưa có file -> chỉ dùng quy định mặc định."""
+    try:
+        table = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    except FileNotFoundError:
+        return AttendancePolicy()
+    missing = [col for col in POLICY_COLUMNS if col not in table.columns]
+    if missing:
+        print(f"File quy định chấm công {path} thiếu cột {', '.join(missing)}; các cột đó được coi là để trống.")
+    table = table.reindex(columns=POLICY_COLUMNS, fill_value='')
+    invalid = (table['ShiftStart'] != '') & np.isnan(_time_of_day_seconds(table['ShiftStart']))
+    if invalid.any():
+        print(f"Bỏ qua {int(invalid.sum())} giờ vào ca không hợp lệ trong {path} (cần dạng HH:MM).")
+    return AttendancePolicy.from_table(table.replace('', np.nan))
+
+def evaluate_policy(sessions, policy=None):
+    """
+    Đánh giá quy định trên bảng ca: một dòng cho mỗi (người dùng, ngày) có lượt vào ca, các cột POLICY_REPORT_COLUMNS
+    (Day là ngày vào ca, FirstCheckIn là lượt vào đầu tiên trong ngày, ShiftStart là giờ vào ca 'HH:MM:SS' áp dụng,
+    WorkMinutes là giờ làm của các ca đã đóng), sắp theo (UserID, Day).
+    """
+    policy = policy if policy is not None else AttendancePolicy()
+    flags = sessions.frame['Flags'].to_numpy()
+    has_in = np.flatnonzero(flags & SessionFlag.CHECKED_IN.value)
+    if not len(has_in):
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in zip(POLICY_REPORT_COLUMNS, [
+            object, 'datetime64[s]', 'datetime64[s]', object, bool, np.int64, np.int64, bool, np.int64])})
+
+    session_users, user_ids = user_index(sessions)
+    in_times = sessions.frame['InTime'].to_numpy()[has_in]
+    users = session_users[has_in].astype(np.int64)
+    days = session_days(in_times)
+    work_seconds = np.where((flags[has_in] & SESSION_CLOSED) == SESSION_CLOSED, sessions.durations()[has_in], 0)
+
+    # Sắp theo (UserID, ngày) rồi gộp từng nhóm liên tiếp bằng reduceat -> kết quả đã sắp theo (UserID, Day)
+    order = np.lexsort((days, users))
+    users, days = users[order], days[order]
+    group_starts = np.flatnonzero(np.r_[True, (users[1:] != users[:-1]) | (days[1:] != days[:-1])])
+    first_in = np.minimum.reduceat(in_times[order], group_starts)
+    work = np.add.reduceat(np.maximum(work_seconds[order], 0), group_starts)
+    day_users = users[group_starts]
+
+    rules = policy.resolve(user_ids)
+    shift_start = rules['ShiftStart'].to_numpy()[day_users]
+    grace = rules['GraceSeconds'].to_numpy()[day_users]
+    overtime_after = rules['OvertimeSeconds'].to_numpy()[day_users]
+
+    late_seconds = seconds_of_day(first_in) - shift_start
+    late = late_seconds > grace
+    overtime_seconds = np.maximum(work - overtime_after, 0)
+    return pd.DataFrame({
+        'UserID': user_ids[day_users],
+        'Day': from_epoch_seconds(session_days(first_in) * 86400),
+        'FirstCheckIn': from_epoch_seconds(first_in),
+        'ShiftStart': _format_time_of_day(shift_start),
+        'Late': late,
+        'LateMinutes': np.where(late, late_seconds // 60, 0).astype(np.int64),
+        'WorkMinutes': (work // 60).astype(np.int64),
+        'Overtime': overtime_seconds > 0,
+        'OvertimeMinutes': (overtime_seconds // 60).astype(np.int64),
+    })
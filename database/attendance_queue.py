@@ -0,0 +1,250 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import config
+from database.database_manager import record_attendance_batch, sync_attendance_outbox, start_background_thread
+
+# Hàng đợi ghi nền (write-behind) cho các lượt chấm công từ vòng lặp camera.
+# Vòng lặp camera chỉ đưa lượt chấm công vào hàng đợi (không chờ đĩa); một luồng ghi riêng gom
+# các lượt đến gần nhau thành một nhóm và ghi một lần (một fsync/một transaction) qua record_attendance_batch.
+# Nhóm ghi lỗi được thử lại có giới hạn rồi chuyển sang file lượt lỗi (config.ATTENDANCE_DEAD_LETTER_FILE), để một
+# nhóm không bao giờ ghi được (dòng hỏng, đầy đĩa...) không chặn mọi lượt chấm công sau nó.
+# Luồng ghi và luồng đồng bộ luôn dùng kho của chi nhánh của tiến trình: site_scope ở luồng khác (admin đọc tạm kho
+# của chi nhánh khác) không đổi kho của chúng.
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Cột của file lượt lỗi (dùng được làm file nhập cho import_attendance)
+DEAD_LETTER_COLUMNS = ['UserID', 'Name', 'Timestamp', 'CheckType', 'Error']
+
+_queue = queue.Queue(maxsize=config.ATTENDANCE_QUEUE_MAXSIZE)
+# Các lượt chấm công đã nhận nhưng chưa ghi xong (kể cả nhóm đang ghi), theo thứ tự nhận
+_pending = []
+_pending_lock = threading.Lock()
+_flusher_thread = None
+_flusher_lock = threading.Lock()
+_stop_event = threading.Event()
+# Luồng đồng bộ nền lên kho trung tâm (start_attendance_sync), tách khỏi luồng ghi để kho trung tâm chậm/mất kết nối
+# không làm chậm việc ghi lượt chấm công
+_sync_thread = None
+_sync_stop_event = threading.Event()
+
+def enqueue_attendance(user_id, name, check_type, punch_time=None):
+    """
+    Đưa một lượt chấm công vào hàng đợi ghi nền, không bao giờ chờ đĩa.
+    Thời điểm chấm công được lấy lúc gọi. Trả về False nếu hàng đợi đã đầy (lượt này không được ghi).
+    """
+    punch = {
+        'UserID': user_id,
+        'Name': name,
+        'CheckType': check_type,
+        'Timestamp': (punch_time or datetime.now()).replace(microsecond=0),
+    }
+    _ensure_flusher()
+    with _pending_lock:
+        try:
+            _queue.put_nowait(punch)
+        except queue.Full:
+            print(f"Hàng đợi chấm công đầy ({config.ATTENDANCE_QUEUE_MAXSIZE}). Bỏ qua lượt {check_type} của {name} (ID: {user_id}).")
+            return False
+        _pending.append(punch)
+    return True
+
+def get_pending_punches():
+    """Các lượt chấm công chưa được ghi xuống bộ lưu trữ (bản sao), theo thứ tự nhận."""
+    with _pending_lock:
+        return [dict(punch) for punch in _pending]
+
+def flush_attendance_queue(timeout=None):
+    """Chờ tới khi mọi lượt chấm công đã nhận được ghi xong. Trả về False nếu hết thời gian chờ."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with _pending_lock:
+            if not _pending:
+                return True
+        if _flusher_thread is None or not _flusher_thread.is_alive():
+            _ensure_flusher()
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+
+def stop_attendance_queue(timeout=None):
+    """Ghi nốt các lượt còn trong hàng đợi rồi dừng luồng ghi (gọi khi đóng ứng dụng)."""
+    global _flusher_thread
+
+    flushed = flush_attendance_queue(timeout)
+    with _flusher_lock:
+        if _flusher_thread is not None:
+            _stop_event.set()
+            _flusher_thread.join(timeout)
+            _flusher_thread = None
+            _stop_event.clear()
+    if not flushed:
+        print(f"Cảnh báo: Còn {len(get_pending_punches())} lượt chấm công chưa được ghi khi dừng hàng đợi.")
+    return flushed
+
+def _ensure_flusher():
+    global _flusher_thread
+
+    with _flusher_lock:
+        if _flusher_thread is None or not _flusher_thread.is_alive():
+            _flusher_thread = threading.Thread(target=_flusher_loop, name="attendance-flusher", daemon=True)
+            start_background_thread(_flusher_thread)
+
+def _collect_batch(first_punch):
+    """Gom thêm các lượt đến trong ATTENDANCE_FLUSH_INTERVAL giây (tối đa ATTENDANCE_FLUSH_BATCH lượt)."""
+    batch = [first_punch]
+    deadline = time.monotonic() + config.ATTENDANCE_FLUSH_INTERVAL
+    while len(batch) < config.ATTENDANCE_FLUSH_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _write_batch(batch):
+    record_attendance_batch([
+        (punch['UserID'], punch['Name'], punch['CheckType'], punch['Timestamp']) for punch in batch
+    ])
+
+def _finish_batch(batch):
+    """Bỏ các lượt của nhóm khỏi danh sách chưa ghi (đã ghi xong hoặc đã chuyển sang file lượt lỗi)."""
+    with _pending_lock:
+        done = {id(punch) for punch in batch}
+        _pending[:] = [punch for punch in _pending if id(punch) not in done]
+
+def _punch_text(punch):
+    return f"{punch['CheckType']} của {punch['Name']} (ID: {punch['UserID']}) lúc {punch['Timestamp'].strftime(TIME_FORMAT)}"
+
+def _write_dead_letter(punches, error):
+    """Ghi thêm các lượt không ghi được vào file lượt lỗi; không ghi được file đó thì in từng lượt ra log."""
+    path = config.ATTENDANCE_DEAD_LETTER_FILE
+    try:
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(DEAD_LETTER_COLUMNS)
+            for punch in punches:
+                writer.writerow([punch['UserID'], punch['Name'], punch['Timestamp'].strftime(TIME_FORMAT),
+                                 punch['CheckType'], str(error)])
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Đã chuyển {len(punches)} lượt chấm công không ghi được vào {path}.")
+    except OSError as e:
+        print(f"Không ghi được file lượt lỗi {path}: {e}. Các lượt chấm công bị bỏ:")
+        for punch in punches:
+            print(f"  - {_punch_text(punch)}")
+
+def _give_up_batch(batch, error):
+    """
+    Nhóm đã hết số lần thử: ghi lại từng lượt một (chỉ lượt hỏng bị loại khỏi nhóm), các lượt vẫn lỗi chuyển sang
+    file lượt lỗi.
+    """
+    failed = []
+    if len(batch) == 1:
+        failed = [(batch[0], error)]
+    else:
+        for punch in batch:
+            try:
+                _write_batch([punch])
+            except Exception as e:
+                failed.append((punch, e))
+    for punch, punch_error in failed:
+        print(f"Không ghi được lượt {_punch_text(punch)}: {punch_error}")
+    if failed:
+        _write_dead_letter([punch for punch, _ in failed], error)
+    _finish_batch(batch)
+
+def _drop_on_stop(batch):
+    """Dừng hàng đợi khi nhóm đang chờ thử lại: chuyển nhóm và các lượt còn trong hàng đợi sang file lượt lỗi."""
+    punches = list(batch)
+    while True:
+        try:
+            punches.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    print(f"Dừng hàng đợi khi còn {len(punches)} lượt chấm công chưa ghi được:")
+    for punch in punches:
+        print(f"  - {_punch_text(punch)}")
+    _write_dead_letter(punches, "Dừng hàng đợi trước khi ghi được")
+    _finish_batch(punches)
+
+def _flusher_loop():
+    retry_batch = None
+    failures = 0
+    while True:
+        if retry_batch is not None:
+            batch = retry_batch
+        else:
+            try:
+                first_punch = _queue.get(timeout=0.1)
+            except queue.Empty:
+                if _stop_event.is_set():
+                    return
+                continue
+            batch = _collect_batch(first_punch)
+
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            failures += 1
+            if failures > config.ATTENDANCE_FLUSH_MAX_RETRIES:
+                print(f"Lỗi khi ghi {len(batch)} lượt chấm công: {e}. Đã thử {failures} lần, ghi lại từng lượt.")
+                _give_up_batch(batch, e)
+                retry_batch, failures = None, 0
+                continue
+            # Giữ nguyên nhóm để ghi lại sau, không làm mất lượt chấm công
+            print(f"Lỗi khi ghi {len(batch)} lượt chấm công: {e}. "
+                  f"Sẽ thử lại ({failures}/{config.ATTENDANCE_FLUSH_MAX_RETRIES}).")
+            retry_batch = batch
+            if _stop_event.wait(1.0):
+                _drop_on_stop(batch)
+                return
+            continue
+
+        retry_batch, failures = None, 0
+        _finish_batch(batch)
+
+def start_attendance_sync(interval=None):
+    """
+    Bắt đầu luồng nền gửi outbox lên kho trung tâm mỗi interval giây (mặc định config.SYNC_INTERVAL_SECONDS).
+    Không làm gì nếu chưa cấu hình config.CENTRAL_STORE_DIR hoặc luồng đã chạy.
+    """
+    global _sync_thread
+
+    if not config.CENTRAL_STORE_DIR or (_sync_thread is not None and _sync_thread.is_alive()):
+        return
+    interval = interval or config.SYNC_INTERVAL_SECONDS
+    _sync_stop_event.clear()
+    _sync_thread = threading.Thread(target=_sync_loop, args=(interval,), name="attendance-sync", daemon=True)
+    start_background_thread(_sync_thread)
+
+def stop_attendance_sync(timeout=None):
+    """Dừng luồng đồng bộ sau khi thử gửi lần cuối (các lượt chưa gửi được sẽ gửi ở lần chạy sau)."""
+    global _sync_thread
+
+    if _sync_thread is not None:
+        _sync_stop_event.set()
+        _sync_thread.join(timeout)
+        _sync_thread = None
+
+def _sync_loop(interval):
+    while True:
+        stopping = _sync_stop_event.wait(interval)
+        try:
+            sync_attendance_outbox()
+        except Exception as e:
+            print(f"Lỗi khi đồng bộ lượt chấm công lên kho trung tâm: {e}. Sẽ thử lại.")
+        if stopping:
+            return
+
+# Ghi nốt hàng đợi khi tiến trình thoát mà chưa gọi stop_attendance_queue()
+atexit.register(stop_attendance_queue, 10)
@@ -0,0 +1,104 @@
+from enum import IntFlag
+
+import numpy as np
+import pandas as pd
+
+import config
+from database.attendance_compact import NO_TIME, to_compact
+
+# Bảng ca làm việc dạng gọn: mỗi ca một dòng gồm mã người dùng, giờ vào/giờ ra (giây epoch int64, NO_TIME khi chưa có)
+# và các cờ trạng thái. Mỗi dòng chấm công đã lưu đúng là một ca: dòng Check-in (CheckOutTime được điền khi có lượt
+# ra đóng ca) hoặc dòng Check-out không có Check-in; việc ghép lượt vào/ra đã làm một lần lúc ghi (journal 'I'/'U'
+# là nhật ký sự kiện), nên thời lượng và trạng thái chỉ còn là phép tính trên cột, không phải ghép cặp lại.
+# Dòng của bảng ca trùng vị trí với dòng của CompactAttendance mà nó được dựng từ đó (cùng thứ tự, dùng chung bảng
+# phụ users), nên vị trí tìm được trên dữ liệu chấm công (query_attendance) dùng được ngay cho bảng ca.
+
+SECONDS_PER_DAY = 24 * 3600
+
+class SessionFlag(IntFlag):
+    CHECKED_IN = 1   # Ca có giờ vào
+    CHECKED_OUT = 2  # Ca có giờ ra
+    OVER_CAP = 4     # Ca đã đóng nhưng dài hơn MAX_WORK_SESSION_HOURS (không tính vào giờ làm trung bình)
+
+# Phần cờ xác định trạng thái ca: vào + ra = đã đóng, chỉ vào = đang làm việc, chỉ ra = Check-out không có Check-in
+SESSION_CLOSED = int(SessionFlag.CHECKED_IN | SessionFlag.CHECKED_OUT)
+SESSION_OPEN = int(SessionFlag.CHECKED_IN)
+SESSION_CHECKOUT_ONLY = int(SessionFlag.CHECKED_OUT)
+
+class SessionTable:
+    """
+    Bảng ca làm việc:
+      frame: DataFrame các cột UserCode (int32), InTime/OutTime (int64 giây epoch, NO_TIME = trống), Flags (uint8, SessionFlag),
+      users: bảng phụ của CompactAttendance (index UserCode, các cột UserID và Name).
+    """
+
+    def __init__(self, frame, users):
+        self.frame = frame
+        self.users = users
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    def take(self, rows):
+        """Các ca ở vị trí rows (slice hoặc mảng vị trí), dùng chung bảng phụ users."""
+        frame = {col: self.frame[col].to_numpy()[rows] for col in self.frame.columns}
+        return SessionTable(pd.DataFrame(frame), self.users)
+
+    def states(self):
+        """Trạng thái từng ca (SESSION_CLOSED / SESSION_OPEN / SESSION_CHECKOUT_ONLY, 0 = không có giờ nào)."""
+        return self.frame['Flags'].to_numpy() & SESSION_CLOSED
+
+    def start_times(self):
+        """Thời điểm bắt đầu ca (giờ vào, hoặc giờ ra với ca chỉ có Check-out) = Timestamp của dòng chấm công."""
+        in_times = self.frame['InTime'].to_numpy()
+        return np.where(in_times != NO_TIME, in_times, self.frame['OutTime'].to_numpy())
+
+    def durations(self):
+        """Số giây làm việc của từng ca đã đóng (OutTime - InTime, có thể <= 0 nếu dữ liệu lỗi); ca khác là 0."""
+        closed = self.states() == SESSION_CLOSED
+        return np.where(closed, self.frame['OutTime'].to_numpy() - self.frame['InTime'].to_numpy(), 0)
+
+    def memory_usage(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+def session_flags(in_times, out_times):
+    """Cờ SessionFlag (uint8) của các ca từ mảng giờ vào/giờ ra (giây epoch, NO_TIME = trống)."""
+    has_in = in_times != NO_TIME
+    has_out = out_times != NO_TIME
+    over_cap = has_in & has_out & (out_times - in_times > int(config.MAX_WORK_SESSION_HOURS))
+    return (has_in * SessionFlag.CHECKED_IN.value + has_out * SessionFlag.CHECKED_OUT.value
+            + over_cap * SessionFlag.OVER_CAP.value).astype(np.uint8)
+
+def to_sessions(compact):
+    """CompactAttendance -> SessionTable, một ca cho mỗi dòng, giữ nguyên thứ tự dòng."""
+    frame = compact.frame
+    in_times = frame['CheckInTime'].to_numpy()
+    out_times = frame['CheckOutTime'].to_numpy()
+    # Dòng không có Timestamp hợp lệ không phải một ca (các hàm tổng hợp trước đây cũng bỏ các dòng này)
+    valid = frame['Timestamp'].to_numpy() != NO_TIME
+    return SessionTable(pd.DataFrame({
+        'UserCode': frame['UserCode'].to_numpy(),
+        'InTime': np.where(valid, in_times, NO_TIME),
+        'OutTime': np.where(valid, out_times, NO_TIME),
+        'Flags': np.where(valid, session_flags(in_times, out_times), 0).astype(np.uint8),
+    }), compact.users)
+
+def sessions_from_frame(df):
+    """DataFrame chấm công (các cột ATTENDANCE_COLUMNS) -> SessionTable."""
+    return to_sessions(to_compact(df))
+
+def user_index(sessions):
+    """(mã UserID theo từng ca, các UserID đã sắp xếp): một UserID có thể có nhiều UserCode (mỗi tên một mã)."""
+    user_codes, user_ids = pd.factorize(sessions.users['UserID'].astype(str), sort=True)
+    return user_codes[sessions.frame['UserCode'].to_numpy()], np.asarray(user_ids, dtype=object)
+
+def session_days(times):
+    """Giây epoch -> số ngày epoch (ngày theo giờ địa phương, vì thời gian được lưu không kèm múi giờ)."""
+    return np.asarray(times, dtype=np.int64) // SECONDS_PER_DAY
+
+def seconds_of_day(times):
+    return np.asarray(times, dtype=np.int64) % SECONDS_PER_DAY
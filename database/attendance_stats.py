@@ -0,0 +1,406 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import config
+from database.attendance_compact import NO_TIME, from_epoch_seconds
+from database.attendance_sessions import (
+    SessionFlag, SESSION_CLOSED, SESSION_OPEN, SESSION_CHECKOUT_ONLY, sessions_from_frame, user_index,
+    session_days,
+)
+from database.attendance_policy import evaluate_policy
+
+# Các hàm tính toán thuần (không đọc/ghi file) dùng chung cho mọi kiểu lưu trữ.
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SUMMARY_COLUMNS = ['UserID', 'Name', 'TotalCheckIn', 'TotalCheckOut', 'AvgWorkDuration', 'Status']
+
+# Các trường tổng hợp lưu theo từng người dùng (chỉ mục trạng thái / bảng user_state)
+USER_STATE_FIELDS = [
+    'Name', 'OpenCheckIn', 'LastCheckIn', 'LastCheckOut',
+    'TotalCheckIn', 'TotalCheckOut', 'TotalWorkSeconds', 'PairedWorkSeconds', 'PairCount', 'Status',
+]
+
+NO_DATA_STATUS = "Chưa có dữ liệu chấm công"
+
+# Bảng giờ công theo (người dùng, ngày): tổng số giây làm việc và số ca đã đóng, tính vào ngày check-in
+ROLLUP_COLUMNS = ['UserID', 'Day', 'WorkSeconds', 'Sessions']
+ROLLUP_PERIODS = {'day', 'week', 'month'}
+
+def _status_checked_out(check_out_time):
+    return f"Đã về (Check-out lúc {check_out_time.strftime('%H:%M')})"
+
+def _status_working(check_in_time):
+    return f"Đang làm việc (Check-in lúc {check_in_time.strftime('%H:%M')})"
+
+def _status_checkout_only(check_out_time):
+    return f"Chỉ Check-out (lúc {check_out_time.strftime('%H:%M')})"
+
+def _time_strings(times):
+    """Mảng giây epoch -> mảng chuỗi TIME_FORMAT (object), NO_TIME -> None."""
+    formatted = pd.Series(from_epoch_seconds(times)).dt.strftime(TIME_FORMAT).to_numpy(dtype=object)
+    formatted[np.asarray(times) == NO_TIME] = None
+    return formatted
+
+def session_user_aggregates(sessions):
+    """
+    Tính các trường tổng hợp của USER_STATE_FIELDS cho từng người dùng từ bảng ca (SessionTable). Trả về DataFrame có
+    index là UserID. Mỗi ca đã đóng có thời lượng > 0 được cộng vào TotalWorkSeconds, và nếu không có cờ OVER_CAP thì
+    được tính vào PairedWorkSeconds/PairCount; trạng thái lấy theo ca bắt đầu muộn nhất. Chỉ là phép tính trên các cột
+    của bảng ca (sắp xếp một lần rồi cộng theo đoạn), không ghép cặp lượt vào/ra.
+    """
+    states = sessions.states()
+    kept = np.flatnonzero(states != 0)
+    if len(kept) == 0:
+        return pd.DataFrame(columns=USER_STATE_FIELDS, index=pd.Index([], name='UserID'))
+
+    session_users, user_ids = user_index(sessions)
+    starts = sessions.start_times()[kept]
+    # Sắp ổn định theo (người dùng, thời điểm bắt đầu ca): các ca của một người dùng nằm liền nhau
+    order = kept[np.lexsort((starts, session_users[kept]))]
+    users = session_users[order]
+    group_starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    latest = np.r_[group_starts[1:], len(order)] - 1
+
+    frame = sessions.frame
+    in_times = frame['InTime'].to_numpy()[order]
+    out_times = frame['OutTime'].to_numpy()[order]
+    flags = frame['Flags'].to_numpy()[order]
+    states = states[order]
+    durations = sessions.durations()[order]
+    positive = durations > 0
+    within_cap = positive & ((flags & SessionFlag.OVER_CAP) == 0)
+
+    def per_user(values):
+        return np.add.reduceat(values.astype(np.int64), group_starts)
+
+    aggregates = pd.DataFrame(index=pd.Index(user_ids[users[group_starts]], name='UserID'))
+    aggregates['Name'] = sessions.users['Name'].to_numpy(dtype=object)[frame['UserCode'].to_numpy()[order[latest]]]
+
+    latest_state = states[latest]
+    latest_in = in_times[latest]
+    latest_out = out_times[latest]
+    aggregates['OpenCheckIn'] = _time_strings(np.where(latest_state == SESSION_OPEN, latest_in, NO_TIME))
+    # NO_TIME là số int64 nhỏ nhất nên lấy max theo đoạn cho ra NO_TIME khi người dùng chưa có giờ vào/ra nào
+    aggregates['LastCheckIn'] = _time_strings(np.maximum.reduceat(in_times, group_starts))
+    aggregates['LastCheckOut'] = _time_strings(np.maximum.reduceat(out_times, group_starts))
+    aggregates['TotalCheckIn'] = per_user((flags & SessionFlag.CHECKED_IN) != 0)
+    aggregates['TotalCheckOut'] = per_user((flags & SessionFlag.CHECKED_OUT) != 0)
+    aggregates['TotalWorkSeconds'] = per_user(np.where(positive, durations, 0))
+    aggregates['PairedWorkSeconds'] = per_user(np.where(within_cap, durations, 0))
+    aggregates['PairCount'] = per_user(within_cap)
+
+    # Trạng thái lấy từ ca gần nhất của mỗi người dùng
+    latest_in_hhmm = pd.Series(from_epoch_seconds(latest_in)).dt.strftime('%H:%M').fillna('').to_numpy(dtype=object)
+    latest_out_hhmm = pd.Series(from_epoch_seconds(latest_out)).dt.strftime('%H:%M').fillna('').to_numpy(dtype=object)
+    aggregates['Status'] = np.select(
+        [latest_state == SESSION_CLOSED, latest_state == SESSION_OPEN, latest_state == SESSION_CHECKOUT_ONLY],
+        ["Đã về (Check-out lúc " + latest_out_hhmm + ")",
+         "Đang làm việc (Check-in lúc " + latest_in_hhmm + ")",
+         "Chỉ Check-out (lúc " + latest_out_hhmm + ")"],
+        default=NO_DATA_STATUS,
+    )
+    # Giá trị thiếu lưu là None (null trong JSON/SQLite)
+    for col in ['Name', 'OpenCheckIn', 'LastCheckIn', 'LastCheckOut']:
+        aggregates[col] = aggregates[col].astype(object).where(aggregates[col].notna(), None)
+    return aggregates[USER_STATE_FIELDS]
+
+def compute_user_aggregates(df_attendance):
+    """
+    Tính các trường tổng hợp của USER_STATE_FIELDS cho từng người dùng từ toàn bộ dữ liệu (vector hóa).
+    Trả về DataFrame có index là UserID. Mỗi dòng chấm công là một ca, xem session_user_aggregates.
+    """
+    return session_user_aggregates(sessions_from_frame(df_attendance))
+
+def aggregate_user_chunks(chunks):
+    """
+    Như compute_user_aggregates nhưng đọc dữ liệu theo từng khối (các khối nối tiếp nhau theo thời gian,
+    ví dụ từ database_manager.iter_attendance_chunks), nên bộ nhớ chỉ cần cho một khối và các tổng theo người dùng.
+    Mỗi dòng là một ca trọn vẹn nên không có gì phải mang sang khối sau: kết quả giống hệt tính trên toàn bộ dữ liệu.
+    """
+    return merge_user_aggregates(compute_user_aggregates(chunk) for chunk in chunks)
+
+def merge_user_aggregates(partials):
+    """
+    Gộp các tổng hợp theo người dùng (compute_user_aggregates) của từng phần dữ liệu, theo thứ tự thời gian của các
+    phần; các phần cùng khoảng thời gian phải có tập người dùng rời nhau (ví dụ chia theo băm UserID).
+    Gộp một lần trên tất cả các phần (không gộp lần lượt từng cặp) nên chi phí gần như không đổi theo số phần.
+    """
+    partials = [aggregates for aggregates in partials if not aggregates.empty]
+    if not partials:
+        return pd.DataFrame(columns=USER_STATE_FIELDS, index=pd.Index([], name='UserID'))
+    combined = pd.concat(partials)
+    # Tên, ca đang mở và trạng thái lấy theo phần mới nhất có người dùng đó
+    aggregates = combined[~combined.index.duplicated(keep='last')].sort_index()
+    if len(aggregates) < len(combined):
+        grouped = combined.groupby(level=0, sort=True)
+        for col in ['TotalCheckIn', 'TotalCheckOut', 'TotalWorkSeconds', 'PairedWorkSeconds', 'PairCount']:
+            aggregates[col] = grouped[col].sum().astype(np.int64)
+        # Chuỗi TIME_FORMAT so sánh được như thời gian; '' (chưa có) nhỏ hơn mọi thời điểm. Sắp xếp rồi lấy giá trị
+        # cuối của mỗi người dùng (groupby().max() trên cột chuỗi chạy từng phần tử trong Python)
+        for col in ['LastCheckIn', 'LastCheckOut']:
+            times = combined[col].astype(object).fillna('').sort_values(kind='stable')
+            aggregates[col] = times[~times.index.duplicated(keep='last')].reindex(aggregates.index)
+
+    for col in ['Name', 'OpenCheckIn', 'LastCheckIn', 'LastCheckOut']:
+        values = aggregates[col].astype(object)
+        missing = values.isna() | (values == '') if col in ('LastCheckIn', 'LastCheckOut') else values.isna()
+        aggregates[col] = values.where(~missing, None)
+    return aggregates[USER_STATE_FIELDS]
+
+def latest_known_times(aggregates):
+    """Thời điểm muộn nhất đã biết của từng người dùng (max LastCheckIn, LastCheckOut), NaT nếu chưa có."""
+    last_in = pd.to_datetime(aggregates['LastCheckIn'], format=TIME_FORMAT, errors='coerce')
+    last_out = pd.to_datetime(aggregates['LastCheckOut'], format=TIME_FORMAT, errors='coerce')
+    return pd.concat([last_in, last_out], axis=1).max(axis=1)
+
+def users_to_rescan(aggregates, df_new):
+    """
+    Người dùng có dòng mới (df_new) không muộn hơn thời điểm muộn nhất đã biết của họ trong aggregates: ca gần nhất
+    của họ (tên, ca đang mở, trạng thái) có thể là một ca đã lưu chứ không phải ca mới, nên phải đọc lại các dòng đã
+    lưu của họ từ lượt mới muộn nhất trở đi. Trả về Series UserID -> Timestamp lượt mới muộn nhất, chỉ các người đó.
+    """
+    newest = pd.to_datetime(df_new['Timestamp']).groupby(df_new['UserID'].astype(str).to_numpy()).max()
+    known = latest_known_times(aggregates).reindex(newest.index)
+    return newest[known.notna() & (newest <= known)]
+
+def merge_new_rows(aggregates, df_new, recent_rows=None):
+    """
+    Tổng hợp (USER_STATE_FIELDS) của các người dùng có trong df_new sau khi thêm các dòng df_new vào dữ liệu có tổng
+    hợp aggregates, không đọc lại lịch sử: các tổng cộng dồn, LastCheckIn/LastCheckOut lấy max, tên/ca đang mở/trạng
+    thái theo ca mới nhất của df_new. Với các người dùng của users_to_rescan, recent_rows là các dòng đã lưu (gồm cả
+    df_new) của họ từ lượt mới muộn nhất trở đi, cho biết ca gần nhất thật sự.
+    """
+    added = compute_user_aggregates(df_new)
+    known = aggregates[aggregates.index.isin(added.index)]
+    merged = merge_user_aggregates([known, added])
+    if recent_rows is not None and not recent_rows.empty:
+        recent = compute_user_aggregates(recent_rows)
+        users = recent.index.intersection(merged.index)
+        for col in ['Name', 'OpenCheckIn', 'Status']:
+            merged.loc[users, col] = recent.loc[users, col]
+    return merged
+
+def _sum_by_day(days, values):
+    """Cộng values theo số ngày epoch days; index là các ngày (datetime.date) tăng dần."""
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique_days))
+    return pd.Series(sums, index=pd.DatetimeIndex(unique_days.astype('datetime64[D]').astype('datetime64[s]')).date)
+
+def session_attendance_metrics(sessions, policy=None):
+    """compute_attendance_metrics trên bảng ca (SessionTable): chỉ lọc theo cờ và cộng theo ngày vào ca."""
+    metrics = {}
+    closed = sessions.states() == SESSION_CLOSED
+    in_times = sessions.frame['InTime'].to_numpy()[closed]
+    days = session_days(in_times)
+
+    # --- 1. Tổng giờ làm việc hàng ngày ---
+    if len(in_times):
+        metrics['daily_work_hours'] = _sum_by_day(days, sessions.durations()[closed] / 3600)
+    else:
+        metrics['daily_work_hours'] = pd.Series(dtype=float)
+
+    # --- 2, 3. Số người đi muộn và số giờ tăng ca theo ngày, theo bảng quy định (evaluate_policy) ---
+    report = evaluate_policy(sessions, policy)
+    report_days = session_days(report['Day'].to_numpy().astype(np.int64))
+    late = report['Late'].to_numpy()
+    if late.any():
+        metrics['late_check_in_count_by_day'] = _sum_by_day(report_days[late], np.ones(int(late.sum()))).astype(np.int64)
+    else:
+        metrics['late_check_in_count_by_day'] = pd.Series(dtype=int)
+    overtime = report['Overtime'].to_numpy()
+    if overtime.any():
+        metrics['overtime_hours_by_day'] = _sum_by_day(
+            report_days[overtime], report['OvertimeMinutes'].to_numpy()[overtime] / 60)
+    else:
+        metrics['overtime_hours_by_day'] = pd.Series(dtype=float)
+
+    return metrics
+
+def compute_attendance_metrics(df_attendance, policy=None):
+    """
+    Các chỉ số chấm công cho biểu đồ báo cáo:
+      'daily_work_hours':           tổng giờ làm việc theo ngày (các ca đã đóng)
+      'late_check_in_count_by_day': số người đi muộn theo ngày (lượt vào đầu tiên trong ngày muộn theo quy định)
+      'overtime_hours_by_day':      tổng số giờ tăng ca theo ngày
+    policy: AttendancePolicy (mặc định: quy định mặc định trong config).
+    Các chỉ số cộng được theo ngày nên có thể tính từng khối rồi gộp bằng combine_attendance_metrics, miễn là các dòng
+    của cùng một (người dùng, ngày) nằm trong cùng một khối.
+    """
+    return session_attendance_metrics(sessions_from_frame(df_attendance), policy)
+
+def combine_attendance_metrics(metrics, other):
+    """Gộp chỉ số của hai phần dữ liệu (ví dụ hai khối liên tiếp) bằng cách cộng theo ngày."""
+    if metrics is None:
+        return other
+    daily_work_hours = metrics['daily_work_hours'].add(other['daily_work_hours'], fill_value=0).sort_index()
+    late_counts = metrics['late_check_in_count_by_day'].add(other['late_check_in_count_by_day'], fill_value=0)
+    overtime_hours = metrics['overtime_hours_by_day'].add(other['overtime_hours_by_day'], fill_value=0)
+    return {
+        'daily_work_hours': daily_work_hours.astype(float),
+        'late_check_in_count_by_day': late_counts.sort_index().astype(np.int64),
+        'overtime_hours_by_day': overtime_hours.sort_index().astype(float),
+    }
+
+def _empty_daily_rollup():
+    return pd.DataFrame({
+        'UserID': pd.Series(dtype=object), 'Day': pd.Series(dtype='datetime64[s]'),
+        'WorkSeconds': pd.Series(dtype=np.int64), 'Sessions': pd.Series(dtype=np.int64),
+    })
+
+def session_rollup(user_ids, check_in_times, work_seconds):
+    """
+    Bảng giờ công theo (UserID, ngày) từ danh sách ca đã đóng: user_ids, thời điểm check-in (Timestamp của dòng
+    check-in) và số giây làm việc của từng ca. Trả về các cột ROLLUP_COLUMNS, sắp theo (Day, UserID).
+    """
+    if len(user_ids) == 0:
+        return _empty_daily_rollup()
+    sessions = pd.DataFrame({
+        'UserID': pd.Series(user_ids).astype(str).to_numpy(dtype=object),
+        'Day': pd.Series(check_in_times).to_numpy(dtype='datetime64[D]').astype('datetime64[s]'),
+        'WorkSeconds': np.asarray(work_seconds, dtype=np.int64),
+    })
+    rollup = sessions.groupby(['Day', 'UserID'], sort=True)['WorkSeconds'].agg(['sum', 'size']).reset_index()
+    rollup.columns = ['Day', 'UserID', 'WorkSeconds', 'Sessions']
+    return rollup[ROLLUP_COLUMNS].astype({'WorkSeconds': np.int64, 'Sessions': np.int64})
+
+def session_daily_rollup(sessions):
+    """Giờ công theo (người dùng, ngày) từ bảng ca: mỗi ca đã đóng tính vào ngày vào ca."""
+    closed = np.flatnonzero(sessions.states() == SESSION_CLOSED)
+    session_users, user_ids = user_index(sessions)
+    return session_rollup(user_ids[session_users[closed]], from_epoch_seconds(sessions.frame['InTime'].to_numpy()[closed]),
+                          sessions.durations()[closed])
+
+def compute_daily_rollup(df_attendance):
+    """
+    Giờ công theo (người dùng, ngày) từ dữ liệu chấm công, cùng quy tắc với 'daily_work_hours' của
+    compute_attendance_metrics: mỗi ca đã đóng (dòng có cả CheckInTime và CheckOutTime) tính vào ngày vào ca.
+    """
+    if df_attendance.empty:
+        return _empty_daily_rollup()
+    return session_daily_rollup(sessions_from_frame(df_attendance))
+
+def combine_daily_rollups(rollups):
+    """Cộng các bảng giờ công theo (người dùng, ngày) (ví dụ phần đã lưu và phần mới từ journal)."""
+    rollups = [rollup for rollup in rollups if rollup is not None and not rollup.empty]
+    if not rollups:
+        return _empty_daily_rollup()
+    if len(rollups) == 1:
+        return rollups[0]
+    combined = pd.concat(rollups, ignore_index=True).groupby(['Day', 'UserID'], sort=True)[
+        ['WorkSeconds', 'Sessions']].sum().reset_index()
+    return combined[ROLLUP_COLUMNS]
+
+def rollup_by_period(daily, period='day'):
+    """
+    Gộp bảng giờ công theo ngày thành 'day' / 'week' (tuần bắt đầu thứ Hai) / 'month'.
+    Trả về các cột UserID, Period (ngày đầu kỳ), WorkSeconds, WorkHours, Sessions, sắp theo (Period, UserID).
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Kỳ tổng hợp không hợp lệ: '{period}'. Chọn một trong {sorted(ROLLUP_PERIODS)}.")
+    days = daily['Day'].to_numpy(dtype='datetime64[D]')
+    if period == 'day':
+        result = daily.rename(columns={'Day': 'Period'})
+    else:
+        if period == 'week':
+            # 1970-01-01 là thứ Năm: dời 3 ngày để số ngày chia 7 rơi đúng vào thứ Hai
+            starts = ((days.astype(np.int64) + 3) // 7 * 7 - 3).astype('datetime64[D]')
+        else:
+            starts = days.astype('datetime64[M]').astype('datetime64[D]')
+        # Cộng theo khóa số (kỳ, người dùng) bằng bincount, nhanh hơn groupby hai cột trên chuỗi UserID
+        user_codes, users = pd.factorize(daily['UserID'], sort=True)
+        period_codes, periods = pd.factorize(starts, sort=True)
+        keys, inverse = np.unique(period_codes.astype(np.int64) * max(len(users), 1) + user_codes, return_inverse=True)
+        result = pd.DataFrame({
+            'UserID': np.asarray(users, dtype=object)[keys % max(len(users), 1)],
+            'Period': np.asarray(periods, dtype='datetime64[D]')[keys // max(len(users), 1)].astype('datetime64[s]'),
+            'WorkSeconds': np.bincount(inverse, weights=daily['WorkSeconds'].to_numpy(), minlength=len(keys)).astype(np.int64),
+            'Sessions': np.bincount(inverse, weights=daily['Sessions'].to_numpy(), minlength=len(keys)).astype(np.int64),
+        })
+    result = result[['UserID', 'Period', 'WorkSeconds', 'Sessions']].reset_index(drop=True)
+    result.insert(3, 'WorkHours', result['WorkSeconds'] / 3600)
+    return result
+
+def format_summary(aggregates):
+    """Chuyển bảng tổng hợp (index UserID, các cột USER_STATE_FIELDS) thành bảng báo cáo SUMMARY_COLUMNS."""
+    if len(aggregates) == 0:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    summary = aggregates.sort_index().rename_axis('UserID').reset_index()
+    pair_count = summary['PairCount'].astype(np.int64)
+    has_pairs = pair_count > 0
+    avg_seconds = summary.loc[has_pairs, 'PairedWorkSeconds'].astype(np.int64) // pair_count[has_pairs]
+    summary['AvgWorkDuration'] = '-'
+    summary.loc[has_pairs, 'AvgWorkDuration'] = pd.to_timedelta(avg_seconds, unit='s').astype(str)
+    summary['TotalCheckIn'] = summary['TotalCheckIn'].astype(np.int64)
+    summary['TotalCheckOut'] = summary['TotalCheckOut'].astype(np.int64)
+    return summary[SUMMARY_COLUMNS]
+
+def summarize_checkin_checkout(df_attendance):
+    """Tổng hợp chấm công theo người dùng từ toàn bộ dữ liệu (đường tính lại đầy đủ)."""
+    return format_summary(compute_user_aggregates(df_attendance))
+
+def user_states_from_aggregates(aggregates):
+    """Chuyển bảng tổng hợp thành dict UserID -> {trường: giá trị} (kiểu Python thuần để lưu JSON)."""
+    states = {}
+    for user_id, row in zip(aggregates.index, aggregates.to_dict('records')):
+        states[str(user_id)] = {
+            field: (int(value) if isinstance(value, (np.integer,)) else value)
+            for field, value in row.items()
+        }
+    return states
+
+def aggregates_from_user_states(states):
+    """Ngược lại với user_states_from_aggregates."""
+    aggregates = pd.DataFrame.from_dict(states, orient='index', columns=USER_STATE_FIELDS)
+    aggregates.index.name = 'UserID'
+    return aggregates
+
+def new_user_state(name):
+    return {
+        'Name': name, 'OpenCheckIn': None, 'LastCheckIn': None, 'LastCheckOut': None,
+        'TotalCheckIn': 0, 'TotalCheckOut': 0, 'TotalWorkSeconds': 0, 'PairedWorkSeconds': 0, 'PairCount': 0,
+        'Status': NO_DATA_STATUS,
+    }
+
+def is_duplicate_punch(state, check_type, punch_time, window_seconds):
+    """
+    True nếu lượt (check_type, punch_time) cách lượt cùng loại gần nhất của người dùng (LastCheckIn/LastCheckOut trong
+    state, None = người dùng chưa có dữ liệu) không quá window_seconds giây, tức là lượt lặp lại của cùng một lần chấm
+    công (nhiều khung hình, nhiều camera, kiosk khởi động lại) và không được ghi thêm.
+    """
+    if state is None or not window_seconds or window_seconds <= 0:
+        return False
+    last_time = state['LastCheckIn'] if check_type == "Check-in" else state['LastCheckOut']
+    if not last_time:
+        return False
+    return abs((punch_time - datetime.strptime(last_time, TIME_FORMAT)).total_seconds()) <= window_seconds
+
+def apply_punch(state, name, check_type, punch_time):
+    """
+    Cập nhật tăng dần trạng thái/tổng hợp của một người dùng sau một lượt chấm công mới nhất (sửa trực tiếp state).
+    Trả về Timestamp (chuỗi) của dòng check-in được đóng bởi lượt check-out này, hoặc None.
+    """
+    time_str = punch_time.strftime(TIME_FORMAT)
+    closed_check_in = None
+    if check_type == "Check-in":
+        state['OpenCheckIn'] = time_str
+        state['LastCheckIn'] = time_str
+        state['TotalCheckIn'] += 1
+        state['Status'] = _status_working(punch_time)
+    elif check_type == "Check-out":
+        closed_check_in = state['OpenCheckIn']
+        if closed_check_in:
+            duration = int((punch_time - datetime.strptime(closed_check_in, TIME_FORMAT)).total_seconds())
+            if duration > 0:
+                state['TotalWorkSeconds'] += duration
+                if duration <= config.MAX_WORK_SESSION_HOURS:
+                    state['PairedWorkSeconds'] += duration
+                    state['PairCount'] += 1
+            state['Status'] = _status_checked_out(punch_time)
+        else:
+            state['Status'] = _status_checkout_only(punch_time)
+        state['OpenCheckIn'] = None
+        state['LastCheckOut'] = time_str
+        state['TotalCheckOut'] += 1
+    state['Name'] = name
+    return closed_check_in
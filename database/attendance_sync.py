@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Đồng bộ offline-first từ kiosk lên kho trung tâm:
+#   - kiosk ghi mỗi lượt chấm công vào kho cục bộ như bình thường và ghi nối thêm vào hộp thư đi (outbox) cục bộ,
+#     nên độ trễ chấm công không phụ thuộc kho trung tâm;
+#   - khi kết nối được, kiosk gửi phần outbox sau mốc (watermark, vị trí byte đã gửi) thành các file lô trong
+#     hộp thư đến (inbox) của chi nhánh ở kho trung tâm (ghi file tạm rồi đổi tên, nên không có lô dở dang);
+#   - máy trung tâm gộp các lô vào kho chấm công của chi nhánh, bỏ lượt trùng theo (UserID, Timestamp, KioskID)
+#     nhờ sổ các lượt đã gộp, nên gửi lại hay gộp lại cùng một lô không tạo dòng trùng.
+# Các hàm ở đây chỉ đọc/ghi các file outbox/inbox/sổ đã gộp; phần khóa kho và ghi dữ liệu chấm công nằm ở
+# database_manager.sync_attendance_outbox / merge_attendance_inbox.
+
+# Cột của outbox (không có dòng tiêu đề, đọc theo vị trí byte) và của các file lô trong inbox
+SYNC_COLUMNS = ['KioskID', 'UserID', 'Name', 'CheckType', 'Timestamp']
+# Khóa bỏ trùng khi gộp và cột của sổ các lượt đã gộp
+SYNC_KEY_COLUMNS = ['KioskID', 'UserID', 'Timestamp']
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Thư mục con của inbox chứa sổ các lượt đã gộp, một file mỗi tháng: merged/YYYY-MM.csv
+MERGED_LEDGER_DIR = 'merged'
+LEDGER_MONTH_FORMAT = '%Y-%m'
+
+def append_outbox(outbox_file, kiosk_id, punches):
+    """Ghi nối các lượt (user_id, name, check_type, punch_time) vào outbox với một lần fsync."""
+    os.makedirs(os.path.dirname(outbox_file), exist_ok=True)
+    with open(outbox_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for user_id, name, check_type, punch_time in punches:
+            writer.writerow([kiosk_id, user_id, name, check_type, punch_time.replace(microsecond=0).strftime(TIME_FORMAT)])
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_outbox(outbox_file, offset, max_rows=None):
+    """
+    Các lượt trong outbox từ vị trí byte offset (tối đa max_rows lượt), dạng DataFrame SYNC_COLUMNS, và vị trí byte
+    ngay sau lượt cuối đã đọc. Dòng cuối chưa ghi xong (mất điện giữa chừng) không được đọc.
+    """
+    try:
+        with open(outbox_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return pd.DataFrame(columns=SYNC_COLUMNS), offset
+    lines = data.split(b'\n')[:-1] # Phần sau '\n' cuối cùng là dòng dở dang (hoặc rỗng)
+    if max_rows is not None:
+        lines = lines[:max_rows]
+    end_offset = offset + sum(len(line) + 1 for line in lines)
+    rows = list(csv.reader(line.decode('utf-8').rstrip('\r') for line in lines))
+    rows = [row for row in rows if len(row) == len(SYNC_COLUMNS)]
+    return pd.DataFrame(rows, columns=SYNC_COLUMNS), end_offset
+
+def read_sync_state(state_file):
+    """Mốc đồng bộ của kiosk: {'offset': vị trí byte đã gửi trong outbox, 'generation': số lần outbox được làm mới}."""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {}
+    except ValueError as e:
+        # Mất mốc chỉ làm gửi lại từ đầu outbox; máy trung tâm bỏ các lượt đã gộp
+        print(f"File mốc đồng bộ {state_file} bị hỏng: {e}. Sẽ gửi lại từ đầu outbox.")
+        state = {}
+    return {'offset': int(state.get('offset', 0)), 'generation': int(state.get('generation', 0))}
+
+def write_sync_state(state_file, state):
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def write_inbox_batch(inbox_dir, kiosk_id, events):
+    """Ghi một lô lượt chấm công vào inbox (file tạm rồi đổi tên). Trả về đường dẫn file lô."""
+    os.makedirs(inbox_dir, exist_ok=True)
+    name = f"{kiosk_id}-{time.time_ns()}.csv"
+    tmp_file = os.path.join(inbox_dir, '.' + name + '.tmp')
+    events.to_csv(tmp_file, index=False, columns=SYNC_COLUMNS)
+    os.replace(tmp_file, os.path.join(inbox_dir, name))
+    return os.path.join(inbox_dir, name)
+
+def list_inbox_batches(inbox_dir):
+    """Các file lô đã gửi xong trong inbox, theo thứ tự tên (kiosk rồi thời điểm gửi)."""
+    if not os.path.isdir(inbox_dir):
+        return []
+    return [os.path.join(inbox_dir, name) for name in sorted(os.listdir(inbox_dir))
+            if name.endswith('.csv') and not name.startswith('.')]
+
+def read_inbox_batches(paths):
+    """Gộp các file lô thành một DataFrame SYNC_COLUMNS (Timestamp kiểu datetime), theo thứ tự thời gian."""
+    frames = [pd.read_csv(path, dtype=str, keep_default_na=False) for path in paths]
+    events = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SYNC_COLUMNS)
+    events = events.reindex(columns=SYNC_COLUMNS)
+    events['Timestamp'] = pd.to_datetime(events['Timestamp'], format=TIME_FORMAT, errors='coerce')
+    events = events[events['Timestamp'].notna() & events['CheckType'].isin(["Check-in", "Check-out"])]
+    return events.sort_values('Timestamp', kind='stable').reset_index(drop=True)
+
+def _ledger_path(inbox_dir, month):
+    return os.path.join(inbox_dir, MERGED_LEDGER_DIR, f"{month}.csv")
+
+def _key_index(df):
+    return pd.MultiIndex.from_arrays([df['KioskID'].astype(str), df['UserID'].astype(str),
+                                      pd.to_datetime(df['Timestamp'])])
+
+def drop_merged_events(inbox_dir, events):
+    """
+    Bỏ các lượt trùng khóa (UserID, Timestamp, KioskID) trong events và các lượt đã có trong sổ đã gộp (chỉ đọc sổ
+    của các tháng có lượt mới). Trả về (lượt mới, số lượt bị bỏ).
+    """
+    before = len(events)
+    events = events.drop_duplicates(subset=SYNC_KEY_COLUMNS).reset_index(drop=True)
+    months = events['Timestamp'].dt.strftime(LEDGER_MONTH_FORMAT).to_numpy()
+    merged_mask = np.zeros(len(events), dtype=bool)
+    for month in pd.unique(months):
+        path = _ledger_path(inbox_dir, month)
+        if not os.path.exists(path):
+            continue
+        merged = pd.read_csv(path, dtype=str, keep_default_na=False)
+        in_month = months == month
+        merged_mask[in_month] = _key_index(events[in_month]).isin(_key_index(merged))
+    events = events[~merged_mask].reset_index(drop=True)
+    return events, before - len(events)
+
+def record_merged_events(inbox_dir, events):
+    """Ghi khóa của các lượt vừa gộp vào sổ đã gộp theo tháng (ghi nối, một lần fsync mỗi tháng)."""
+    months = events['Timestamp'].dt.strftime(LEDGER_MONTH_FORMAT)
+    os.makedirs(os.path.join(inbox_dir, MERGED_LEDGER_DIR), exist_ok=True)
+    for month, df_month in events.groupby(months):
+        path = _ledger_path(inbox_dir, month)
+        is_new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if is_new_file:
+                writer.writerow(SYNC_KEY_COLUMNS)
+            writer.writerows(zip(df_month['KioskID'], df_month['UserID'], df_month['Timestamp'].dt.strftime(TIME_FORMAT)))
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pandas as pd
+
+# Trạng thái chấm công "hôm nay" cho màn hình kiosk: một file JSON nhỏ
+#   {'day': 'YYYY-MM-DD', 'users': {UserID: {'Name', 'CheckIn', 'CheckOut'}}}
+# với lượt Check-in/Check-out gần nhất trong ngày của từng người (chuỗi TIME_FORMAT, None = chưa có), được cập nhật
+# sau mỗi lần ghi lượt chấm công. Màn hình chính chỉ đọc file này khi khởi động nên thời gian khởi động phụ thuộc số
+# người chấm công trong ngày, không phụ thuộc độ dài lịch sử. File của một ngày khác là trạng thái đã qua ngày mới
+# (hôm nay chưa có lượt nào); file mất hoặc hỏng thì được dựng lại từ dữ liệu của hôm nay và hôm qua.
+# Các hàm ở đây chỉ đọc/ghi file và tính trạng thái; phần khóa kho nằm ở database_manager.get_today_attendance.
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DAY_FORMAT = '%Y-%m-%d'
+
+def read_today_snapshot(path, day):
+    """
+    Trạng thái của ngày day (datetime.date) từ file: UserID -> {'Name', 'CheckIn', 'CheckOut'}.
+    File của ngày khác -> {} (đã qua ngày mới); chưa có file hoặc file hỏng -> None (cần dựng lại).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"File chấm công hôm nay {path} bị hỏng: {e}. Sẽ dựng lại.")
+        return None
+    if data.get('day') != day.strftime(DAY_FORMAT):
+        return {}
+    return data.get('users', {})
+
+def write_today_snapshot(path, day, users):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'day': day.strftime(DAY_FORMAT), 'users': users}, f, ensure_ascii=False)
+    os.replace(tmp_file, path)
+
+def apply_today_punches(users, day, punches):
+    """Cập nhật users theo các lượt (user_id, name, check_type, punch_time) đã ghi; lượt của ngày khác bị bỏ qua."""
+    for user_id, name, check_type, punch_time in punches:
+        if punch_time.date() != day:
+            continue
+        field = 'CheckIn' if check_type == "Check-in" else 'CheckOut'
+        entry = users.setdefault(user_id, {'Name': name, 'CheckIn': None, 'CheckOut': None})
+        punch_text = punch_time.replace(microsecond=0).strftime(TIME_FORMAT)
+        # Lượt đến muộn (đồng bộ từ kiosk khác) không ghi đè lượt mới hơn
+        if entry[field] is None or punch_text >= entry[field]:
+            entry[field] = punch_text
+            entry['Name'] = name
+
+def today_snapshot_from_frame(df, day):
+    """
+    Trạng thái của ngày day từ các dòng chấm công (các cột ATTENDANCE_COLUMNS). Check-out nằm trên dòng check-in của
+    ca, nên df cần gồm cả các dòng bắt đầu từ hôm trước để có check-out của ca qua đêm.
+    """
+    users = {}
+    if df.empty:
+        return users
+    events = pd.concat([
+        pd.DataFrame({'UserID': df['UserID'].astype(str).to_numpy(), 'Name': df['Name'].astype(str).to_numpy(),
+                      'Field': field, 'Time': pd.to_datetime(df[col]).to_numpy()})
+        for field, col in [('CheckIn', 'CheckInTime'), ('CheckOut', 'CheckOutTime')]
+    ], ignore_index=True)
+    events = events[events['Time'].notna()]
+    events = events[events['Time'].dt.date.to_numpy() == day]
+    # Lượt gần nhất của mỗi (người dùng, loại); tên lấy theo lượt gần nhất của người dùng
+    events = events.sort_values('Time', kind='stable')
+    latest = events.drop_duplicates(['UserID', 'Field'], keep='last')
+    names = events.drop_duplicates('UserID', keep='last').set_index('UserID')['Name']
+    for user_id, field, time_text in zip(latest['UserID'], latest['Field'], latest['Time'].dt.strftime(TIME_FORMAT)):
+        entry = users.setdefault(user_id, {'Name': names[user_id], 'CheckIn': None, 'CheckOut': None})
+        entry[field] = time_text
+    return users
@@ -1,64 +1,1506 @@
 import pandas as pd
+import numpy as np
 import os
-from datetime import datetime, timedelta
+import csv
+import shutil
+import importlib.util
+import json
+import time
+import threading
+import contextlib
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 import config
+from database import sqlite_backend
+from utils.file_lock import FileLock
+from database.attendance_stats import (
+    SUMMARY_COLUMNS, summarize_checkin_checkout, compute_user_aggregates, format_summary,
+    user_states_from_aggregates, aggregates_from_user_states, new_user_state, apply_punch, is_duplicate_punch,
+    aggregate_user_chunks, merge_user_aggregates, compute_attendance_metrics, combine_attendance_metrics,
+    compute_daily_rollup, session_rollup, combine_daily_rollups, rollup_by_period, ROLLUP_PERIODS,
+    session_user_aggregates, session_attendance_metrics, users_to_rescan, merge_new_rows, latest_known_times
+)
+from database.attendance_compact import to_compact, from_compact, check_type_code, epoch_seconds, NO_TIME, CheckType
+from database.attendance_sessions import to_sessions
+from database.attendance_import import (
+    iter_import_chunks, build_code_map, parse_import_chunk, ImportPunches, sort_punches,
+    drop_duplicate_punches, drop_existing_punches, drop_repeated_punches, pair_punches
+)
+from database.attendance_sync import (
+    append_outbox, read_outbox, read_sync_state, write_sync_state, write_inbox_batch, list_inbox_batches,
+    read_inbox_batches, drop_merged_events, record_merged_events
+)
+from database.attendance_today import (
+    read_today_snapshot, write_today_snapshot, apply_today_punches, today_snapshot_from_frame
+)
+from database.attendance_policy import AttendancePolicy, read_policy_file, evaluate_policy
 
-# Đường dẫn file
-ATTENDANCE_FILE = config.ATTENDANCE_FILE # <--- SỬA DÒNG NÀY
+# Các đường dẫn dữ liệu của một chi nhánh (cùng tên trong config), là thuộc tính của SiteStore
+SITE_PATH_NAMES = ['ATTENDANCE_FILE', 'ATTENDANCE_PARTITION_DIR', 'ATTENDANCE_JOURNAL_FILE', 'ATTENDANCE_INDEX_FILE',
+                   'ATTENDANCE_ROLLUP_FILE', 'ATTENDANCE_TODAY_FILE', 'ATTENDANCE_POLICY_FILE', 'ATTENDANCE_ARCHIVE_DIR',
+                   'ATTENDANCE_OUTBOX_FILE', 'ATTENDANCE_SYNC_STATE_FILE', 'ATTENDANCE_INBOX_DIR']
+
+ATTENDANCE_COLUMNS = ['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime']
+
+# Các loại bản ghi trong journal: thêm dòng mới hoặc cập nhật CheckOutTime của một ca đang mở
+JOURNAL_OP_INSERT = 'I'
+JOURNAL_OP_UPDATE = 'U'
+JOURNAL_COLUMNS = ['Op'] + ATTENDANCE_COLUMNS
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Tên phân vùng: attendance/YYYY-MM.<định dạng> theo tháng của Timestamp
+PARTITION_MONTH_FORMAT = '%Y-%m'
+# Định dạng file phân vùng (config.ATTENDANCE_SNAPSHOT_FORMAT) -> phần mở rộng
+PARTITION_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+TIME_COLUMNS = ['Timestamp', 'CheckInTime', 'CheckOutTime']
+# Các cột lưu dạng category trong phân vùng parquet/feather
+CATEGORICAL_COLUMNS = ['UserID', 'Name', 'CheckType']
+# Định dạng phân vùng lưu trữ (nén) -> phần mở rộng: parquet nén zstd nếu có pyarrow, không thì CSV nén gzip
+ARCHIVE_EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv.gz'}
+# File ghi mốc lưu trữ trong ATTENDANCE_ARCHIVE_DIR: {'archived_before': thời điểm, 'version': số lần ghi lưu trữ}
+ARCHIVE_MANIFEST_NAME = 'manifest.json'
 
 # Đảm bảo thư mục DATA_DIR tồn tại (vì config.py đã đảm bảo điều này)
-os.makedirs(os.path.dirname(ATTENDANCE_FILE), exist_ok=True) # Đảm bảo thư mục chứa ATTENDANCE_FILE tồn tại
+os.makedirs(os.path.dirname(config.ATTENDANCE_FILE), exist_ok=True) # Đảm bảo thư mục chứa ATTENDANCE_FILE tồn tại
+
+# Cache trong tiến trình của dữ liệu đã parse, dùng chung cho mọi lần load_attendance(). Cache giữ dạng gọn
+# CompactAttendance (mã người dùng + bảng phụ tên, giây epoch int64, mã CheckType) và chỉ đổi ra DataFrame khi trả về.
+# Khóa cache gồm bộ đếm phiên bản ghi và (mtime, size) của các file dữ liệu, nên cache tự
+# mất hiệu lực khi tiến trình này ghi hoặc khi tiến trình khác (admin/kiosk) sửa file.
+_write_version = 0
+# Cache từng file (phân vùng tháng, journal): đường dẫn -> ((mtime, size), DataFrame đã parse).
+# Các tháng cũ hầu như không đổi nên chỉ phải parse một lần.
+_file_cache = {}
+# pyarrow có được cài hay không (None = chưa kiểm tra)
+_pyarrow_available = None
+
+class SiteStore:
+    """
+    Kho chấm công của một chi nhánh: các đường dẫn dữ liệu (SITE_PATH_NAMES và SQLITE_DB_FILE), khóa kho và các cache
+    trong tiến trình. Mỗi chi nhánh có một SiteStore trong tiến trình (xem _site_store), dùng chung cho mọi luồng.
+    """
+
+    def __init__(self, site_id, paths, lock_file, sqlite_db_file, site_dir=None):
+        self.site_id = site_id
+        # Thư mục dữ liệu mà kho được tạo theo (config.site_data_dir); None = kho ban đầu của tiến trình (có thể đã
+        # được trỏ đi nơi khác bằng tay), không bao giờ bị coi là cũ
+        self.site_dir = site_dir
+        for name in SITE_PATH_NAMES:
+            setattr(self, name, paths[name])
+        self.SQLITE_DB_FILE = sqlite_db_file
+        # Khóa dữ liệu chấm công giữa các tiến trình (kiosk main_app.py, admin_app.py) và giữa các luồng
+        # (luồng ghi nền attendance_queue, giao diện admin). Mọi thao tác ghi và đọc file CSV đều nằm trong khóa này.
+        self.lock = FileLock(lock_file)
+        # Chỉ mục trạng thái theo người dùng (được lưu ở ATTENDANCE_INDEX_FILE):
+        # UserID -> {'Name', 'OpenCheckIn', 'LastCheckIn', 'LastCheckOut', các tổng TotalCheckIn/TotalCheckOut/
+        # TotalWorkSeconds/PairedWorkSeconds/PairCount và Status} (thời gian dạng chuỗi hoặc None).
+        # 'OpenCheckIn' là Timestamp của dòng check-in đang mở, nên check-out cập nhật đúng dòng đó mà không cần quét;
+        # các tổng được cộng dồn sau mỗi lượt chấm công nên báo cáo tổng hợp chỉ tốn O(số người dùng).
+        self.user_state = None
+        # Chữ ký (phân vùng, journal) tương ứng với user_state trong bộ nhớ; khác chữ ký hiện tại nghĩa là
+        # tiến trình khác đã ghi dữ liệu -> phải đọc lại chỉ mục trước khi dùng
+        self.user_state_key = None
+        # Số bản ghi hiện có trong journal (None = chưa đếm)
+        self.journal_record_count = None
+        # 'index' là chỉ mục của query_attendance cho đúng dữ liệu đang cache (dựng lại khi cache đổi), 'sessions' là
+        # bảng ca (SessionTable) cùng thứ tự dòng với dữ liệu đang cache, dựng khi cần.
+        self.attendance_cache = {'key': None, 'compact': None, 'index': None, 'sessions': None}
+        # Như attendance_cache nhưng chỉ gồm dữ liệu nóng (không có lưu trữ), cho các truy vấn không cần dữ liệu cũ
+        self.hot_attendance_cache = {'key': None, 'compact': None, 'index': None, 'sessions': None}
+        # Giờ công theo (người dùng, ngày) của các phân vùng + lưu trữ ('key' = chữ ký của chúng) và phần cộng thêm từ
+        # journal ('journal_key' = chữ ký journal), xem _get_daily_rollup / _journal_rollup
+        self.rollup_cache = {'key': None, 'daily': None, 'journal_key': None, 'journal': None}
+
+# Kho của chi nhánh mà tiến trình dùng (config.SITE_ID, đổi hẳn bằng use_site) và kho của các chi nhánh khác đã mở
+# (báo cáo gộp nhiều chi nhánh), giữ lại để lần quay lại không phải đọc lại. site_scope chỉ đổi kho của luồng gọi
+# (_thread_site.store), nên không luồng nào khác (luồng ghi nền, giao diện) bị đổi kho giữa chừng.
+_process_store = SiteStore(config.SITE_ID, {name: getattr(config, name) for name in SITE_PATH_NAMES},
+                           config.ATTENDANCE_LOCK_FILE, config.SQLITE_DB_FILE)
+_site_stores = {}
+_thread_site = threading.local()
+# Bảo vệ _process_store, _site_stores và _background_threads
+_site_lock = threading.RLock()
+# Các luồng nền đọc/ghi kho của tiến trình (luồng ghi hàng đợi, luồng đồng bộ, luồng xuất báo cáo), đăng ký qua
+# start_background_thread: use_site từ chối đổi hẳn chi nhánh khi còn luồng nào đang chạy
+_background_threads = []
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _signature_as_list(signature):
+    """Chữ ký dạng list để so sánh với giá trị đọc từ JSON."""
+    return list(signature) if signature is not None else None
+
+def _bump_write_version():
+    """Đánh dấu dữ liệu đã thay đổi để lần đọc sau không dùng lại cache cũ."""
+    global _write_version
+    _write_version += 1
+
+def invalidate_attendance_cache():
+    """Bỏ cache DataFrame chấm công (ví dụ sau khi sửa file bằng tay)."""
+    store = current_store()
+    _bump_write_version()
+    for cache in (store.attendance_cache, store.hot_attendance_cache):
+        cache['key'] = None
+        cache['compact'] = None
+        cache['index'] = None
+        cache['sessions'] = None
+    for key in store.rollup_cache:
+        store.rollup_cache[key] = None
+    _file_cache.clear()
+
+def _cached_compact(key, loader, cache=None):
+    """Dữ liệu đã cache dạng CompactAttendance nếu khóa còn khớp, ngược lại gọi loader (trả về DataFrame) và cache lại."""
+    cache = current_store().attendance_cache if cache is None else cache
+    if cache['key'] != key or cache['compact'] is None:
+        cache['compact'] = to_compact(loader())
+        cache['key'] = key
+        cache['index'] = None
+        cache['sessions'] = None
+    return cache['compact']
+
+def _cached_load(key, loader):
+    """DataFrame từ cache nếu khóa còn khớp, ngược lại gọi loader và cache lại."""
+    # from_compact luôn tạo DataFrame mới nên nơi gọi có thể sửa mà không làm hỏng cache
+    return from_compact(_cached_compact(key, loader))
+
+def _sort_by_time(df):
+    """Sắp xếp ổn định theo Timestamp; dữ liệu đã đúng thứ tự (trường hợp thường gặp) thì giữ nguyên."""
+    if df.empty or df['Timestamp'].is_monotonic_increasing:
+        return df
+    return df.sort_values('Timestamp', kind='stable').reset_index(drop=True)
+
+def _empty_attendance_df():
+    return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+
+def _parse_attendance_times(df):
+    """Chuyển các cột thời gian sang datetime và UserID sang chuỗi."""
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    df['UserID'] = df['UserID'].astype(str)
+    # Chuyển đổi CheckInTime và CheckOutTime sang datetime (nếu có)
+    if 'CheckInTime' in df.columns:
+        df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
+    if 'CheckOutTime' in df.columns:
+        df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
+    return df
+
+def _read_cached_file(path, reader):
+    """Đọc file qua _file_cache; trả về None nếu file không tồn tại. Không được sửa DataFrame trả về."""
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    df = reader(path)
+    _file_cache[path] = (signature, df)
+    return df
+
+def _read_journal_file(path):
+    if os.path.getsize(path) == 0:
+        return None
+    journal = pd.read_csv(path, dtype={'UserID': str})
+    if journal.empty:
+        return None
+    return _parse_attendance_times(journal)
+
+def _read_journal():
+    """Đọc journal; trả về None nếu chưa có bản ghi nào."""
+    return _read_cached_file(current_store().ATTENDANCE_JOURNAL_FILE, _read_journal_file)
+
+def _snapshot_format():
+    """Định dạng ghi phân vùng theo config; parquet/feather cần pyarrow, thiếu thì ghi CSV."""
+    global _pyarrow_available
+
+    snapshot_format = config.ATTENDANCE_SNAPSHOT_FORMAT
+    if snapshot_format not in PARTITION_EXTENSIONS:
+        raise ValueError(f"ATTENDANCE_SNAPSHOT_FORMAT không hợp lệ: '{snapshot_format}'")
+    if snapshot_format == 'csv':
+        return snapshot_format
+    if _pyarrow_available is None:
+        _pyarrow_available = importlib.util.find_spec('pyarrow') is not None
+        if not _pyarrow_available:
+            print(f"Chưa cài pyarrow: không dùng được định dạng '{snapshot_format}', phân vùng chấm công sẽ được ghi dạng CSV.")
+    return snapshot_format if _pyarrow_available else 'csv'
+
+def _partition_path(month, snapshot_format=None, partition_dir=None):
+    extension = PARTITION_EXTENSIONS[snapshot_format or _snapshot_format()]
+    return os.path.join(partition_dir or current_store().ATTENDANCE_PARTITION_DIR, month + extension)
+
+def _existing_partition_path(month):
+    """File phân vùng hiện có của tháng (ưu tiên định dạng đang cấu hình), None nếu chưa có."""
+    for snapshot_format in [_snapshot_format()] + list(PARTITION_EXTENSIONS):
+        path = _partition_path(month, snapshot_format)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _is_partition_month(text):
+    try:
+        datetime.strptime(text, PARTITION_MONTH_FORMAT)
+    except ValueError:
+        return False
+    return len(text) == 7
+
+def _list_partitions():
+    """Các tháng ('YYYY-MM') đang có phân vùng (ở bất kỳ định dạng nào), sắp xếp tăng dần."""
+    store = current_store()
+    _ensure_partitions()
+    if not os.path.isdir(store.ATTENDANCE_PARTITION_DIR):
+        return []
+    months = set()
+    for file_name in os.listdir(store.ATTENDANCE_PARTITION_DIR):
+        month, ext = os.path.splitext(file_name)
+        if ext in PARTITION_EXTENSIONS.values() and _is_partition_month(month):
+            months.add(month)
+    return sorted(months)
+
+def _months_in_range(months, start_date=None, end_date=None):
+    """Cắt tỉa phân vùng: chỉ giữ các tháng giao với khoảng [start_date, end_date]."""
+    if start_date is not None:
+        first_month = pd.Timestamp(start_date).strftime(PARTITION_MONTH_FORMAT)
+        months = [month for month in months if month >= first_month]
+    if end_date is not None:
+        last_month = pd.Timestamp(end_date).strftime(PARTITION_MONTH_FORMAT)
+        months = [month for month in months if month <= last_month]
+    return months
+
+def _snapshot_signature():
+    """Chữ ký [tên file, mtime, size] của mọi phân vùng (dạng list để so sánh được với giá trị đọc từ JSON)."""
+    signature = []
+    for month in _list_partitions():
+        path = _existing_partition_path(month)
+        file_signature = _file_signature(path) if path else None
+        if file_signature is not None:
+            signature.append([os.path.basename(path)] + list(file_signature))
+    return signature
+
+def _read_partition_file(path):
+    ext = os.path.splitext(path)[1]
+    # parquet/feather lưu sẵn kiểu datetime64/category: không phải parse, đọc qua memory map
+    if ext == PARTITION_EXTENSIONS['parquet']:
+        return pd.read_parquet(path, memory_map=True)
+    if ext == PARTITION_EXTENSIONS['feather']:
+        from pyarrow import feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+    try:
+        return _parse_attendance_times(pd.read_csv(path, dtype={'UserID': str}))
+    except pd.errors.EmptyDataError:
+        return _empty_attendance_df()
+
+def _read_partition(month):
+    path = _existing_partition_path(month)
+    if path is None:
+        return None
+    return _read_cached_file(path, _read_partition_file)
+
+def _typed_attendance(df):
+    """Kiểu cột dùng cho phân vùng parquet/feather: datetime64 cho thời gian, category cho UserID/Name/CheckType."""
+    for col in TIME_COLUMNS:
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    if not isinstance(df['UserID'].dtype, pd.CategoricalDtype):
+        df['UserID'] = df['UserID'].astype(str)
+    for col in CATEGORICAL_COLUMNS:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def _plain_attendance(df):
+    """
+    Kiểu cột trả ra ngoài API (load_attendance/query_attendance), giống khi đọc CSV: chuỗi cho UserID/Name/CheckType
+    (không phải category, để nơi gọi gán được giá trị mới), datetime64[ns] cho thời gian. Kiểu gọn chỉ dùng bên trong.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = np.asarray(df[col], dtype=object)
+    for col in TIME_COLUMNS:
+        if col in df.columns and df[col].dtype != 'datetime64[ns]':
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype('datetime64[ns]')
+    return df
+
+def _partition_months(df):
+    """Tháng ('YYYY-MM') của từng dòng theo Timestamp (NaN nếu không có Timestamp hợp lệ)."""
+    months = pd.to_datetime(df['Timestamp'], errors='coerce').to_numpy(dtype='datetime64[M]')
+    # Chỉ định dạng chuỗi cho các tháng khác nhau (vài chục), không phải cho từng dòng
+    codes, unique_months = pd.factorize(months)
+    labels = np.append(pd.DatetimeIndex(unique_months).strftime(PARTITION_MONTH_FORMAT).to_numpy(dtype=object), np.nan)
+    return pd.Series(labels[codes], index=df.index)
 
-def load_attendance():
-    if os.path.exists(ATTENDANCE_FILE):
+def _write_partition(month, df_month, partition_dir=None):
+    """Ghi một phân vùng tháng ra file tạm rồi thay thế, để không làm hỏng phân vùng nếu bị ngắt giữa chừng."""
+    snapshot_format = _snapshot_format()
+    path = _partition_path(month, snapshot_format, partition_dir)
+    df_to_save = df_month.copy()
+    for col in ATTENDANCE_COLUMNS:
+        if col not in df_to_save.columns:
+            df_to_save[col] = pd.NA
+    # Phân vùng lưu theo thứ tự thời gian để khi đọc (ghép các tháng nối tiếp) không phải sắp xếp lại
+    df_to_save = _sort_by_time(df_to_save[ATTENDANCE_COLUMNS].reset_index(drop=True))
+
+    tmp_file = path + '.tmp'
+    if snapshot_format == 'csv':
+        for col in TIME_COLUMNS:
+            if pd.api.types.is_datetime64_any_dtype(df_to_save[col]):
+                df_to_save[col] = df_to_save[col].dt.strftime(TIME_FORMAT)
+        df_to_save.to_csv(tmp_file, index=False)
+    elif snapshot_format == 'parquet':
+        _typed_attendance(df_to_save).to_parquet(tmp_file, index=False)
+    else:
+        # Feather không nén để có thể đọc trực tiếp qua memory map
+        _typed_attendance(df_to_save).to_feather(tmp_file, compression='uncompressed')
+    os.replace(tmp_file, path)
+    _file_cache.pop(path, None)
+
+    # Đổi định dạng: bỏ file cùng tháng ở định dạng cũ
+    for other_format in PARTITION_EXTENSIONS:
+        if other_format != snapshot_format:
+            _remove_file(_partition_path(month, other_format, partition_dir))
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+    _file_cache.pop(path, None)
+
+def _remove_partition(month):
+    for snapshot_format in PARTITION_EXTENSIONS:
+        _remove_file(_partition_path(month, snapshot_format))
+
+def _ensure_partitions():
+    """Lần chạy đầu: tách attendance.csv một file (định dạng cũ, nếu có) thành các phân vùng tháng."""
+    store = current_store()
+    if os.path.isdir(store.ATTENDANCE_PARTITION_DIR):
+        return
+    df = _empty_attendance_df()
+    if os.path.exists(store.ATTENDANCE_FILE):
         try:
-            df = pd.read_csv(ATTENDANCE_FILE)
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-            df['UserID'] = df['UserID'].astype(str)
-            # Chuyển đổi CheckInTime và CheckOutTime sang datetime (nếu có)
-            if 'CheckInTime' in df.columns:
-                df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
-            if 'CheckOutTime' in df.columns:
-                df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
-            return df
-        except pd.errors.EmptyDataError:
-            print(f"File {ATTENDANCE_FILE} rỗng hoặc không đúng định dạng. Trả về DataFrame rỗng.")
-            return pd.DataFrame(columns=['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime'])
+            df = _read_partition_file(store.ATTENDANCE_FILE)
         except Exception as e:
-            print(f"Lỗi khi tải dữ liệu chấm công từ {ATTENDANCE_FILE}: {e}")
-            return pd.DataFrame(columns=['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime'])
+            print(f"Lỗi khi tải dữ liệu chấm công từ {store.ATTENDANCE_FILE}: {e}")
+            return
+
+    # Ghi vào thư mục tạm rồi đổi tên, để một lần tách dở dang không bị coi là đã xong
+    tmp_dir = store.ATTENDANCE_PARTITION_DIR + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for month, df_month in df.groupby(_partition_months(df)):
+        _write_partition(month, df_month, partition_dir=tmp_dir)
+    os.replace(tmp_dir, store.ATTENDANCE_PARTITION_DIR)
+    if not df.empty:
+        print(f"Đã tách {len(df)} bản ghi từ {store.ATTENDANCE_FILE} sang các phân vùng tháng trong {store.ATTENDANCE_PARTITION_DIR}.")
+
+def _archive_manifest_path():
+    return os.path.join(current_store().ATTENDANCE_ARCHIVE_DIR, ARCHIVE_MANIFEST_NAME)
+
+def _read_archive_manifest():
+    try:
+        with open(_archive_manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _archive_signature():
+    """Chữ ký của lưu trữ: manifest được ghi lại sau mỗi lần phân vùng lưu trữ thay đổi, nên chỉ cần stat một file."""
+    return _signature_as_list(_file_signature(_archive_manifest_path()))
+
+def _archived_before():
+    """Mốc lưu trữ: mọi dòng trong lưu trữ đều có Timestamp trước mốc này. None nếu chưa lưu trữ lần nào."""
+    value = _read_archive_manifest().get('archived_before')
+    return pd.Timestamp(value) if value else None
+
+def _range_needs_archive(start_date=None):
+    """Khoảng ngày bắt đầu từ start_date (None = từ đầu) có cần đọc tới lưu trữ không."""
+    archived_before = _archived_before()
+    return archived_before is not None and (start_date is None or pd.Timestamp(start_date) < archived_before)
+
+def _write_archive_manifest(archived_before=None):
+    """Ghi lại manifest (tăng version) sau mỗi lần phân vùng lưu trữ thay đổi; archived_before None = giữ mốc cũ."""
+    manifest = _read_archive_manifest()
+    if archived_before is not None:
+        manifest['archived_before'] = archived_before.strftime(TIME_FORMAT)
+    data = {'archived_before': manifest.get('archived_before'), 'version': manifest.get('version', 0) + 1}
+    os.makedirs(current_store().ATTENDANCE_ARCHIVE_DIR, exist_ok=True)
+    tmp_file = _archive_manifest_path() + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, _archive_manifest_path())
+
+def _archive_format():
+    """Định dạng ghi phân vùng lưu trữ: parquet (nén zstd) nếu có pyarrow, không thì CSV nén gzip."""
+    global _pyarrow_available
+    if _pyarrow_available is None:
+        _pyarrow_available = importlib.util.find_spec('pyarrow') is not None
+    return 'parquet' if _pyarrow_available else 'csv'
+
+def _archive_path(month, archive_format=None):
+    return os.path.join(current_store().ATTENDANCE_ARCHIVE_DIR, month + ARCHIVE_EXTENSIONS[archive_format or _archive_format()])
+
+def _list_archive_partitions():
+    """Các tháng ('YYYY-MM') đang có phân vùng lưu trữ, sắp xếp tăng dần."""
+    store = current_store()
+    if not os.path.isdir(store.ATTENDANCE_ARCHIVE_DIR):
+        return []
+    months = set()
+    for file_name in os.listdir(store.ATTENDANCE_ARCHIVE_DIR):
+        for extension in ARCHIVE_EXTENSIONS.values():
+            if file_name.endswith(extension) and _is_partition_month(file_name[:-len(extension)]):
+                months.add(file_name[:-len(extension)])
+    return sorted(months)
+
+def _read_archive_file(path):
+    if path.endswith(ARCHIVE_EXTENSIONS['parquet']):
+        return pd.read_parquet(path)
+    return _parse_attendance_times(pd.read_csv(path, dtype={'UserID': str}, compression='gzip'))
+
+def _read_archive_partition(month, cached=True):
+    """Phân vùng lưu trữ của tháng, None nếu không có. cached=False: không giữ lại trong _file_cache (đọc luồng)."""
+    for archive_format in ARCHIVE_EXTENSIONS:
+        path = _archive_path(month, archive_format)
+        if os.path.exists(path):
+            if not cached and path not in _file_cache:
+                return _read_archive_file(path)
+            return _read_cached_file(path, _read_archive_file)
+    return None
+
+def _write_archive_partition(month, df_month):
+    """Ghi (thay thế) phân vùng lưu trữ của tháng; DataFrame rỗng thì xóa phân vùng."""
+    archive_format = _archive_format()
+    path = _archive_path(month, archive_format)
+    for other_format in ARCHIVE_EXTENSIONS:
+        if other_format != archive_format:
+            _remove_file(_archive_path(month, other_format))
+    if df_month.empty:
+        _remove_file(path)
+        return
+    os.makedirs(current_store().ATTENDANCE_ARCHIVE_DIR, exist_ok=True)
+    df_to_save = _sort_by_time(df_month[ATTENDANCE_COLUMNS].reset_index(drop=True))
+    tmp_file = path + '.tmp'
+    if archive_format == 'parquet':
+        _typed_attendance(df_to_save.copy()).to_parquet(tmp_file, index=False, compression='zstd')
     else:
-        print(f"File {ATTENDANCE_FILE} không tồn tại. Tạo DataFrame rỗng và lưu.")
-        df = pd.DataFrame(columns=['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime'])
-        df.to_csv(ATTENDANCE_FILE, index=False)
+        df_to_save = df_to_save.copy()
+        for col in TIME_COLUMNS:
+            if pd.api.types.is_datetime64_any_dtype(df_to_save[col]):
+                df_to_save[col] = df_to_save[col].dt.strftime(TIME_FORMAT)
+        df_to_save.to_csv(tmp_file, index=False, compression='gzip')
+    os.replace(tmp_file, path)
+    _file_cache.pop(path, None)
+
+def _row_keys(df):
+    return pd.MultiIndex.from_arrays([df['UserID'].astype(str), pd.to_datetime(df['Timestamp'])])
+
+def _without_keys_of(df, other):
+    """Các dòng của df không trùng (UserID, Timestamp) với dòng nào của other."""
+    if df.empty or other is None or other.empty:
+        return df
+    return df[~_row_keys(df).isin(_row_keys(other))]
+
+def _with_archive(df_hot, month, cached=True):
+    """Dữ liệu nóng của tháng (có thể None) cộng thêm các dòng của tháng đó trong lưu trữ."""
+    archived = _read_archive_partition(month, cached)
+    if archived is None or archived.empty:
+        return df_hot
+    if df_hot is None or df_hot.empty:
+        return archived
+    # Một dòng chỉ có ở cả hai nơi khi lần lưu trữ trước bị ngắt giữa chừng: giữ bản trong dữ liệu nóng
+    return pd.concat([_without_keys_of(archived, df_hot), df_hot], ignore_index=True)
+
+def _archive_mask(df, archived_before, user_state):
+    """
+    Các dòng thuộc về lưu trữ: Timestamp trước archived_before, trừ ca đang mở của người dùng
+    (dòng check-in có Timestamp = OpenCheckIn trong chỉ mục trạng thái), vì lượt check-out sau đó
+    còn cập nhật dòng này trong dữ liệu nóng.
+    """
+    mask = pd.to_datetime(df['Timestamp']) < archived_before
+    open_check_ins = [(user_id, pd.Timestamp(state['OpenCheckIn']))
+                      for user_id, state in user_state.items() if state.get('OpenCheckIn')]
+    candidates = mask & df['CheckOutTime'].isna()
+    if open_check_ins and candidates.any():
+        is_open = _row_keys(df[candidates]).isin(pd.MultiIndex.from_tuples(open_check_ins))
+        mask.loc[candidates[candidates].index[is_open]] = False
+    return mask
+
+def _apply_journal(df, journal):
+    """
+    Gộp (fold) journal vào snapshot: các bản ghi 'I' được nối thêm,
+    các bản ghi 'U' gán CheckOutTime cho dòng có cùng (UserID, Timestamp).
+    """
+    inserts = journal.loc[journal['Op'] == JOURNAL_OP_INSERT, ATTENDANCE_COLUMNS]
+    updates = journal.loc[journal['Op'] == JOURNAL_OP_UPDATE, ['UserID', 'Timestamp', 'CheckOutTime']]
+
+    if not inserts.empty:
+        df = inserts.reset_index(drop=True) if df.empty else pd.concat([df, inserts], ignore_index=True)
+
+    if not updates.empty and not df.empty:
+        updates = updates.drop_duplicates(subset=['UserID', 'Timestamp'], keep='last')
+        updates = updates.rename(columns={'CheckOutTime': '_JournalCheckOut'})
+        df = df.merge(updates, on=['UserID', 'Timestamp'], how='left')
+        has_update = df['_JournalCheckOut'].notna()
+        df.loc[has_update, 'CheckOutTime'] = df.loc[has_update, '_JournalCheckOut']
+        df = df.drop(columns='_JournalCheckOut')
+    return df
+
+def _use_sqlite():
+    return config.STORAGE_BACKEND == "sqlite"
+
+def _user_mask(df, user_id):
+    """Khớp chính xác UserID hoặc UserID dạng 'ID_Tên' (giống lọc trong sqlite_backend)."""
+    user_ids = df['UserID'].astype(str)
+    return (user_ids == user_id) | user_ids.str.startswith(user_id + '_')
+
+def _filter_attendance(df, user_id=None, start_date=None, end_date=None):
+    """Lọc theo người dùng và khoảng ngày [start_date, end_date] (tính cả hai đầu)."""
+    if df.empty:
         return df
+    mask = pd.Series(True, index=df.index)
+    if user_id:
+        mask &= _user_mask(df, user_id)
+    if start_date is not None:
+        mask &= df['Timestamp'] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= df['Timestamp'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    return df[mask]
+
+def load_attendance(user_id=None, start_date=None, end_date=None):
+    """
+    Tải dữ liệu chấm công, có thể lọc theo người dùng và khoảng ngày.
+    Với STORAGE_BACKEND = "sqlite" các bộ lọc là truy vấn khoảng trên chỉ mục;
+    với CSV, lọc theo ngày chỉ mở các phân vùng tháng giao với khoảng ngày.
+    Cột UserID/Name/CheckType là chuỗi và thời gian là datetime64[ns] với mọi kiểu lưu trữ (xem _plain_attendance).
+    """
+    store = current_store()
+    if _use_sqlite():
+        if user_id or start_date is not None or end_date is not None:
+            return _plain_attendance(sqlite_backend.load_attendance(user_id, start_date, end_date))
+        key = ('sqlite', _write_version, _file_signature(store.SQLITE_DB_FILE))
+        return _cached_load(key, sqlite_backend.load_attendance)
+    with store.lock:
+        if start_date is not None or end_date is not None:
+            # Chỉ đọc tới lưu trữ khi khoảng ngày bắt đầu trước mốc lưu trữ
+            include_archive = _range_needs_archive(start_date)
+            months = _csv_months(include_archive)
+            df = _read_csv_attendance(_months_in_range(months, start_date, end_date), include_archive)
+        else:
+            df = load_csv_attendance()
+    if user_id or start_date is not None or end_date is not None:
+        df = _filter_attendance(df, user_id, start_date, end_date).copy()
+    return _plain_attendance(df)
+
+def load_csv_attendance():
+    """Tải toàn bộ các phân vùng tháng và gộp journal vào (qua cache trong tiến trình)."""
+    return _cached_load(_csv_cache_key(), _read_csv_attendance)
+
+def _csv_cache_key(include_archive=True):
+    # Khóa được tính trước khi đọc: nếu file đổi trong lúc đọc, lần gọi sau sẽ đọc lại
+    archive_signature = _archive_signature() if include_archive else None
+    return ('csv', include_archive, _write_version, tuple(map(tuple, _snapshot_signature())),
+            _file_signature(current_store().ATTENDANCE_JOURNAL_FILE), archive_signature)
+
+def _sorted_attendance(include_archive=True):
+    """
+    (dữ liệu chấm công dạng CompactAttendance đã sắp theo Timestamp, cache chứa nó), lấy thẳng từ cache (không được sửa).
+    include_archive=False: chỉ dữ liệu nóng (CSV), cache riêng để truy vấn dữ liệu gần đây không phải nạp lưu trữ.
+    """
+    store = current_store()
+    if _use_sqlite():
+        key = ('sqlite', _write_version, _file_signature(store.SQLITE_DB_FILE))
+        # sqlite_backend.load_attendance đã trả về theo thứ tự Timestamp
+        return _cached_compact(key, sqlite_backend.load_attendance), store.attendance_cache
+    with store.lock:
+        if include_archive:
+            return _cached_compact(_csv_cache_key(), _read_csv_attendance), store.attendance_cache
+        compact = _cached_compact(
+            _csv_cache_key(include_archive=False), lambda: _read_csv_attendance(include_archive=False),
+            store.hot_attendance_cache)
+        return compact, store.hot_attendance_cache
+
+def _query_index(compact, cache):
+    """
+    Chỉ mục cho query_attendance, dựng một lần cho mỗi phiên bản cache:
+    mảng Timestamp (giây epoch, đã sắp xếp) và, cho từng UserID, (vị trí các dòng, Timestamp của các dòng đó) tăng dần.
+    """
+    if cache['index'] is None or cache['index'][0] is not compact:
+        times = compact.frame['Timestamp'].to_numpy()
+        code_positions = compact.frame.groupby('UserCode', sort=False).indices
+        # Một UserID có thể có nhiều mã (mỗi tên từng dùng một mã): gộp vị trí các mã đó lại
+        user_positions = {}
+        for code, positions in code_positions.items():
+            user_positions.setdefault(str(compact.users['UserID'].iat[code]), []).append(positions)
+        user_index = {}
+        for user, positions in user_positions.items():
+            positions = positions[0] if len(positions) == 1 else np.sort(np.concatenate(positions), kind='stable')
+            user_index[user] = (positions, times[positions])
+        cache['index'] = (compact, times, user_index)
+    return cache['index'][1:]
+
+def _epoch(value):
+    return int(np.datetime64(value.to_datetime64(), 's').astype(np.int64))
+
+def _query_bounds(start=None, end=None):
+    """
+    Đổi start/end thành giây epoch cho searchsorted trên khoảng [lower, upper).
+    Ngày (date hoặc chuỗi 'YYYY-MM-DD') ở end được tính trọn ngày; datetime ở end được tính đến đúng thời điểm đó.
+    """
+    # Dữ liệu lưu theo giây: làm tròn lên cận dưới để không lấy dòng sớm hơn start
+    lower = _epoch(pd.Timestamp(start).ceil('s')) if start is not None else None
+    upper = None
+    if end is not None:
+        end_time = pd.Timestamp(end)
+        is_whole_day = (isinstance(end, str) and len(end.strip()) <= 10) or not isinstance(end, (str, datetime))
+        if is_whole_day:
+            upper = _epoch(end_time.normalize() + pd.Timedelta(days=1))
+        else:
+            # Tính cả thời điểm end: cận trên là giây ngay sau end
+            upper = _epoch(end_time.floor('s')) + 1
+    return lower, upper
+
+def _search_range(times, lower, upper):
+    """Vị trí [lo, hi) của các phần tử trong khoảng [lower, upper) của mảng times đã sắp xếp."""
+    lo = int(np.searchsorted(times, lower, side='left')) if lower is not None else 0
+    hi = int(np.searchsorted(times, upper, side='left')) if upper is not None else len(times)
+    return lo, max(lo, hi)
+
+def _query_rows(user_id=None, start=None, end=None, check_type=None):
+    """
+    (dữ liệu đang cache, cache chứa nó, mảng vị trí các dòng khớp theo thứ tự thời gian) cho query_attendance /
+    query_sessions; vị trí là None khi không có dòng nào.
+    """
+    # Khoảng bắt đầu sau mốc lưu trữ chỉ cần dữ liệu nóng
+    compact, cache = _sorted_attendance(include_archive=_use_sqlite() or _range_needs_archive(start))
+    if compact.empty:
+        return compact, cache, None
+    times, user_index = _query_index(compact, cache)
+    lower, upper = _query_bounds(start, end)
+
+    if user_id:
+        # So khớp không phân biệt hoa thường, như báo cáo của trang quản trị trước đây
+        user_id = str(user_id).upper()
+        prefix = user_id + '_'
+        positions = []
+        for key, (key_positions, key_times) in user_index.items():
+            key = key.upper()
+            if key == user_id or key.startswith(prefix):
+                lo, hi = _search_range(key_times, lower, upper)
+                positions.append(key_positions[lo:hi])
+        if not positions:
+            return compact, cache, None
+        rows = positions[0] if len(positions) == 1 else np.sort(np.concatenate(positions), kind='stable')
+    else:
+        lo, hi = _search_range(times, lower, upper)
+        rows = np.arange(lo, hi)
+
+    if check_type is not None:
+        rows = rows[compact.frame['CheckType'].to_numpy()[rows] == check_type_code(check_type)]
+    return compact, cache, rows
+
+def query_attendance(user_id=None, start=None, end=None, check_type=None):
+    """
+    Truy vấn dữ liệu chấm công theo người dùng, khoảng thời gian [start, end] và loại chấm công.
+    Dữ liệu được giữ sắp theo Timestamp trong cache nên khoảng thời gian được tìm bằng searchsorted
+    (tìm nhị phân): O(log n + k) thay vì so sánh cả n dòng. Với user_id, chỉ tìm trong vị trí các dòng
+    của người dùng đó (khớp UserID hoặc UserID dạng 'ID_Tên' như load_attendance, nhưng không phân biệt hoa thường).
+    end là ngày thì tính trọn ngày đó. Trả về bản sao (sửa được) các dòng khớp, theo thứ tự thời gian.
+    """
+    compact, _, rows = _query_rows(user_id, start, end, check_type)
+    if rows is None:
+        return _empty_attendance_df()
+    # Chỉ đổi k dòng kết quả ra DataFrame
+    return from_compact(compact, rows)
+
+def _cached_sessions(compact, cache):
+    """Bảng ca (SessionTable) của dữ liệu đang cache, dựng một lần cho mỗi phiên bản cache."""
+    if cache['sessions'] is None or cache['sessions'][0] is not compact:
+        cache['sessions'] = (compact, to_sessions(compact))
+    return cache['sessions'][1]
+
+def query_sessions(user_id=None, start=None, end=None):
+    """
+    Như query_attendance nhưng trả về bảng ca (SessionTable: mã người dùng, giờ vào/ra int64, cờ trạng thái) của các
+    dòng khớp, để tính thời lượng và trạng thái bằng phép tính trên cột mà không phải đổi ra DataFrame chấm công.
+    """
+    compact, cache, rows = _query_rows(user_id, start, end)
+    sessions = _cached_sessions(compact, cache)
+    return sessions.take(rows if rows is not None else slice(0, 0))
+
+def _csv_months(include_archive=True):
+    """Các tháng có dữ liệu nóng, cộng các tháng có phân vùng lưu trữ nếu include_archive."""
+    months = _list_partitions()
+    if include_archive:
+        months = sorted(set(months) | set(_list_archive_partitions()))
+    return months
+
+def _read_month(month, include_archive=True):
+    """Dữ liệu nóng của tháng cộng phần lưu trữ của tháng đó (nếu include_archive), None nếu không có."""
+    df = _read_partition(month)
+    return _with_archive(df, month) if include_archive else df
+
+def _read_csv_attendance(months=None, include_archive=True):
+    """
+    Đọc các phân vùng tháng được chỉ định (mặc định: tất cả), kể cả phần lưu trữ nếu include_archive,
+    và gộp journal vào, sắp theo Timestamp.
+    """
+    store = current_store()
+    if months is None:
+        months = _csv_months(include_archive)
+    try:
+        frames = [df for df in (_read_month(month, include_archive) for month in months) if df is not None and not df.empty]
+    except Exception as e:
+        print(f"Lỗi khi tải dữ liệu chấm công từ {store.ATTENDANCE_PARTITION_DIR}: {e}")
+        return _empty_attendance_df()
+    df = pd.concat(frames, ignore_index=True) if frames else _empty_attendance_df()
+
+    try:
+        journal = _read_journal()
+    except Exception as e:
+        print(f"Lỗi khi đọc journal chấm công {store.ATTENDANCE_JOURNAL_FILE}: {e}")
+        journal = None
+    if journal is not None:
+        df = _apply_journal(df, journal)
+    df = _sort_by_time(df)
+    if _snapshot_format() != 'csv' and not df.empty:
+        # Gộp nhiều tháng/journal làm mất kiểu category -> giữ kiểu cột giống trong file phân vùng
+        for col in CATEGORICAL_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+    return df
+
+def _read_partition_for_stream(month):
+    """Như _read_partition nhưng không giữ kết quả trong _file_cache, để đọc luồng không tích lũy cả lịch sử trong bộ nhớ."""
+    path = _existing_partition_path(month)
+    if path is None:
+        return None
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == _file_signature(path):
+        return cached[1]
+    return _read_partition_file(path)
+
+def _read_month_with_journal(month, include_archive=True):
+    """Một tháng dữ liệu (kể cả phần lưu trữ nếu include_archive) đã gộp các bản ghi journal của tháng đó (gọi trong khóa kho)."""
+    df = _read_partition_for_stream(month)
+    if include_archive:
+        df = _with_archive(df, month, cached=False)
+    if df is None:
+        df = _empty_attendance_df()
+    journal = _read_journal()
+    if journal is not None:
+        journal_month = journal[_partition_months(journal) == month]
+        if not journal_month.empty:
+            df = _apply_journal(df, journal_month)
+    return df
+
+def _day_aligned_chunks(chunks):
+    """
+    Chia lại các khối (đã sắp theo Timestamp) để các dòng của cùng một ngày luôn nằm trong một khối: các dòng thuộc
+    ngày cuối của mỗi khối được chuyển sang khối sau. Khối có thể dài hơn chunk_rows khi một ngày có nhiều dòng hơn.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        days = pd.to_datetime(chunk['Timestamp'], errors='coerce').dt.normalize()
+        split = int(np.searchsorted(days.to_numpy(), days.iloc[-1].to_datetime64(), side='left')) \
+            if len(chunk) and pd.notna(days.iloc[-1]) else len(chunk)
+        carry = chunk.iloc[split:].reset_index(drop=True)
+        if split:
+            yield chunk.iloc[:split].reset_index(drop=True)
+    if carry is not None and not carry.empty:
+        yield carry
+
+def iter_attendance_chunks(user_id=None, start_date=None, end_date=None, chunk_rows=None):
+    """
+    Đọc dữ liệu chấm công theo từng khối khoảng chunk_rows dòng (mặc định config.ATTENDANCE_STREAM_CHUNK_ROWS),
+    nối tiếp nhau theo thời gian, với bộ lọc giống load_attendance. Mỗi khối là DataFrame đã có kiểu
+    (datetime64 cho thời gian, category cho UserID/Name/CheckType) và gồm trọn các ngày của nó (không có ngày nào bị
+    chia đôi giữa hai khối), để các chỉ số theo (người dùng, ngày) như đi muộn/tăng ca cộng được qua các khối.
+    CSV đọc lần lượt từng phân vùng tháng (mỗi tháng được gộp journal trong khóa kho), nên bộ nhớ chỉ phụ thuộc
+    kích thước một tháng chứ không phụ thuộc độ dài lịch sử; SQLite đọc qua con trỏ.
+    """
+    store = current_store()
+    chunk_rows = chunk_rows or config.ATTENDANCE_STREAM_CHUNK_ROWS
+    if _use_sqlite():
+        chunks = (_typed_attendance(chunk)
+                  for chunk in sqlite_backend.iter_attendance_chunks(user_id, start_date, end_date, chunk_rows))
+        yield from _day_aligned_chunks(chunks)
+        return
+
+    with store.lock:
+        include_archive = _range_needs_archive(start_date)
+        months = set(_csv_months(include_archive))
+        journal = _read_journal()
+        if journal is not None:
+            months |= set(_partition_months(journal).dropna())
+    for month in _months_in_range(sorted(months), start_date, end_date):
+        with store.lock:
+            df_month = _read_month_with_journal(month, include_archive)
+        if user_id or start_date is not None or end_date is not None:
+            df_month = _filter_attendance(df_month, user_id, start_date, end_date)
+        if df_month.empty:
+            continue
+        df_month = df_month.sort_values('Timestamp', kind='stable')
+        # Ngày không vượt qua ranh giới tháng nên chỉ cần chia lại trong từng phân vùng
+        chunks = (df_month.iloc[start:start + chunk_rows] for start in range(0, len(df_month), chunk_rows))
+        for chunk in _day_aligned_chunks(chunks):
+            yield _typed_attendance(chunk.copy())
+        del df_month
+
+def summarize_attendance_chunked(user_id=None, start_date=None, end_date=None, chunk_rows=None):
+    """Như summarize_checkin_checkout(load_attendance(...)) nhưng tính theo từng khối, bộ nhớ giới hạn."""
+    return format_summary(aggregate_user_chunks(iter_attendance_chunks(user_id, start_date, end_date, chunk_rows)))
+
+def attendance_metrics_chunked(user_id=None, start_date=None, end_date=None, chunk_rows=None, policy=None):
+    """
+    Như compute_attendance_metrics(load_attendance(...), policy) nhưng tính theo từng khối, bộ nhớ giới hạn.
+    policy mặc định là bảng quy định của chi nhánh (get_attendance_policy).
+    """
+    policy = policy if policy is not None else get_attendance_policy()
+    metrics = compute_attendance_metrics(_empty_attendance_df(), policy)
+    for chunk in iter_attendance_chunks(user_id, start_date, end_date, chunk_rows):
+        metrics = combine_attendance_metrics(metrics, compute_attendance_metrics(chunk, policy))
+    return metrics
+
+# --- Báo cáo song song ---
+# Tổng hợp theo người dùng và chỉ số giờ làm/đi muộn trên toàn bộ lịch sử được chia thành các phần theo phân vùng
+# tháng (thêm băm UserID khi số tháng ít hơn số tiến trình). Mỗi tiến trình con tự đọc phần của mình (không gửi dữ
+# liệu qua pipe) và chỉ trả về tổng hợp của phần đó; mỗi dòng là một ca trọn vẹn nên các phần độc lập và gộp lại
+# (merge_user_aggregates / combine_attendance_metrics) cho đúng kết quả tính trên toàn bộ dữ liệu.
+
+# Các giá trị config mà phần đọc/tính báo cáo dùng, được chép sang tiến trình con
+REPORT_WORKER_CONFIG_NAMES = ['STORAGE_BACKEND', 'ATTENDANCE_SNAPSHOT_FORMAT', 'MAX_WORK_SESSION_HOURS']
+
+def _report_worker_state():
+    """Kho của chi nhánh mà luồng gọi đang dùng và cấu hình cho tiến trình con (đúng cả khi khởi động kiểu spawn)."""
+    store = current_store()
+    return {
+        'site_id': store.site_id,
+        'paths': {name: getattr(store, name) for name in SITE_PATH_NAMES},
+        'lock_file': store.lock.lock_path,
+        'SQLITE_DB_FILE': store.SQLITE_DB_FILE,
+        'config': {name: getattr(config, name) for name in REPORT_WORKER_CONFIG_NAMES},
+    }
+
+def _init_report_worker(state):
+    """Trỏ tiến trình con vào cùng kho với luồng gọi ở tiến trình chính (initializer của ProcessPoolExecutor)."""
+    global _process_store
+    for name, value in state['config'].items():
+        setattr(config, name, value)
+    _process_store = SiteStore(state['site_id'], state['paths'], state['lock_file'], state['SQLITE_DB_FILE'])
+
+def _report_workers(workers=None):
+    workers = config.REPORT_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def _report_tasks(start_date=None, end_date=None, workers=1):
+    """Các phần của báo cáo: (tháng, nhóm băm UserID, số nhóm, có đọc lưu trữ), theo thứ tự thời gian."""
+    if _use_sqlite():
+        include_archive = False
+        first, last = sqlite_backend.time_bounds()
+        months = [] if first is None else \
+            list(pd.period_range(first[:7], last[:7], freq='M').strftime(PARTITION_MONTH_FORMAT))
+    else:
+        with current_store().lock:
+            include_archive = _range_needs_archive(start_date)
+            months = set(_csv_months(include_archive))
+            journal = _read_journal()
+            if journal is not None:
+                months |= set(_partition_months(journal).dropna())
+        months = sorted(months)
+    months = _months_in_range(months, start_date, end_date)
+    buckets = -(-workers // len(months)) if months else 1
+    return [(month, bucket, buckets, include_archive) for month in months for bucket in range(buckets)]
+
+def _user_buckets(user_ids, buckets):
+    """Nhóm của từng dòng theo băm UserID (hash_array cố định giữa các tiến trình)."""
+    return pd.util.hash_array(user_ids.astype(str).to_numpy(dtype=object)) % np.uint64(buckets)
+
+def _report_part(task, kind, user_id=None, start_date=None, end_date=None, policy=None):
+    """
+    Tổng hợp theo người dùng (kind='summary') hoặc chỉ số theo quy định policy (kind='metrics') của một phần, chạy
+    trong tiến trình con.
+    """
+    month, bucket, buckets, include_archive = task
+    if _use_sqlite():
+        # Truy vấn khoảng ngày của tháng (giao với khoảng cần báo cáo) trên chỉ mục Timestamp
+        period = pd.Period(month, freq='M')
+        first_day, last_day = period.start_time.date(), period.end_time.date()
+        if start_date is not None:
+            first_day = max(first_day, pd.Timestamp(start_date).date())
+        if end_date is not None:
+            last_day = min(last_day, pd.Timestamp(end_date).date())
+        df = sqlite_backend.load_attendance(user_id, first_day, last_day) if first_day <= last_day \
+            else _empty_attendance_df()
+    else:
+        with current_store().lock:
+            df = _read_month_with_journal(month, include_archive)
+        if user_id or start_date is not None or end_date is not None:
+            df = _filter_attendance(df, user_id, start_date, end_date)
+    if buckets > 1:
+        df = df[_user_buckets(df['UserID'], buckets) == bucket]
+    df = _typed_attendance(df.reset_index(drop=True))
+    return compute_user_aggregates(df) if kind == 'summary' else compute_attendance_metrics(df, policy)
+
+def _run_report_parts(kind, user_id=None, start_date=None, end_date=None, workers=None, policy=None):
+    """Kết quả của từng phần theo thứ tự thời gian; nhiều tiến trình khi workers > 1 và có hơn một phần."""
+    workers = _report_workers(workers)
+    tasks = _report_tasks(start_date, end_date, workers)
+    part = functools.partial(_report_part, kind=kind, user_id=user_id, start_date=start_date, end_date=end_date,
+                             policy=policy)
+    if workers <= 1 or len(tasks) <= 1:
+        return [part(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_report_worker,
+                             initargs=(_report_worker_state(),)) as pool:
+        return list(pool.map(part, tasks))
+
+def summarize_attendance_parallel(user_id=None, start_date=None, end_date=None, workers=None):
+    """
+    Như summarize_checkin_checkout(load_attendance(...)) nhưng tính trên workers tiến trình (mặc định
+    config.REPORT_WORKERS), mỗi tiến trình một phần lịch sử; bộ nhớ mỗi tiến trình chỉ cần cho một tháng.
+    """
+    return format_summary(merge_user_aggregates(_run_report_parts('summary', user_id, start_date, end_date, workers)))
+
+def attendance_metrics_parallel(user_id=None, start_date=None, end_date=None, workers=None, policy=None):
+    """
+    Như compute_attendance_metrics(load_attendance(...), policy) nhưng tính song song như summarize_attendance_parallel
+    (mỗi (người dùng, ngày) nằm trọn trong một phần). policy mặc định là get_attendance_policy().
+    """
+    policy = policy if policy is not None else get_attendance_policy()
+    metrics = compute_attendance_metrics(_empty_attendance_df(), policy)
+    for part_metrics in _run_report_parts('metrics', user_id, start_date, end_date, workers, policy):
+        metrics = combine_attendance_metrics(metrics, part_metrics)
+    return metrics
+
+def user_report(user_id, start=None, end=None, policy=None):
+    """
+    Báo cáo tổng hợp và chỉ số biểu đồ của một người dùng, từ bảng ca lấy qua query_sessions: (summary, metrics).
+    Giờ làm việc theo ngày lấy từ bảng giờ công đã tổng hợp (get_work_hours, cùng quy tắc tính); đi muộn/tăng ca
+    theo quy định policy (mặc định get_attendance_policy()). user_id khớp không phân biệt hoa thường như query_sessions.
+    """
+    sessions = query_sessions(user_id, start, end)
+    metrics = session_attendance_metrics(sessions, policy if policy is not None else get_attendance_policy())
+    # Bảng giờ công so khớp phân biệt hoa thường: lấy giờ công của đúng các UserID đã lưu của các ca tìm được
+    stored_ids = pd.unique(sessions.users['UserID'].astype(str).to_numpy()[sessions.frame['UserCode'].to_numpy()])
+    hours = [get_work_hours('day', start, end, stored_id) for stored_id in stored_ids]
+    hours = [part[part['UserID'].astype(str) == stored_id] for part, stored_id in zip(hours, stored_ids)]
+    hours = pd.concat(hours) if hours else get_work_hours('day', start, end, user_id)
+    if not hours.empty:
+        metrics['daily_work_hours'] = hours.groupby(hours['Period'].dt.date)['WorkHours'].sum().rename_axis(None).rename(None)
+    return format_summary(session_user_aggregates(sessions)), metrics
 
 def save_attendance(df=None):
+    """
+    Ghi lại dữ liệu chấm công vào các phân vùng tháng và làm rỗng journal.
+    Gọi không có tham số để gộp (compact) journal: chỉ các tháng có bản ghi trong journal được ghi lại.
+    """
+    with current_store().lock:
+        _save_attendance(df)
+
+def _save_attendance(df, months=None):
+    """
+    months: chỉ ghi lại các tháng này (cùng các tháng có bản ghi trong journal, để gộp được journal);
+    None = ghi lại mọi tháng. df luôn là toàn bộ dữ liệu (đã gộp journal, kể cả phần lưu trữ).
+    Các dòng trước mốc lưu trữ (trừ ca đang mở) được ghi vào phân vùng lưu trữ, còn lại vào dữ liệu nóng.
+    """
+    store = current_store()
+
+    _bump_write_version()
+    if df is not None and (months is None or set(months) & _today_snapshot_months()):
+        _discard_today_snapshot()
+    if _use_sqlite():
+        sqlite_backend.save_attendance(df)
+        return
+
+    existing_months = _list_partitions()
+    os.makedirs(store.ATTENDANCE_PARTITION_DIR, exist_ok=True)
+
     if df is None:
-        df_to_save = load_attendance()
+        # Gộp journal không làm đổi dữ liệu -> giữ nguyên các tổng theo người dùng
+        state = _get_user_state()
+        journal = _read_journal()
+        # Giờ công của các ca trong journal được cộng vào bảng tổng hợp (không phải tính lại từ các phân vùng)
+        rollup = combine_daily_rollups([_get_daily_rollup(), _journal_rollup(journal)])
+        if journal is not None:
+            for month, journal_month in journal.groupby(_partition_months(journal)):
+                df_month = _read_partition(month) if month in existing_months else None
+                if df_month is None:
+                    df_month = _empty_attendance_df()
+                _write_partition(month, _apply_journal(df_month, journal_month))
     else:
-        df_to_save = df
-    
-    expected_cols = ['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime']
-    for col in expected_cols:
-        if col not in df_to_save.columns:
-            df_to_save[col] = pd.NA 
+        # Dữ liệu có thể đã bị sửa/xóa -> dựng lại chỉ mục trạng thái và giờ công từ chính DataFrame vừa lưu
+        state = _build_user_state(df)
+        rollup = compute_daily_rollup(df)
+        row_months = _partition_months(df)
+        if row_months.isna().any():
+            print(f"Cảnh báo: Bỏ qua {int(row_months.isna().sum())} bản ghi chấm công không có Timestamp hợp lệ.")
+        archived_before = _archived_before()
+        existing_archive_months = _list_archive_partitions()
+        to_archive = _archive_mask(df, archived_before, state) if archived_before is not None \
+            else pd.Series(False, index=df.index)
+        groups = dict(list(df[~to_archive].groupby(row_months[~to_archive])))
+        archive_groups = dict(list(df[to_archive].groupby(row_months[to_archive])))
+        if months is None:
+            months_to_write = set(existing_months) | set(existing_archive_months) | set(groups) | set(archive_groups)
+        else:
+            journal = _read_journal()
+            months_to_write = set(months)
+            if journal is not None:
+                months_to_write |= set(_partition_months(journal).dropna())
+        archive_changed = False
+        for month in sorted(months_to_write):
+            if month in groups:
+                _write_partition(month, groups[month])
+            else:
+                # Tháng không còn bản ghi nào -> xóa phân vùng
+                _remove_partition(month)
+            if month in archive_groups or month in existing_archive_months:
+                _write_archive_partition(month, archive_groups.get(month, _empty_attendance_df()))
+                archive_changed = True
+        if archive_changed:
+            _write_archive_manifest(archived_before)
+
+    # Các phân vùng đã chứa mọi thay đổi -> làm rỗng journal
+    if os.path.exists(store.ATTENDANCE_JOURNAL_FILE):
+        os.remove(store.ATTENDANCE_JOURNAL_FILE)
+    _file_cache.pop(store.ATTENDANCE_JOURNAL_FILE, None)
+    store.journal_record_count = 0
+    store.user_state = state
+    _save_user_state(store.user_state)
+    _save_rollup(rollup)
+    print(f"Dữ liệu chấm công đã được lưu vào {store.ATTENDANCE_PARTITION_DIR}")
+
+def compact_attendance_journal():
+    """Gộp journal vào các phân vùng tháng (chỉ ghi lại những tháng có thay đổi)."""
+    save_attendance()
+
+def archive_attendance(older_than_days=None):
+    """
+    Chuyển các dòng chấm công cũ hơn older_than_days ngày (mặc định config.ATTENDANCE_ARCHIVE_AFTER_DAYS, tính từ
+    đầu ngày hôm nay) từ các phân vùng nóng sang các phân vùng lưu trữ nén trong ATTENDANCE_ARCHIVE_DIR.
+    Ca đang mở được giữ lại trong dữ liệu nóng dù cũ đến đâu. Các tổng theo người dùng không đổi (dữ liệu chỉ
+    được chuyển chỗ, các lần đọc toàn bộ lịch sử vẫn gộp cả lưu trữ). Ghi lưu trữ trước rồi mới ghi lại dữ liệu nóng,
+    nên nếu bị ngắt giữa chừng thì chạy lại là đủ. Trả về số dòng đã chuyển.
+    Chỉ áp dụng cho STORAGE_BACKEND = "csv" (SQLite đọc/ghi qua chỉ mục, không phụ thuộc độ dài lịch sử).
+    """
+    store = current_store()
+    if older_than_days is None:
+        older_than_days = config.ATTENDANCE_ARCHIVE_AFTER_DAYS
+    cutoff = pd.Timestamp(datetime.now()).normalize() - pd.Timedelta(days=older_than_days)
+
+    with store.lock:
+        if _use_sqlite():
+            print("Lưu trữ dữ liệu chấm công chỉ dùng cho STORAGE_BACKEND = \"csv\".")
+            return 0
+        _bump_write_version()
+        # Gộp journal trước để các phân vùng nóng có đủ dữ liệu (và CheckOutTime mới nhất)
+        if _read_journal() is not None:
+            _save_attendance(None)
+        user_state = _get_user_state()
+        rollup = _get_daily_rollup()
+        previous = _archived_before()
+        archived_before = cutoff if previous is None else max(cutoff, previous)
+        last_month = archived_before.strftime(PARTITION_MONTH_FORMAT)
+
+        moved = 0
+        for month in _list_partitions():
+            if month > last_month:
+                break
+            df_month = _read_partition(month)
+            if df_month is None or df_month.empty:
+                continue
+            to_archive = _archive_mask(df_month, archived_before, user_state)
+            if not to_archive.any():
+                continue
+            df_moved = df_month[to_archive]
+            archived = _read_archive_partition(month, cached=False)
+            if archived is not None:
+                # Dòng đã có trong lưu trữ (lần chạy trước bị ngắt) được thay bằng bản trong dữ liệu nóng
+                df_moved = pd.concat([_without_keys_of(archived, df_moved), df_moved], ignore_index=True)
+            _write_archive_partition(month, df_moved)
+            if to_archive.all():
+                _remove_partition(month)
+            else:
+                _write_partition(month, df_month[~to_archive])
+            moved += int(to_archive.sum())
+
+        _write_archive_manifest(archived_before)
+        # Dữ liệu chỉ chuyển chỗ: giữ nguyên các tổng và giờ công, chỉ lưu lại với chữ ký file mới
+        _save_user_state(user_state)
+        _save_rollup(rollup)
+    print(f"Đã chuyển {moved} bản ghi chấm công trước {archived_before.strftime(TIME_FORMAT)} sang {store.ATTENDANCE_ARCHIVE_DIR}.")
+    return moved
+
+def _format_time(value):
+    return value.strftime(TIME_FORMAT) if pd.notna(value) else ''
+
+def _append_journal(entries):
+    """
+    Ghi nối các bản ghi (op, record) vào journal với một lần fsync cho cả nhóm,
+    để không mất lượt chấm công khi mất điện.
+    """
+    store = current_store()
+
+    is_new_file = not os.path.exists(store.ATTENDANCE_JOURNAL_FILE) or os.path.getsize(store.ATTENDANCE_JOURNAL_FILE) == 0
+    with open(store.ATTENDANCE_JOURNAL_FILE, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if is_new_file:
+            writer.writerow(JOURNAL_COLUMNS)
+        for op, record in entries:
+            writer.writerow([
+                op,
+                record['UserID'],
+                record['Name'],
+                _format_time(record['Timestamp']),
+                record['CheckType'],
+                _format_time(record['CheckInTime']),
+                _format_time(record['CheckOutTime']),
+            ])
+        f.flush()
+        os.fsync(f.fileno())
+
+    if is_new_file:
+        store.journal_record_count = 0
+    elif store.journal_record_count is None:
+        with open(store.ATTENDANCE_JOURNAL_FILE, 'r', encoding='utf-8') as f:
+            store.journal_record_count = sum(1 for _ in f) - 1 - len(entries) # Trừ dòng tiêu đề và các dòng vừa ghi
+    store.journal_record_count += len(entries)
+
+def _build_user_state(df):
+    """Dựng chỉ mục trạng thái/tổng hợp theo người dùng từ toàn bộ dữ liệu chấm công (khởi động/ghi lại snapshot)."""
+    return user_states_from_aggregates(compute_user_aggregates(df))
+
+def _current_state_key():
+    # Lưu trữ chỉ tính qua chữ ký manifest (một file), nên kiểm tra chỉ mục không phụ thuộc độ dài lịch sử
+    return (_snapshot_signature(), _signature_as_list(_file_signature(current_store().ATTENDANCE_JOURNAL_FILE)), _archive_signature())
+
+def _save_user_state(state):
+    """Lưu chỉ mục kèm chữ ký (mtime, size) của các phân vùng/journal để lần khởi động sau kiểm tra độ mới."""
+    store = current_store()
+
+    data = {
+        'snapshot': _snapshot_signature(),
+        'journal': _file_signature(store.ATTENDANCE_JOURNAL_FILE),
+        'archive': _archive_signature(),
+        'users': state,
+    }
+    tmp_file = store.ATTENDANCE_INDEX_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file, store.ATTENDANCE_INDEX_FILE)
+    store.user_state_key = (data['snapshot'], _signature_as_list(data['journal']), data['archive'])
+
+def _get_user_state():
+    """
+    Trả về chỉ mục trạng thái (gọi trong khóa kho). Nếu dữ liệu đã bị tiến trình khác ghi kể từ lần đọc trước,
+    dùng file chỉ mục nếu nó khớp với các phân vùng/journal hiện tại; nếu không (mất chỉ mục, file bị sửa tay...)
+    thì dựng lại từ toàn bộ dữ liệu một lần.
+    """
+    store = current_store()
+
+    current_key = _current_state_key()
+    if store.user_state is not None and store.user_state_key == current_key:
+        return store.user_state
+
+    store.user_state = None
+    store.journal_record_count = None # Journal có thể đã được tiến trình khác ghi thêm -> đếm lại khi cần
+    try:
+        with open(store.ATTENDANCE_INDEX_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if (data.get('snapshot'), data.get('journal'), data.get('archive')) == current_key:
+            store.user_state = data.get('users', {})
+            store.user_state_key = current_key
+    except FileNotFoundError:
+        pass # Chưa có chỉ mục -> dựng mới bên dưới
+    except ValueError as e:
+        print(f"Chỉ mục chấm công {store.ATTENDANCE_INDEX_FILE} bị hỏng: {e}. Sẽ dựng lại.")
+    if store.user_state is None:
+        store.user_state = user_states_from_aggregates(aggregate_user_chunks(iter_attendance_chunks()))
+        _save_user_state(store.user_state)
+    return store.user_state
+
+def _read_rollup_file():
+    """(chữ ký phân vùng, chữ ký lưu trữ) và bảng giờ công theo ngày đọc từ ATTENDANCE_ROLLUP_FILE, (None, None) nếu không đọc được."""
+    store = current_store()
+    try:
+        with open(store.ATTENDANCE_ROLLUP_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        daily = pd.DataFrame({
+            'UserID': np.asarray(data['users'], dtype=object)[np.asarray(data['user'], dtype=np.int64)],
+            'Day': np.asarray(data['day'], dtype=np.int64).astype('datetime64[D]').astype('datetime64[s]'),
+            'WorkSeconds': np.asarray(data['work_seconds'], dtype=np.int64),
+            'Sessions': np.asarray(data['sessions'], dtype=np.int64),
+        })
+    except FileNotFoundError:
+        return None, None
+    except (ValueError, KeyError, IndexError) as e:
+        print(f"Bảng giờ công {store.ATTENDANCE_ROLLUP_FILE} bị hỏng: {e}. Sẽ dựng lại.")
+        return None, None
+    return (data.get('snapshot'), data.get('archive')), daily
+
+def _save_rollup(daily):
+    """Lưu bảng giờ công theo ngày kèm chữ ký các phân vùng/lưu trữ hiện tại (dạng cột, UserID mã hóa thành số)."""
+    store = current_store()
+    user_codes, users = pd.factorize(daily['UserID'])
+    data = {
+        'snapshot': _snapshot_signature(),
+        'archive': _archive_signature(),
+        'users': [str(user_id) for user_id in users],
+        'user': user_codes.tolist(),
+        'day': daily['Day'].to_numpy(dtype='datetime64[D]').astype(np.int64).tolist(),
+        'work_seconds': daily['WorkSeconds'].tolist(),
+        'sessions': daily['Sessions'].tolist(),
+    }
+    tmp_file = store.ATTENDANCE_ROLLUP_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file, store.ATTENDANCE_ROLLUP_FILE)
+    store.rollup_cache['key'] = (data['snapshot'], data['archive'])
+    store.rollup_cache['daily'] = daily
+
+def _get_daily_rollup():
+    """
+    Giờ công theo (người dùng, ngày) của các phân vùng và lưu trữ, chưa gồm journal (gọi trong khóa kho).
+    Dùng bản trong bộ nhớ hoặc file nếu còn khớp chữ ký; nếu không (mất file, dữ liệu bị sửa tay...) thì tính lại
+    từ từng tháng một lần và lưu.
+    """
+    store = current_store()
+    key = (_snapshot_signature(), _archive_signature())
+    if store.rollup_cache['key'] == key:
+        return store.rollup_cache['daily']
+    file_key, daily = _read_rollup_file()
+    if daily is not None and file_key == key:
+        store.rollup_cache['key'] = key
+        store.rollup_cache['daily'] = daily
+        return daily
+    daily = combine_daily_rollups([
+        compute_daily_rollup(df_month) for df_month in
+        (_with_archive(_read_partition_for_stream(month), month, cached=False) for month in _csv_months())
+        if df_month is not None
+    ])
+    _save_rollup(daily)
+    return daily
+
+def _journal_rollup(journal):
+    """
+    Giờ công của các ca đóng trong journal (chưa gộp vào phân vùng): bản ghi 'U' là check-out đóng ca
+    (Timestamp là lúc check-in), bản ghi chèn có đủ check-in/check-out được tính như dòng thường.
+    """
+    if journal is None:
+        return None
+    updates = journal.loc[journal['Op'] == JOURNAL_OP_UPDATE, ['UserID', 'Timestamp', 'CheckOutTime']]
+    updates = updates.drop_duplicates(subset=['UserID', 'Timestamp'], keep='last').dropna()
+    work_seconds = (updates['CheckOutTime'] - updates['Timestamp']).to_numpy(dtype='timedelta64[s]').astype(np.int64)
+    return combine_daily_rollups([
+        compute_daily_rollup(journal[journal['Op'] == JOURNAL_OP_INSERT]),
+        session_rollup(updates['UserID'], updates['Timestamp'], work_seconds),
+    ])
+
+def _cached_journal_rollup():
+    """_journal_rollup của journal hiện tại, tính lại chỉ khi journal đổi (gọi trong khóa kho)."""
+    store = current_store()
+    key = _file_signature(store.ATTENDANCE_JOURNAL_FILE)
+    if store.rollup_cache['journal_key'] != key or key is None:
+        store.rollup_cache['journal'] = _journal_rollup(_read_journal()) if key is not None else None
+        store.rollup_cache['journal_key'] = key
+    return store.rollup_cache['journal']
+
+def _filter_rollup(daily, user_id=None, start_date=None, end_date=None):
+    """Các dòng của bảng giờ công (sắp theo Day) trong khoảng ngày [start_date, end_date] (tìm nhị phân) và của user_id."""
+    if daily is None or daily.empty:
+        return daily
+    days = daily['Day'].to_numpy(dtype='datetime64[D]')
+    lower = 0 if start_date is None else np.searchsorted(days, np.datetime64(pd.Timestamp(start_date).date()), 'left')
+    upper = len(days) if end_date is None else np.searchsorted(days, np.datetime64(pd.Timestamp(end_date).date()), 'right')
+    daily = daily.iloc[lower:upper]
+    if user_id:
+        daily = daily[_user_mask(daily, user_id)]
+    return daily
+
+def get_work_hours(period='day', start_date=None, end_date=None, user_id=None):
+    """
+    Giờ công theo người dùng và kỳ 'day' / 'week' (tuần bắt đầu thứ Hai) / 'month', đọc từ bảng giờ công đã tổng hợp
+    (không quét dữ liệu chấm công), nên truy vấn cả công ty trong một quý chỉ mất vài mili giây.
+    Ca được tính vào ngày check-in, như biểu đồ 'daily_work_hours'. start_date/end_date lọc theo ngày (tính cả hai đầu;
+    tuần/tháng ở hai đầu khoảng chỉ gồm các ngày trong khoảng), user_id khớp UserID hoặc 'ID_Tên'.
+    Trả về DataFrame các cột UserID, Period (ngày đầu kỳ), WorkSeconds, WorkHours, Sessions.
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Kỳ tổng hợp không hợp lệ: '{period}'. Chọn một trong {sorted(ROLLUP_PERIODS)}.")
+    if _use_sqlite():
+        return rollup_by_period(sqlite_backend.load_daily_rollup(user_id, start_date, end_date), period)
+    with current_store().lock:
+        daily = _get_daily_rollup()
+        journal_rollup = _cached_journal_rollup()
+    daily = combine_daily_rollups([_filter_rollup(daily, user_id, start_date, end_date),
+                                   _filter_rollup(journal_rollup, user_id, start_date, end_date)])
+    return rollup_by_period(daily, period)
+
+def get_attendance_policy():
+    """
+    Bảng quy định giờ vào ca / đi muộn / tăng ca của chi nhánh (ATTENDANCE_POLICY_FILE), đọc lại chỉ khi file đổi;
+    chưa có file thì dùng quy định mặc định trong config (DEFAULT_SHIFT_START...).
+    """
+    policy = _read_cached_file(current_store().ATTENDANCE_POLICY_FILE, read_policy_file)
+    return policy if policy is not None else AttendancePolicy()
+
+def attendance_policy_report(user_id=None, start=None, end=None, policy=None):
+    """
+    Đi muộn và tăng ca theo (người dùng, ngày) của cả công ty (hoặc user_id) trong khoảng [start, end], tính vector hóa
+    trên bảng ca lấy qua query_sessions: DataFrame các cột POLICY_REPORT_COLUMNS, sắp theo (UserID, Day).
+    policy mặc định là get_attendance_policy().
+    """
+    sessions = query_sessions(user_id, start, end)
+    return evaluate_policy(sessions, policy if policy is not None else get_attendance_policy())
+
+def get_user_states():
+    """
+    Trạng thái chấm công gần nhất và các tổng của từng người dùng, đọc từ chỉ mục (không quét lịch sử):
+    UserID -> {'Name', 'OpenCheckIn', 'LastCheckIn', 'LastCheckOut', 'TotalCheckIn', ..., 'Status'}.
+    """
+    if _use_sqlite():
+        return sqlite_backend.get_user_states()
+    with current_store().lock:
+        return {user_id: dict(state) for user_id, state in _get_user_state().items()}
 
-    df_to_save = df_to_save[expected_cols]
+def _rebuild_today_snapshot(day):
+    """Dựng lại trạng thái hôm nay từ dữ liệu của hôm qua và hôm nay (gọi trong khóa kho) và lưu lại."""
+    df = load_attendance(start_date=day - timedelta(days=1), end_date=day)
+    users = today_snapshot_from_frame(df, day)
+    write_today_snapshot(current_store().ATTENDANCE_TODAY_FILE, day, users)
+    return users
 
-    for col in ['Timestamp', 'CheckInTime', 'CheckOutTime']:
-        if col in df_to_save.columns and df_to_save[col].dtype == 'datetime64[ns]':
-            df_to_save[col] = df_to_save[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+def _update_today_snapshot(punches):
+    """Cập nhật trạng thái hôm nay sau khi ghi các lượt (gọi trong khóa kho, các lượt đã có trong kho)."""
+    store = current_store()
+    day = date.today()
+    users = read_today_snapshot(store.ATTENDANCE_TODAY_FILE, day)
+    if users is None:
+        _rebuild_today_snapshot(day)
+        return
+    apply_today_punches(users, day, punches)
+    write_today_snapshot(store.ATTENDANCE_TODAY_FILE, day, users)
 
-    df_to_save.to_csv(ATTENDANCE_FILE, index=False)
-    print(f"Dữ liệu chấm công đã được lưu vào {ATTENDANCE_FILE}")
+def _today_snapshot_months():
+    """Các tháng ('YYYY-MM') chứa dòng mà trạng thái hôm nay được dựng từ đó (hôm qua và hôm nay)."""
+    today = date.today()
+    return {day.strftime(PARTITION_MONTH_FORMAT) for day in (today - timedelta(days=1), today)}
+
+def _discard_today_snapshot():
+    """Bỏ trạng thái hôm nay sau khi lịch sử bị sửa/xóa/nhập thêm (gọi trong khóa kho); lần đọc sau sẽ dựng lại."""
+    _remove_file(current_store().ATTENDANCE_TODAY_FILE)
+
+def get_today_attendance():
+    """
+    Lượt Check-in/Check-out gần nhất trong ngày hôm nay của từng người: UserID -> {'Name', 'CheckIn', 'CheckOut'}
+    (chuỗi '%Y-%m-%d %H:%M:%S', None = chưa có). Đọc từ file trạng thái hôm nay (ATTENDANCE_TODAY_FILE) nên không
+    phụ thuộc độ dài lịch sử; qua ngày mới thì rỗng cho tới lượt chấm công đầu tiên.
+    """
+    store = current_store()
+    day = date.today()
+    with store.lock:
+        users = read_today_snapshot(store.ATTENDANCE_TODAY_FILE, day)
+        if users is None:
+            users = _rebuild_today_snapshot(day)
+    return users
+
+def get_open_sessions():
+    """Những người đang trong ca (đã check-in, chưa check-out): UserID -> Timestamp check-in."""
+    return {user_id: state['OpenCheckIn'] for user_id, state in get_user_states().items() if state['OpenCheckIn']}
+
+def get_attendance_summary():
+    """Báo cáo tổng hợp (cùng cột với summarize_checkin_checkout) lấy từ các tổng đã lưu, chi phí O(số người dùng)."""
+    return format_summary(aggregates_from_user_states(get_user_states()))
+
+def rebuild_attendance_summary():
+    """Tính lại toàn bộ các tổng theo người dùng từ lịch sử chấm công và lưu đè chỉ mục."""
+    store = current_store()
+
+    with store.lock:
+        _bump_write_version()
+        if _use_sqlite():
+            return sqlite_backend.rebuild_user_state()
+        store.user_state = user_states_from_aggregates(aggregate_user_chunks(iter_attendance_chunks()))
+        _save_user_state(store.user_state)
+
+def verify_attendance_summary():
+    """So sánh báo cáo từ các tổng đã lưu với báo cáo tính lại đầy đủ. Trả về True nếu khớp."""
+    stored = get_attendance_summary().astype(str).reset_index(drop=True)
+    recomputed = summarize_attendance_parallel().astype(str).reset_index(drop=True)
+    matches = stored.equals(recomputed)
+    if not matches:
+        print("Cảnh báo: Tổng hợp chấm công đã lưu không khớp với dữ liệu. Hãy gọi rebuild_attendance_summary().")
+    return matches
 
 def record_attendance(user_id, name, check_type):
-    df = load_attendance()
-    current_time = datetime.now()
-    
-    last_record = df[(df['UserID'] == user_id)].sort_values(by='Timestamp', ascending=False).head(1)
-    
+    """
+    Ghi một lượt chấm công. Chỉ ghi nối vào journal nên thời gian không phụ thuộc
+    vào kích thước lịch sử; journal được gộp vào các phân vùng tháng theo định kỳ.
+    Trả về False nếu lượt bị bỏ vì trùng (xem record_attendance_batch).
+    """
+    return bool(record_attendance_batch([(user_id, name, check_type, datetime.now())]))
+
+def record_attendance_batch(punches, dedup_window_seconds=None):
+    """
+    Ghi một nhóm lượt chấm công (user_id, name, check_type, punch_time) theo thứ tự (group commit):
+    CSV ghi nối cả nhóm vào journal với một lần fsync, SQLite dùng một transaction.
+    Lượt cách lượt cùng loại gần nhất của cùng người dùng không quá dedup_window_seconds giây (mặc định
+    config.ATTENDANCE_DEDUP_WINDOW_SECONDS) bị bỏ: kiểm tra trong khóa kho trên chỉ mục trạng thái người dùng
+    (LastCheckIn/LastCheckOut), nên ghi lại cùng lượt từ nhiều khung hình, camera hay tiến trình chỉ tạo một dòng.
+    Khi bật đồng bộ (config.CENTRAL_STORE_DIR), các lượt đã ghi được ghi nối thêm vào outbox cục bộ để gửi lên kho
+    trung tâm sau (sync_attendance_outbox), nên thời gian ghi không phụ thuộc kho trung tâm.
+    Trả về danh sách các lượt đã ghi.
+    """
+    store = current_store()
+    if not punches:
+        return []
+    with store.lock:
+        recorded = _record_punches(punches, dedup_window_seconds)
+        if recorded and config.CENTRAL_STORE_DIR:
+            append_outbox(store.ATTENDANCE_OUTBOX_FILE, config.KIOSK_ID, recorded)
+    return recorded
+
+def _record_punches(punches, dedup_window_seconds=None):
+    """Ghi các lượt chấm công không trùng vào kho (gọi trong khóa kho), không ghi outbox. Trả về các lượt đã ghi."""
+    store = current_store()
+    if dedup_window_seconds is None:
+        dedup_window_seconds = config.ATTENDANCE_DEDUP_WINDOW_SECONDS
+    if _use_sqlite():
+        recorded = sqlite_backend.record_attendance_batch(punches, dedup_window_seconds)
+        if recorded:
+            _bump_write_version()
+            _update_today_snapshot(recorded)
+        return recorded
+
+    user_state = _get_user_state()
+    entries = []
+    recorded = []
+    for punch in punches:
+        user_id, name, check_type, punch_time = punch
+        # user_state được cập nhật sau từng lượt nên các lượt trùng trong cùng nhóm cũng bị bỏ
+        if is_duplicate_punch(user_state.get(user_id), check_type, punch_time.replace(microsecond=0), dedup_window_seconds):
+            print(f"Bỏ qua lượt {check_type} trùng của {name} (ID: {user_id}) lúc {punch_time.strftime(TIME_FORMAT)}")
+            continue
+        entries.extend(_journal_entries_for_punch(user_state, user_id, name, check_type, punch_time))
+        recorded.append(punch)
+    if not recorded:
+        return recorded
+    _bump_write_version()
+    _append_journal(entries)
+    _save_user_state(user_state)
+    _update_today_snapshot(recorded)
+
+    if store.journal_record_count is not None and store.journal_record_count >= config.JOURNAL_COMPACT_THRESHOLD:
+        compact_attendance_journal()
+    return recorded
+
+def _journal_entries_for_punch(user_state, user_id, name, check_type, punch_time):
+    """Các bản ghi journal cho một lượt chấm công; cập nhật tăng dần user_state."""
+    current_time = punch_time.replace(microsecond=0)
+    state = user_state.get(user_id) or new_user_state(name)
+    entries = []
+
     new_record = {
         'UserID': user_id,
         'Name': name,
@@ -70,148 +1512,524 @@ def record_attendance(user_id, name, check_type):
 
     if check_type == "Check-in":
         new_record['CheckInTime'] = current_time
-        df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
+        entries.append((JOURNAL_OP_INSERT, new_record))
         print(f"{name} (ID: {user_id}) đã Check-in lúc {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
     elif check_type == "Check-out":
         new_record['CheckOutTime'] = current_time
         
-        if not last_record.empty and pd.isna(last_record['CheckOutTime'].iloc[0]):
-            df.loc[last_record.index[0], 'CheckOutTime'] = current_time
+        if state['OpenCheckIn']:
+            # Ca đang mở: chỉ ghi bản ghi cập nhật CheckOutTime cho dòng check-in đó (tra trực tiếp từ chỉ mục)
+            update_record = dict(new_record, Timestamp=datetime.strptime(state['OpenCheckIn'], TIME_FORMAT))
+            entries.append((JOURNAL_OP_UPDATE, update_record))
             print(f"{name} (ID: {user_id}) đã Check-out lúc {current_time.strftime('%Y-%m-%d %H:%M:%S')} (cập nhật bản ghi cũ)")
         else:
-            df = pd.concat([df, pd.DataFrame([new_record])], ignore_index=True)
+            entries.append((JOURNAL_OP_INSERT, new_record))
             print(f"{name} (ID: {user_id}) đã Check-out lúc {current_time.strftime('%Y-%m-%d %H:%M:%S')} (bản ghi mới)")
-            
-    save_attendance(df)
-
-def summarize_checkin_checkout(df_attendance):
-    print(f"\nDEBUG_SUMMARIZE: --- Bắt đầu hàm summarize_checkin_checkout ---")
-    print(f"DEBUG_SUMMARIZE: Input df_attendance shape: {df_attendance.shape}")
-    print(f"DEBUG_SUMMARIZE: Input df_attendance columns: {df_attendance.columns.tolist()}")
-    print(f"DEBUG_SUMMARIZE: Input df_attendance head:\n{df_attendance.head()}")
-
-    df = df_attendance.copy()
-    
-    # Đảm bảo các cột thời gian là datetime
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-    df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
-    df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
-    
-    # Xóa các hàng có Timestamp NaT nếu có lỗi chuyển đổi
-    df.dropna(subset=['Timestamp'], inplace=True)
-    
-    df = df.sort_values(by=['UserID', 'Timestamp'])
-
-    summary_data = []
-
-    unique_users = df['UserID'].unique()
-    print(f"DEBUG_SUMMARIZE: Unique users found: {unique_users}")
-
-    if len(unique_users) == 0:
-        print("DEBUG_SUMMARIZE: No unique users found in attendance data. Returning empty summary.")
-        # Đảm bảo trả về DataFrame với các cột đúng để tránh lỗi hiển thị
-        return pd.DataFrame(columns=['UserID', 'Name', 'TotalCheckIn', 'TotalCheckOut', 'AvgWorkDuration', 'Status']) 
-
-    for user_id in unique_users:
-        print(f"\nDEBUG_SUMMARIZE: --- Đang xử lý người dùng: {user_id} ---")
-        user_df = df[df['UserID'] == user_id].copy() # Dùng .copy() để tránh SettingWithCopyWarning
-        
-        print(f"DEBUG_SUMMARIZE: user_df for {user_id} shape: {user_df.shape}")
-        print(f"DEBUG_SUMMARIZE: user_df for {user_id} head:\n{user_df.head()}")
-        
-        if user_df.empty:
-            print(f"DEBUG_SUMMARIZE: user_df is empty for {user_id}. Skipping.")
-            continue # Bỏ qua người dùng này nếu không có dữ liệu
 
-        name = user_df['Name'].iloc[-1] if not user_df.empty else "Unknown" 
-        print(f"DEBUG_SUMMARIZE: User Name: {name}")
+    # Cập nhật tăng dần trạng thái và các tổng của người dùng
+    apply_punch(state, name, check_type, current_time)
+    user_state[user_id] = state
+    return entries
 
-        # Tính tổng số lượt Check-in và Check-out thực tế
-        total_check_in = user_df['CheckInTime'].count() # Đếm số bản ghi có giá trị CheckInTime
-        total_check_out = user_df['CheckOutTime'].count() # Đếm số bản ghi có giá trị CheckOutTime
-        print(f"DEBUG_SUMMARIZE: Calculated Total Check-in: {total_check_in}, Total Check-out: {total_check_out}")
+def _existing_punch_times(user_positions, start_time, end_time):
+    """
+    Mọi lượt đã lưu (CheckInTime và CheckOutTime) trong khoảng thời gian của file nhập, dạng (mảng vị trí UserID theo
+    user_positions, mảng giây epoch); người dùng không có trong user_positions bị bỏ qua.
+    Đọc rộng thêm một ngày về trước vì check-out nằm trên dòng check-in của ca (Timestamp là lúc check-in).
+    """
+    users, times = [], []
+    for chunk in iter_attendance_chunks(start_date=(start_time - pd.Timedelta(days=1)).date(), end_date=end_time.date()):
+        positions = chunk['UserID'].astype(str).map(user_positions).to_numpy()
+        for col in ['CheckInTime', 'CheckOutTime']:
+            seconds = epoch_seconds(chunk[col])
+            valid = (seconds != NO_TIME) & pd.notna(positions)
+            users.append(positions[valid].astype(np.int32))
+            times.append(seconds[valid])
+    if not times:
+        return np.empty(0, np.int32), np.empty(0, np.int64)
+    return np.concatenate(users), np.concatenate(times)
 
-        total_work_duration = timedelta(0)
-        valid_pairs_count = 0
-        
-        # Lọc các bản ghi có ít nhất một trong hai CheckInTime/CheckOutTime để tính duration
-        df_filtered_for_duration = user_df.dropna(subset=['CheckInTime', 'CheckOutTime'], how='all')
-        print(f"DEBUG_SUMMARIZE: df_filtered_for_duration shape: {df_filtered_for_duration.shape}")
-        
-        current_check_in_time = None
-        if not df_filtered_for_duration.empty:
-            df_pairs = df_filtered_for_duration.sort_values(by='Timestamp')
-            for index, row in df_pairs.iterrows():
-                # Nếu bản ghi có CheckInTime, đây là điểm bắt đầu tiềm năng của một ca làm việc
-                if pd.notna(row['CheckInTime']):
-                    current_check_in_time = row['CheckInTime']
-                
-                # Nếu bản ghi có CheckOutTime VÀ có current_check_in_time hợp lệ
-                if pd.notna(row['CheckOutTime']) and current_check_in_time is not None:
-                    if row['CheckOutTime'] > current_check_in_time:
-                        duration = row['CheckOutTime'] - current_check_in_time
-                        
-                        # Giới hạn thời gian làm việc tối đa theo config
-                        if duration <= timedelta(seconds=config.MAX_WORK_SESSION_HOURS):
-                            total_work_duration += duration
-                            valid_pairs_count += 1
-                        else:
-                            print(f"DEBUG_SUMMARIZE: Duration for {user_id} exceeded MAX_WORK_SESSION_HOURS: {duration}")
-                    else:
-                        print(f"DEBUG_SUMMARIZE: CheckOutTime before CheckInTime for {user_id}. Skipping pair.")
-                    current_check_in_time = None # Reset cho cặp tiếp theo, dù có hợp lệ hay không hợp lệ về thời gian
-                # else: Nếu không có CheckOutTime hoặc current_check_in_time là None, chỉ cần bỏ qua
-
-        print(f"DEBUG_SUMMARIZE: Valid pairs count: {valid_pairs_count}, Total work duration: {total_work_duration}")
-
-        avg_work_duration = total_work_duration / valid_pairs_count if valid_pairs_count > 0 else timedelta(0)
-        print(f"DEBUG_SUMMARIZE: Avg work duration: {avg_work_duration}")
-
-        status = "Chưa có dữ liệu chấm công" # Mặc định
-        
-        if not user_df.empty:
-            latest_record = user_df.sort_values(by='Timestamp', ascending=False).iloc[0]
-            print(f"DEBUG_SUMMARIZE: Latest record for status check:\n{latest_record}")
-            
-            is_check_in_recorded = pd.notna(latest_record['CheckInTime'])
-            is_check_out_recorded = pd.notna(latest_record['CheckOutTime'])
-            
-            print(f"DEBUG_SUMMARIZE: is_check_in_recorded: {is_check_in_recorded}, is_check_out_recorded: {is_check_out_recorded}")
-
-            if is_check_in_recorded and is_check_out_recorded:
-                status = f"Đã về (Check-out lúc {latest_record['CheckOutTime'].strftime('%H:%M')})"
-            elif is_check_in_recorded and not is_check_out_recorded:
-                status = f"Đang làm việc (Check-in lúc {latest_record['CheckInTime'].strftime('%H:%M')})"
-            elif not is_check_in_recorded and is_check_out_recorded:
-                status = f"Chỉ Check-out (lúc {latest_record['CheckOutTime'].strftime('%H:%M')})"
-            # else: status vẫn là "Chưa có dữ liệu chấm công" nếu cả hai đều NaT
-        
-        print(f"DEBUG_SUMMARIZE: Final Status for {user_id}: {status}")
-
-        summary_data.append({
-            'UserID': user_id,
-            'Name': name,
-            'TotalCheckIn': total_check_in,
-            'TotalCheckOut': total_check_out,
-            'AvgWorkDuration': str(avg_work_duration).split('.')[0] if valid_pairs_count > 0 else '-', 
-            'Status': status,
-        })
-    
-    final_summary = pd.DataFrame(summary_data)
-    print(f"\nDEBUG_SUMMARIZE: --- Hàm summarize_checkin_checkout kết thúc ---")
-    print(f"DEBUG_SUMMARIZE: Final summary DataFrame shape: {final_summary.shape}")
-    print(f"DEBUG_SUMMARIZE: Final summary DataFrame head:\n{final_summary.head()}")
-    return final_summary
+def _insert_attendance_rows(df):
+    """
+    Thêm các dòng chấm công mới (có thể xen giữa lịch sử) trong một lần ghi (gọi trong khóa kho): mỗi tháng có
+    dòng mới được ghi lại một lần, dòng trước mốc lưu trữ vào thẳng lưu trữ. Các tổng theo người dùng chỉ được cập
+    nhật cho người dùng có trong df (xem merge_new_rows), nên chi phí theo kích thước lần nhập chứ không theo lịch sử.
+    """
+    store = current_store()
+
+    _bump_write_version()
+    _discard_today_snapshot()
+    if _use_sqlite():
+        sqlite_backend.insert_attendance_rows(df)
+        return
+    # Gộp journal trước để phân vùng nào cũng đủ dữ liệu khi ghi lại
+    if _read_journal() is not None:
+        _save_attendance(None)
+    # Giờ công cộng dồn được (không phụ thuộc thứ tự) -> chỉ cộng phần của các dòng mới
+    rollup = combine_daily_rollups([_get_daily_rollup(), compute_daily_rollup(df)])
+    # Tổng hợp hiện có của các người dùng được nhập, lấy trước khi ghi (chỉ mục phải khớp dữ liệu chưa có df)
+    states = _get_user_state()
+    imported_users = df['UserID'].astype(str).unique()
+    known = aggregates_from_user_states({user_id: states[user_id] for user_id in imported_users if user_id in states})
+    rescan = users_to_rescan(known, df)
+
+    row_months = _partition_months(df)
+    archived_before = _archived_before()
+    to_archive = pd.Series(False, index=df.index)
+    if archived_before is not None:
+        # Check-in chưa đóng ở cuối mỗi người dùng có thể là ca đang mở -> để ở dữ liệu nóng như _archive_mask
+        last_rows = df.index.isin(df.groupby(df['UserID'].astype(str), observed=True)['Timestamp'].idxmax())
+        to_archive = (df['Timestamp'] < archived_before) & ~(last_rows & df['CheckOutTime'].isna())
+    os.makedirs(store.ATTENDANCE_PARTITION_DIR, exist_ok=True)
+    for month, df_month in df[~to_archive].groupby(row_months[~to_archive]):
+        existing = _read_partition(month)
+        if existing is not None and not existing.empty:
+            df_month = pd.concat([existing, df_month], ignore_index=True)
+        _write_partition(month, df_month)
+    if to_archive.any():
+        for month, df_month in df[to_archive].groupby(row_months[to_archive]):
+            existing = _read_archive_partition(month, cached=False)
+            if existing is not None and not existing.empty:
+                df_month = pd.concat([existing, df_month], ignore_index=True)
+            _write_archive_partition(month, df_month)
+        _write_archive_manifest(archived_before)
+
+    # Người dùng có dòng mới nằm trước dòng đã lưu: đọc lại các dòng của họ từ lượt mới muộn nhất tới thời điểm muộn
+    # nhất đã biết (chỉ các tháng đó) để biết ca gần nhất; các tổng còn lại cộng dồn được
+    recent = None
+    if not rescan.empty:
+        since = rescan.min()
+        recent = load_attendance(start_date=since, end_date=latest_known_times(known.loc[rescan.index]).max().date())
+        recent = recent[recent['UserID'].astype(str).isin(rescan.index) & (recent['Timestamp'] >= since)]
+    states.update(user_states_from_aggregates(merge_new_rows(known, df, recent)))
+    store.user_state = states
+    _save_user_state(store.user_state)
+    _save_rollup(rollup)
+
+def import_attendance(file_path, user_map=None, known_user_ids=(), dedup_window_seconds=None, time_format=None,
+                      chunk_rows=None):
+    """
+    Nhập hàng loạt lượt chấm công từ file CSV/xlsx của máy chấm công khác (cột mã nhân viên, thời gian và tùy chọn
+    loại vào/ra, xem attendance_import.IMPORT_COLUMN_ALIASES). File được đọc và kiểm tra theo khối (vector hóa);
+    mã nhân viên được ánh xạ sang UserID qua user_map (mã -> UserID), hoặc khớp UserID / phần mã trước '_' của
+    người dùng đã có dữ liệu và known_user_ids (ví dụ các UserID trong id_mapping.txt). Lượt cách lượt khác của
+    cùng người dùng (trong file hoặc đã lưu) không quá dedup_window_seconds giây (mặc định
+    config.IMPORT_DEDUP_WINDOW_SECONDS) bị bỏ, nên nhập lại cùng một file không tạo dòng trùng. Các lượt còn lại được
+    ghép thành ca rồi ghi một lần cho cả file.
+    time_format: định dạng strptime của cột thời gian dạng chuỗi (mặc định ISO 8601, ví dụ '2025-01-31 08:00:00').
+    Trả về dict thống kê (số dòng đọc/nhập/loại, số lượt trùng, số dòng ghi, thời gian và số dòng/giây).
+    """
+    if dedup_window_seconds is None:
+        dedup_window_seconds = config.IMPORT_DEDUP_WINDOW_SECONDS
+    chunk_rows = chunk_rows or config.ATTENDANCE_STREAM_CHUNK_ROWS
+    started = time.perf_counter()
+
+    states = get_user_states()
+    code_map, user_ids = build_code_map(list(states) + [str(user_id) for user_id in known_user_ids], user_map)
+    names = [states[user_id]['Name'] if user_id in states else user_id.split('_', 1)[-1] for user_id in user_ids]
+
+    rows_read = 0
+    rejected = {}
+    parts = []
+    for chunk in iter_import_chunks(file_path, chunk_rows):
+        rows_read += len(chunk)
+        parts.append(parse_import_chunk(chunk, code_map, rejected, time_format))
+    punches = sort_punches(ImportPunches.concat(parts))
+    valid_punches = len(punches)
+    punches, duplicates_in_file = drop_duplicate_punches(punches, dedup_window_seconds)
+    parse_time = time.perf_counter() - started
+
+    duplicates_existing = 0
+    rows_written = 0
+    sessions = 0
+    with current_store().lock:
+        if len(punches):
+            existing_user, existing_time = _existing_punch_times(
+                {user_id: i for i, user_id in enumerate(user_ids)},
+                pd.Timestamp(punches.time.min(), unit='s'), pd.Timestamp(punches.time.max(), unit='s'))
+            punches, duplicates_existing = drop_existing_punches(
+                punches, existing_user, existing_time, dedup_window_seconds)
+        if len(punches):
+            df_rows, sessions = pair_punches(punches, user_ids, names)
+            _insert_attendance_rows(df_rows)
+            rows_written = len(df_rows)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'rows_read': rows_read,
+        'rows_rejected': sum(rejected.values()),
+        'rejected': rejected,
+        'duplicates_in_file': duplicates_in_file,
+        'duplicates_existing': duplicates_existing,
+        'punches_imported': len(punches),
+        'rows_written': rows_written,
+        'sessions': sessions,
+        'parse_seconds': parse_time,
+        'elapsed_seconds': elapsed,
+        'rows_per_second': rows_read / elapsed if elapsed > 0 else 0.0,
+    }
+    print(f"Nhập {file_path}: đọc {rows_read} dòng, hợp lệ {valid_punches}, loại {stats['rows_rejected']}"
+          + (f" ({', '.join(f'{reason}: {count}' for reason, count in rejected.items())})" if rejected else ""))
+    print(f"  Bỏ lượt trùng: {duplicates_in_file} trong file, {duplicates_existing} đã có. "
+          f"Nhập {len(punches)} lượt -> {rows_written} dòng chấm công ({sessions} ca đã ghép).")
+    print(f"  Thời gian: {elapsed:.2f}s (đọc/kiểm tra {parse_time:.2f}s), {stats['rows_per_second']:,.0f} dòng/giây.")
+    return stats
+
+def _central_inbox_dir(central_dir):
+    """Inbox của chi nhánh hiện tại trong kho trung tâm (cùng đường dẫn tương đối với BASE_DIR như trên máy trung tâm)."""
+    inbox_dir = config.site_path(current_site(), config.ATTENDANCE_INBOX_DIR)
+    return os.path.join(central_dir, os.path.relpath(inbox_dir, config.BASE_DIR))
+
+def sync_attendance_outbox(central_dir=None, batch_rows=None):
+    """
+    Gửi các lượt trong outbox sau mốc đồng bộ lên inbox của chi nhánh ở kho trung tâm (mặc định config.CENTRAL_STORE_DIR),
+    từng lô tối đa batch_rows lượt (mặc định config.SYNC_BATCH_ROWS). khóa kho chỉ được giữ khi đọc outbox và ghi mốc,
+    không giữ trong lúc ghi sang kho trung tâm, nên kiosk vẫn chấm công bình thường khi kho trung tâm chậm hoặc mất
+    kết nối. Gửi hết thì outbox được làm mới. Trả về số lượt đã gửi; lỗi kết nối thì dừng, lần sau gửi tiếp từ mốc.
+    """
+    store = current_store()
+    central_dir = central_dir or config.CENTRAL_STORE_DIR
+    if not central_dir:
+        print("Chưa cấu hình kho trung tâm (config.CENTRAL_STORE_DIR), bỏ qua đồng bộ.")
+        return 0
+    batch_rows = batch_rows or config.SYNC_BATCH_ROWS
+    inbox_dir = _central_inbox_dir(central_dir)
+
+    sent = 0
+    while True:
+        with store.lock:
+            state = read_sync_state(store.ATTENDANCE_SYNC_STATE_FILE)
+            events, end_offset = read_outbox(store.ATTENDANCE_OUTBOX_FILE, state['offset'], batch_rows)
+        if end_offset == state['offset']:
+            break
+        if len(events):
+            try:
+                write_inbox_batch(inbox_dir, config.KIOSK_ID, events)
+            except OSError as e:
+                print(f"Không gửi được lượt chấm công lên kho trung tâm {inbox_dir}: {e}. Sẽ thử lại sau.")
+                break
+            sent += len(events)
+
+        with store.lock:
+            if read_sync_state(store.ATTENDANCE_SYNC_STATE_FILE) != state:
+                # Tiến trình khác đã gửi phần này trong lúc ghi (lô trùng được bỏ khi gộp) -> đọc lại mốc
+                continue
+            outbox_signature = _file_signature(store.ATTENDANCE_OUTBOX_FILE)
+            if outbox_signature is None or end_offset >= outbox_signature[1]:
+                # Đã gửi hết: ghi mốc mới trước rồi mới xóa outbox, nên mất điện giữa chừng chỉ làm gửi lại các lượt
+                # đã gộp (bị bỏ khi gộp), không mất lượt nào
+                write_sync_state(store.ATTENDANCE_SYNC_STATE_FILE, {'offset': 0, 'generation': state['generation'] + 1})
+                _remove_file(store.ATTENDANCE_OUTBOX_FILE)
+                break
+            write_sync_state(store.ATTENDANCE_SYNC_STATE_FILE, {'offset': end_offset, 'generation': state['generation']})
+    if sent:
+        print(f"Đã gửi {sent} lượt chấm công lên {inbox_dir}.")
+    return sent
+
+def _repair_late_punches(events):
+    """
+    Ghi các lượt đến muộn (sớm hơn lượt đã lưu gần nhất của cùng người dùng, gọi trong khóa kho): với mỗi người
+    dùng, các dòng đã lưu từ lượt mới sớm nhất (kèm check-in ngay trước đó nếu lượt mới có thể đóng nó) được đổi lại
+    thành lượt, ghép chung với lượt mới theo quy tắc của record_attendance rồi ghi đè các dòng cũ.
+    Trả về số dòng đã ghi.
+    """
+    user_ids = [str(user_id) for user_id in pd.unique(events['UserID'])]
+    old_rows = []
+    for user_id in user_ids:
+        first_new = events.loc[events['UserID'] == user_id, 'Timestamp'].min()
+        df_user = query_attendance(user_id=user_id)
+        df_user = df_user[df_user['UserID'].astype(str) == user_id]
+        previous = df_user[df_user['Timestamp'] < first_new].tail(1)
+        if len(previous) and not (previous['CheckType'].iloc[0] == "Check-in"
+                                  and not previous['CheckOutTime'].iloc[0] < first_new):
+            previous = previous.iloc[0:0]
+        old_rows.extend([previous, df_user[df_user['Timestamp'] >= first_new]])
+    old = pd.concat(old_rows, ignore_index=True)
+
+    codes = {user_id: code for code, user_id in enumerate(user_ids)}
+    old_user = old['UserID'].astype(str).map(codes).to_numpy(dtype=np.int32)
+    old_time = epoch_seconds(old['Timestamp'])
+    old_out = epoch_seconds(old['CheckOutTime'])
+    is_in = old['CheckType'].astype(str).to_numpy() == "Check-in"
+    has_out = is_in & (old_out != NO_TIME)
+    new_in = events['CheckType'].to_numpy() == "Check-in"
+    punches = sort_punches(ImportPunches.concat([
+        ImportPunches(old_user[is_in], old_time[is_in], np.full(int(is_in.sum()), CheckType.CHECK_IN, np.int8)),
+        ImportPunches(old_user[has_out], old_out[has_out], np.full(int(has_out.sum()), CheckType.CHECK_OUT, np.int8)),
+        ImportPunches(old_user[~is_in], old_time[~is_in], np.full(int((~is_in).sum()), CheckType.CHECK_OUT, np.int8)),
+        ImportPunches(events['UserID'].map(codes).to_numpy(dtype=np.int32), epoch_seconds(events['Timestamp']),
+                      np.where(new_in, CheckType.CHECK_IN, CheckType.CHECK_OUT).astype(np.int8)),
+    ]))
+    # Bỏ trùng theo (người dùng, loại) như khi ghi lần lượt theo thời gian (record_attendance_batch)
+    punches, _ = drop_repeated_punches(punches, config.ATTENDANCE_DEDUP_WINDOW_SECONDS)
+    names = events.groupby('UserID')['Name'].last()
+    df_rows, _ = pair_punches(punches, user_ids, [names[user_id] for user_id in user_ids])
+
+    apply_attendance_mutations(delete_records=list(zip(old['UserID'].astype(str), old['Timestamp'])))
+    _insert_attendance_rows(df_rows)
+    return len(df_rows)
+
+def merge_attendance_inbox():
+    """
+    Gộp các lô lượt chấm công các kiosk đã gửi vào ATTENDANCE_INBOX_DIR của chi nhánh hiện tại (chạy trên máy trung
+    tâm, xem sync_job.py). Lượt trùng khóa (UserID, Timestamp, KioskID) trong các lô hoặc đã gộp trước đó bị bỏ, nên
+    gộp lại hay kiosk gửi lại cùng lượt không tạo dòng trùng; lượt mới cách lượt cùng loại của cùng người dùng không quá
+    config.ATTENDANCE_DEDUP_WINDOW_SECONDS giây (từ kiosk khác) cũng bị bỏ như khi ghi trên kiosk. Lượt mới hơn mọi lượt đã lưu của người dùng được ghi
+    như record_attendance (ghi nối journal); lượt đến muộn (kiosk mất kết nối lâu) được ghép lại với các dòng đã lưu
+    xung quanh. Các lô đã gộp bị xóa khỏi inbox. Trả về dict thống kê.
+    """
+    store = current_store()
+    with store.lock:
+        batches = list_inbox_batches(store.ATTENDANCE_INBOX_DIR)
+        events = read_inbox_batches(batches)
+        received = len(events)
+        events, duplicates = drop_merged_events(store.ATTENDANCE_INBOX_DIR, events)
+
+        late_users = []
+        repeats = 0
+        if len(events):
+            last_punch = {user_id: max(state['LastCheckIn'] or '', state['LastCheckOut'] or '')
+                          for user_id, state in get_user_states().items()}
+            first_new = events.groupby('UserID')['Timestamp'].min()
+            late_users = [user_id for user_id, first_time in first_new.items()
+                          if last_punch.get(user_id, '') > first_time.strftime(TIME_FORMAT)]
+            is_late = events['UserID'].isin(late_users)
+            in_order = events[~is_late]
+            if len(in_order):
+                # Cùng một lần chấm công ghi từ hai kiosk (hai camera) chỉ được ghi một lần, như trên một kiosk
+                recorded = _record_punches([
+                    (user_id, name, check_type, timestamp.to_pydatetime()) for user_id, name, check_type, timestamp
+                    in zip(in_order['UserID'], in_order['Name'], in_order['CheckType'], in_order['Timestamp'])])
+                repeats = len(in_order) - len(recorded)
+            if late_users:
+                _repair_late_punches(events[is_late].reset_index(drop=True))
+            # Sổ đã gộp được ghi sau khi dữ liệu đã vào kho: bị ngắt giữa chừng thì lần gộp sau không mất lượt nào
+            record_merged_events(store.ATTENDANCE_INBOX_DIR, events)
+        for path in batches:
+            _remove_file(path)
+
+    stats = {'batches': len(batches), 'received': received, 'duplicates': duplicates + repeats,
+             'merged': len(events) - repeats, 'late_users': len(late_users)}
+    if batches:
+        print(f"Gộp {len(batches)} lô từ {store.ATTENDANCE_INBOX_DIR}: {received} lượt, bỏ {stats['duplicates']} lượt trùng, "
+              f"gộp {stats['merged']} lượt ({len(late_users)} người dùng có lượt đến muộn được ghép lại).")
+    return stats
+
+def _user_ids_mask(user_ids, delete_user_ids):
+    """Như _user_mask nhưng cho nhiều người dùng cùng lúc (vector hóa cho các ID không chứa '_')."""
+    delete_user_ids = {str(user_id) for user_id in delete_user_ids}
+    mask = user_ids.isin(delete_user_ids)
+    simple_ids = {user_id for user_id in delete_user_ids if '_' not in user_id}
+    if simple_ids:
+        mask |= user_ids.str.split('_', n=1).str[0].isin(simple_ids)
+    for user_id in delete_user_ids - simple_ids:
+        mask |= user_ids.str.startswith(user_id + '_')
+    return mask
+
+def apply_attendance_mutations(delete_user_ids=(), delete_records=(), delete_date_ranges=(), renames=None):
+    """
+    Áp dụng một nhóm thay đổi lên lịch sử chấm công trong một lần đọc - ghi:
+      delete_user_ids:    các UserID cần xóa mọi bản ghi (khớp UserID hoặc 'UserID_Tên')
+      delete_records:     các cặp (UserID, Timestamp) cần xóa
+      delete_date_ranges: các bộ (start_date, end_date) hoặc (start_date, end_date, user_id), tính cả hai đầu;
+                          None ở một đầu nghĩa là không giới hạn
+      renames:            dict UserID -> tên mới
+    CSV chỉ ghi lại các phân vùng tháng có dòng bị ảnh hưởng; SQLite dùng một transaction.
+    Trả về {'deleted': số dòng đã xóa, 'renamed': số dòng đã đổi tên}.
+    """
+    delete_user_ids = list(delete_user_ids)
+    delete_records = list(delete_records)
+    delete_date_ranges = list(delete_date_ranges)
+    renames = dict(renames or {})
+
+    with current_store().lock:
+        _bump_write_version()
+        if _use_sqlite():
+            _discard_today_snapshot()
+            return sqlite_backend.apply_attendance_mutations(delete_user_ids, delete_records, delete_date_ranges, renames)
+
+        df = load_attendance()
+        if df.empty:
+            return {'deleted': 0, 'renamed': 0}
+        user_ids = df['UserID'].astype(str)
+
+        delete_mask = pd.Series(False, index=df.index)
+        if delete_user_ids:
+            delete_mask |= _user_ids_mask(user_ids, delete_user_ids)
+        if delete_records:
+            record_keys = pd.MultiIndex.from_tuples(
+                [(str(user_id), pd.Timestamp(timestamp)) for user_id, timestamp in delete_records])
+            row_keys = pd.MultiIndex.from_arrays([user_ids, pd.to_datetime(df['Timestamp'])])
+            delete_mask |= row_keys.isin(record_keys)
+        for date_range in delete_date_ranges:
+            start_date, end_date = date_range[0], date_range[1]
+            user_id = date_range[2] if len(date_range) > 2 else None
+            delete_mask |= df.index.isin(_filter_attendance(df, user_id, start_date, end_date).index)
+
+        new_names = user_ids.map(renames) if renames else pd.Series(pd.NA, index=df.index)
+        rename_mask = new_names.notna() & ~delete_mask
+        result = {'deleted': int(delete_mask.sum()), 'renamed': int(rename_mask.sum())}
+        if not result['deleted'] and not result['renamed']:
+            return result
+
+        # Chỉ các tháng có dòng bị xóa/đổi tên cần ghi lại
+        changed_months = set(_partition_months(df[delete_mask | rename_mask]).dropna())
+        if result['renamed']:
+            # Cột Name có thể là category (phân vùng parquet/feather) -> chuyển về object trước khi gán tên mới
+            df['Name'] = df['Name'].astype(object)
+            df.loc[rename_mask, 'Name'] = new_names[rename_mask]
+        _save_attendance(df[~delete_mask], months=changed_months)
+        return result
 
 def update_user_name_in_attendance(user_id, new_name):
     """
-    Cập nhật trường 'Name' trong attendance.csv cho một UserID cụ thể.
+    Cập nhật trường 'Name' trong dữ liệu chấm công cho một UserID cụ thể.
     """
-    df = load_attendance()
-    if not df.empty and user_id in df['UserID'].values:
-        # Chỉ cập nhật các bản ghi có UserID khớp
-        df.loc[df['UserID'] == user_id, 'Name'] = new_name
-        save_attendance(df)
-        print(f"Đã cập nhật tên '{new_name}' cho UserID '{user_id}' trong attendance.csv.")
+    renamed = apply_attendance_mutations(renames={user_id: new_name})['renamed']
+    if renamed:
+        print(f"Đã cập nhật tên '{new_name}' cho UserID '{user_id}' trong dữ liệu chấm công ({renamed} bản ghi).")
     else:
-        print(f"Không tìm thấy UserID '{user_id}' trong attendance.csv để cập nhật tên.")
+        print(f"Không tìm thấy UserID '{user_id}' trong dữ liệu chấm công để cập nhật tên.")
+    return renamed
+
+def delete_user_attendance(user_id):
+    """Xóa mọi bản ghi chấm công của một người dùng (UserID hoặc 'UserID_Tên'). Trả về số dòng đã xóa."""
+    return apply_attendance_mutations(delete_user_ids=[user_id])['deleted']
+
+def delete_attendance_record(user_id, timestamp):
+    """Xóa bản ghi có đúng UserID và Timestamp. Trả về số dòng đã xóa."""
+    return apply_attendance_mutations(delete_records=[(user_id, timestamp)])['deleted']
+
+def export_attendance_csv(file_path, user_id=None, start_date=None, end_date=None):
+    """Xuất dữ liệu chấm công (có thể lọc như load_attendance) ra một file CSV. Trả về số dòng đã xuất."""
+    df = load_attendance(user_id=user_id, start_date=start_date, end_date=end_date)
+    df = df.reindex(columns=ATTENDANCE_COLUMNS)
+    for col in TIME_COLUMNS:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime(TIME_FORMAT)
+    df.to_csv(file_path, index=False)
+    return len(df)
+
+def clear_attendance():
+    """Xóa toàn bộ bản ghi chấm công (kể cả lưu trữ)."""
+    with current_store().lock:
+        if _use_sqlite():
+            _bump_write_version()
+            _discard_today_snapshot()
+            return sqlite_backend.clear_attendance()
+        save_attendance(_empty_attendance_df())
+
+# --- Chi nhánh ---
+# Mỗi chi nhánh có kho chấm công riêng (SiteStore) trong config.site_data_dir(site_id). Kiosk chỉ dùng chi nhánh của
+# mình (config.SITE_ID); admin gộp báo cáo nhiều chi nhánh bằng fan_out_sites, đọc lần lượt kho của từng chi nhánh.
+
+def _new_site_store(site_id):
+    paths = {name: config.site_path(site_id, getattr(config, name)) for name in SITE_PATH_NAMES}
+    return SiteStore(site_id, paths, config.site_path(site_id, config.ATTENDANCE_LOCK_FILE),
+                     config.site_path(site_id, config.SQLITE_DB_FILE), site_dir=config.site_data_dir(site_id))
+
+def _site_store(site_id):
+    """Kho của chi nhánh site_id: kho của tiến trình, kho đã mở trước đó, hoặc kho mới."""
+    with _site_lock:
+        if site_id == _process_store.site_id:
+            return _process_store
+        store = _site_stores.get(site_id)
+        # Kho đã mở chỉ dùng lại được nếu chi nhánh vẫn ở cùng thư mục (config.SITES_DIR có thể đã đổi)
+        if store is None or store.site_dir not in (None, config.site_data_dir(site_id)):
+            store = _site_stores[site_id] = _new_site_store(site_id)
+        return store
+
+def current_store():
+    """Kho chấm công mà luồng hiện tại đang dùng: của khối site_scope đang mở trong luồng, không thì của tiến trình."""
+    return getattr(_thread_site, 'store', None) or _process_store
+
+def current_site():
+    """Chi nhánh mà các hàm đọc/ghi chấm công của luồng hiện tại đang dùng."""
+    return current_store().site_id
+
+def start_background_thread(thread):
+    """
+    Bắt đầu một luồng nền dùng kho chấm công của tiến trình (hoặc của khối site_scope mà luồng tự mở). use_site từ chối
+    đổi hẳn chi nhánh khi còn luồng nào đang chạy.
+    """
+    with _site_lock:
+        _background_threads[:] = [other for other in _background_threads if other.is_alive()]
+        _background_threads.append(thread)
+        thread.start()
+
+def _active_background_threads():
+    current = threading.current_thread()
+    return [thread.name for thread in _background_threads if thread.is_alive() and thread is not current]
+
+def use_site(site_id):
+    """
+    Chuyển hẳn các hàm đọc/ghi chấm công của tiến trình sang kho của chi nhánh site_id (cả SQLite khi dùng backend đó).
+    Kho của chi nhánh đang dùng được giữ lại cho lần quay lại. Không đổi model/dataset (config.MODEL_FILE...).
+    Báo RuntimeError nếu còn luồng nền (start_background_thread) đang chạy: chúng sẽ ghi nhầm sang chi nhánh mới.
+    Để đọc tạm một chi nhánh khác, dùng site_scope.
+    """
+    global _process_store
+    with _site_lock:
+        if site_id == _process_store.site_id:
+            return
+        active = _active_background_threads()
+        if active:
+            raise RuntimeError(f"Không đổi được chi nhánh khi các luồng nền đang chạy: {', '.join(active)}. "
+                               "Hãy dừng chúng trước (stop_attendance_queue, stop_attendance_sync) hoặc dùng site_scope.")
+        store = _site_store(site_id)
+        _site_stores.pop(site_id, None)
+        _site_stores[_process_store.site_id] = _process_store
+        _process_store = store
+
+@contextlib.contextmanager
+def site_scope(site_id):
+    """
+    Dùng kho của chi nhánh site_id trong khối with rồi quay lại kho trước đó:
+        with site_scope('HN'):
+            df = query_attendance(start=...)
+    Chỉ đổi kho của luồng gọi: các luồng khác (luồng ghi nền, giao diện) vẫn dùng kho của chúng trong lúc đó.
+    """
+    previous_store = getattr(_thread_site, 'store', None)
+    _thread_site.store = _site_store(site_id)
+    try:
+        yield
+    finally:
+        _thread_site.store = previous_store
+
+def list_sites():
+    """Các chi nhánh có thư mục trong config.SITES_DIR, luôn gồm chi nhánh của máy này (config.SITE_ID)."""
+    sites = []
+    if os.path.isdir(config.SITES_DIR):
+        sites = sorted(name for name in os.listdir(config.SITES_DIR)
+                       if os.path.isdir(os.path.join(config.SITES_DIR, name)))
+    if config.SITE_ID not in sites:
+        sites.insert(0, config.SITE_ID)
+    return sites
+
+def fan_out_sites(func, sites=None):
+    """Gọi func() lần lượt trên kho của từng chi nhánh (mặc định list_sites()). Trả về [(site_id, kết quả), ...]."""
+    results = []
+    for site_id in (list_sites() if sites is None else sites):
+        with site_scope(site_id):
+            results.append((site_id, func()))
+    return results
+
+def merge_site_frames(results):
+    """Gộp các DataFrame của fan_out_sites thành một, thêm cột 'SiteID' ở đầu (mã người dùng chỉ duy nhất trong chi nhánh)."""
+    frames = [df.assign(SiteID=site_id) for site_id, df in results]
+    if not frames:
+        return pd.DataFrame(columns=['SiteID'])
+    merged = pd.concat(frames, ignore_index=True)
+    return merged[['SiteID'] + [col for col in merged.columns if col != 'SiteID']]
+
+def get_attendance_summary_all_sites(sites=None):
+    """Báo cáo tổng hợp (get_attendance_summary) của các chi nhánh, gộp lại với cột 'SiteID'."""
+    return merge_site_frames(fan_out_sites(get_attendance_summary, sites))
+
+def get_work_hours_all_sites(period='day', start_date=None, end_date=None, user_id=None, sites=None):
+    """Giờ công (get_work_hours) của các chi nhánh, gộp lại với cột 'SiteID'."""
+    return merge_site_frames(fan_out_sites(lambda: get_work_hours(period, start_date, end_date, user_id), sites))
+
+def query_attendance_all_sites(user_id=None, start=None, end=None, check_type=None, sites=None):
+    """Các dòng chấm công (query_attendance) của các chi nhánh, gộp lại với cột 'SiteID' và sắp theo Timestamp."""
+    return _sort_by_time(merge_site_frames(fan_out_sites(lambda: query_attendance(user_id, start, end, check_type), sites)))
@@ -0,0 +1,502 @@
+import sqlite3
+import os
+from datetime import datetime
+import pandas as pd
+from database.attendance_stats import (
+    USER_STATE_FIELDS, ROLLUP_COLUMNS, compute_user_aggregates, compute_daily_rollup, new_user_state, apply_punch,
+    is_duplicate_punch, users_to_rescan, merge_new_rows, latest_known_times
+)
+
+ATTENDANCE_COLUMNS = ['UserID', 'Name', 'Timestamp', 'CheckType', 'CheckInTime', 'CheckOutTime']
+
+# Thời gian được lưu dạng chuỗi 'YYYY-MM-DD HH:MM:SS' nên so sánh chuỗi cũng là so sánh thời gian
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserID TEXT NOT NULL,
+    Name TEXT,
+    Timestamp TEXT NOT NULL,
+    CheckType TEXT,
+    CheckInTime TEXT,
+    CheckOutTime TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_user_ts ON attendance (UserID, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_attendance_ts ON attendance (Timestamp);
+
+-- Trạng thái và các tổng theo người dùng (dữ liệu dẫn xuất, có thể dựng lại từ bảng attendance):
+-- dòng check-in đang mở (OpenRowId/OpenCheckIn), check-in/check-out gần nhất, tổng lượt và thời gian làm việc
+CREATE TABLE IF NOT EXISTS user_state (
+    UserID TEXT PRIMARY KEY,
+    Name TEXT,
+    OpenRowId INTEGER,
+    OpenCheckIn TEXT,
+    LastCheckIn TEXT,
+    LastCheckOut TEXT,
+    TotalCheckIn INTEGER NOT NULL DEFAULT 0,
+    TotalCheckOut INTEGER NOT NULL DEFAULT 0,
+    TotalWorkSeconds INTEGER NOT NULL DEFAULT 0,
+    PairedWorkSeconds INTEGER NOT NULL DEFAULT 0,
+    PairCount INTEGER NOT NULL DEFAULT 0,
+    Status TEXT
+);
+
+-- Giờ công theo (ngày, người dùng) của các ca đã đóng, tính vào ngày check-in (dữ liệu dẫn xuất):
+-- cộng dồn khi check-out đóng ca, dựng lại cùng user_state
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    Day TEXT NOT NULL,
+    UserID TEXT NOT NULL,
+    WorkSeconds INTEGER NOT NULL DEFAULT 0,
+    Sessions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, UserID)
+);
+"""
+
+USER_STATE_COLUMNS = ['UserID', 'OpenRowId'] + USER_STATE_FIELDS
+
+def _db_file():
+    """File SQLite của kho chi nhánh mà luồng hiện tại đang dùng (database_manager.current_store())."""
+    from database import database_manager
+    return database_manager.current_store().SQLITE_DB_FILE
+
+def _connect():
+    """Mở kết nối tới file SQLite của kho hiện tại, tạo bảng/chỉ mục và di chuyển dữ liệu CSV cũ nếu DB mới được tạo."""
+    db_file = _db_file()
+    is_new_db = not os.path.exists(db_file)
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    # user_state là dữ liệu dẫn xuất: nếu được tạo bởi phiên bản cũ (thiếu cột) thì xóa đi để dựng lại
+    state_columns = [row[1] for row in conn.execute("PRAGMA table_info(user_state)")]
+    if state_columns and set(state_columns) != set(USER_STATE_COLUMNS):
+        conn.execute("DROP TABLE user_state")
+    has_rollup = conn.execute(
+        "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollup')").fetchone()[0]
+    conn.executescript(SCHEMA_SQL)
+    from database import database_manager
+    store = database_manager.current_store()
+    if is_new_db and (os.path.isdir(store.ATTENDANCE_PARTITION_DIR) or os.path.exists(store.ATTENDANCE_FILE)):
+        migrate_from_csv(conn=conn)
+    # DB cũ chưa có user_state (hoặc bảng bị mất dữ liệu) -> dựng lại khi khởi động
+    # DB cũ chưa có bảng daily_rollup cũng được dựng lại một lần
+    has_state = conn.execute("SELECT EXISTS(SELECT 1 FROM user_state)").fetchone()[0] and has_rollup
+    if not has_state and conn.execute("SELECT EXISTS(SELECT 1 FROM attendance)").fetchone()[0]:
+        with conn:
+            _rebuild_user_state(conn)
+    return conn
+
+def _rebuild_user_state(conn):
+    """Dựng lại bảng user_state và daily_rollup từ toàn bộ bảng attendance (gọi bên trong transaction của conn)."""
+    df = pd.read_sql_query("SELECT id, UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime FROM attendance", conn)
+    aggregates = compute_user_aggregates(df)
+    conn.execute("DELETE FROM user_state")
+    placeholders = ", ".join("?" for _ in USER_STATE_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO user_state ({', '.join(USER_STATE_COLUMNS)}) VALUES ({placeholders})",
+        [(str(user_id), None, *[_to_sql_value(value) for value in row])
+         for user_id, row in zip(aggregates.index, aggregates[USER_STATE_FIELDS].itertuples(index=False))])
+    # Gắn id của dòng check-in đang mở để check-out cập nhật trực tiếp theo khóa chính
+    conn.execute(
+        "UPDATE user_state SET OpenRowId = (SELECT MAX(a.id) FROM attendance a "
+        "WHERE a.UserID = user_state.UserID AND a.Timestamp = user_state.OpenCheckIn) "
+        "WHERE OpenCheckIn IS NOT NULL")
+
+    rollup = compute_daily_rollup(df)
+    conn.execute("DELETE FROM daily_rollup")
+    conn.executemany(
+        "INSERT INTO daily_rollup (Day, UserID, WorkSeconds, Sessions) VALUES (?, ?, ?, ?)",
+        zip(rollup['Day'].dt.strftime('%Y-%m-%d'), rollup['UserID'], rollup['WorkSeconds'].tolist(), rollup['Sessions'].tolist()))
+
+def _to_sql_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def rebuild_user_state():
+    """Tính lại toàn bộ bảng user_state từ bảng attendance."""
+    conn = _connect()
+    try:
+        with conn:
+            _rebuild_user_state(conn)
+    finally:
+        conn.close()
+
+def _format_time(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, str):
+        return value
+    return value.strftime(TIME_FORMAT)
+
+def _rows_from_df(df):
+    """Chuyển DataFrame chấm công thành list tuple để executemany."""
+    df = df.copy()
+    for col in ATTENDANCE_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    rows = []
+    for user_id, name, timestamp, check_type, check_in, check_out in zip(
+            df['UserID'], df['Name'], df['Timestamp'], df['CheckType'], df['CheckInTime'], df['CheckOutTime']):
+        if pd.isna(timestamp):
+            continue
+        rows.append((
+            str(user_id),
+            None if pd.isna(name) else str(name),
+            _format_time(pd.to_datetime(timestamp)),
+            None if pd.isna(check_type) else str(check_type),
+            _format_time(pd.to_datetime(check_in)) if pd.notna(check_in) else None,
+            _format_time(pd.to_datetime(check_out)) if pd.notna(check_out) else None,
+        ))
+    return rows
+
+def _user_condition(user_id):
+    """
+    Điều kiện lọc theo người dùng: khớp chính xác UserID hoặc UserID dạng 'ID_Tên'.
+    Viết dưới dạng khoảng để SQLite dùng được chỉ mục (UserID, Timestamp).
+    """
+    # '`' là ký tự liền sau '_' trong bảng mã, nên [ID_, ID`) chứa đúng các chuỗi bắt đầu bằng 'ID_'
+    return "(UserID = ? OR (UserID >= ? AND UserID < ?))", [user_id, user_id + '_', user_id + '`']
+
+def _range_conditions(start_date=None, end_date=None):
+    """
+    Điều kiện khoảng [start_date, end_date] (tính cả ngày end_date) trên Timestamp. Hai đầu nhận date, datetime hoặc
+    chuỗi ngày như đường CSV (_filter_attendance), nên được chuẩn hóa qua pd.Timestamp trước khi định dạng.
+    """
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("Timestamp >= ?")
+        params.append(pd.Timestamp(start_date).strftime(TIME_FORMAT))
+    if end_date is not None:
+        conditions.append("Timestamp < ?")
+        params.append((pd.Timestamp(end_date) + pd.Timedelta(days=1)).strftime(TIME_FORMAT))
+    return conditions, params
+
+def migrate_from_csv(conn=None):
+    """
+    Di chuyển một lần dữ liệu CSV (các phân vùng tháng hoặc attendance.csv cũ, kèm journal nếu có) sang SQLite.
+    Bỏ qua nếu bảng attendance đã có dữ liệu. Trả về số dòng đã nhập.
+    """
+    from database import database_manager
+
+    store = database_manager.current_store()
+    csv_path = store.ATTENDANCE_PARTITION_DIR
+    own_conn = conn is None
+    if own_conn:
+        conn = _connect()
+    try:
+        if conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] > 0:
+            print(f"SQLite {store.SQLITE_DB_FILE} đã có dữ liệu. Bỏ qua di chuyển từ {csv_path}.")
+            return 0
+        if not os.path.isdir(csv_path) and not os.path.exists(store.ATTENDANCE_FILE):
+            print(f"Không tìm thấy {csv_path} để di chuyển sang SQLite.")
+            return 0
+
+        df = database_manager.load_csv_attendance()
+        rows = _rows_from_df(df)
+        with conn:
+            conn.executemany(
+                "INSERT INTO attendance (UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            _rebuild_user_state(conn)
+        print(f"Đã di chuyển {len(rows)} bản ghi chấm công từ {csv_path} sang {store.SQLITE_DB_FILE}.")
+        return len(rows)
+    finally:
+        if own_conn:
+            conn.close()
+
+def load_attendance(user_id=None, start_date=None, end_date=None):
+    """Tải dữ liệu chấm công; các bộ lọc được chuyển thành truy vấn khoảng trên chỉ mục."""
+    conditions, params = _range_conditions(start_date, end_date)
+    if user_id:
+        user_sql, user_params = _user_condition(user_id)
+        conditions.insert(0, user_sql)
+        params = user_params + params
+    sql = "SELECT UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime FROM attendance"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY Timestamp, id"
+
+    conn = _connect()
+    try:
+        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+    df['UserID'] = df['UserID'].astype(str)
+    for col in ['Timestamp', 'CheckInTime', 'CheckOutTime']:
+        df[col] = pd.to_datetime(df[col], format=TIME_FORMAT, errors='coerce')
+    return df
+
+def time_bounds():
+    """(Timestamp nhỏ nhất, lớn nhất) dạng chuỗi TIME_FORMAT, (None, None) nếu chưa có dữ liệu (tra trên chỉ mục)."""
+    conn = _connect()
+    try:
+        return conn.execute("SELECT MIN(Timestamp), MAX(Timestamp) FROM attendance").fetchone()
+    finally:
+        conn.close()
+
+def iter_attendance_chunks(user_id=None, start_date=None, end_date=None, chunk_rows=100_000):
+    """Đọc dữ liệu chấm công theo thứ tự thời gian, mỗi lần tối đa chunk_rows dòng (con trỏ SQLite, không tải hết)."""
+    conditions, params = _range_conditions(start_date, end_date)
+    if user_id:
+        user_sql, user_params = _user_condition(user_id)
+        conditions.insert(0, user_sql)
+        params = user_params + params
+    sql = "SELECT UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime FROM attendance"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY Timestamp, id"
+
+    conn = _connect()
+    try:
+        for df in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows):
+            df['UserID'] = df['UserID'].astype(str)
+            for col in ['Timestamp', 'CheckInTime', 'CheckOutTime']:
+                df[col] = pd.to_datetime(df[col], format=TIME_FORMAT, errors='coerce')
+            yield df
+    finally:
+        conn.close()
+
+def save_attendance(df=None):
+    """Thay thế toàn bộ dữ liệu chấm công bằng df (không làm gì nếu df là None)."""
+    if df is None:
+        return
+    rows = _rows_from_df(df)
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM attendance")
+            conn.executemany(
+                "INSERT INTO attendance (UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            _rebuild_user_state(conn)
+    finally:
+        conn.close()
+    print(f"Dữ liệu chấm công đã được lưu vào {_db_file()}")
+
+def _read_user_aggregates(conn):
+    """Bảng user_state dạng DataFrame các cột USER_STATE_FIELDS, index UserID."""
+    aggregates = pd.read_sql_query(f"SELECT UserID, {', '.join(USER_STATE_FIELDS)} FROM user_state", conn)
+    return aggregates.set_index('UserID')
+
+def insert_attendance_rows(df):
+    """
+    Thêm các dòng chấm công mới (nhập hàng loạt) trong một transaction, rồi cập nhật user_state và daily_rollup chỉ
+    cho các người dùng/ngày có trong df (xem attendance_stats.merge_new_rows), không quét lại bảng attendance.
+    """
+    columns = {'UserID': df['UserID'].astype(str), 'Name': df['Name'].astype(object).where(df['Name'].notna(), None),
+               'CheckType': df['CheckType'].astype(object).where(df['CheckType'].notna(), None)}
+    for col in ['Timestamp', 'CheckInTime', 'CheckOutTime']:
+        values = pd.to_datetime(df[col])
+        columns[col] = values.dt.strftime(TIME_FORMAT).astype(object).where(values.notna(), None)
+    rows = zip(*(columns[col].tolist() for col in ATTENDANCE_COLUMNS))
+    conn = _connect()
+    try:
+        with conn:
+            known = _read_user_aggregates(conn)
+            known = known[known.index.isin(columns['UserID'].unique())]
+            rescan = users_to_rescan(known, df)
+            conn.executemany(
+                "INSERT INTO attendance (UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+            # Người dùng có dòng mới nằm trước dòng đã lưu: đọc lại các dòng của họ trong khoảng từ lượt mới muộn
+            # nhất tới thời điểm muộn nhất đã biết (truy vấn khoảng trên chỉ mục Timestamp)
+            recent = None
+            if not rescan.empty:
+                conditions, params = _range_conditions(rescan.min(), latest_known_times(known.loc[rescan.index]).max())
+                recent = pd.read_sql_query(
+                    f"SELECT {', '.join(ATTENDANCE_COLUMNS)} FROM attendance WHERE {' AND '.join(conditions)} "
+                    "ORDER BY Timestamp, id", conn, params=params)
+                recent = recent[recent['UserID'].isin(rescan.index)
+                                & (recent['Timestamp'] >= rescan.min().strftime(TIME_FORMAT))]
+            merged = merge_new_rows(known, df, recent)
+            placeholders = ", ".join("?" for _ in USER_STATE_COLUMNS)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO user_state ({', '.join(USER_STATE_COLUMNS)}) VALUES ({placeholders})",
+                [(str(user_id), None, *[_to_sql_value(value) for value in row])
+                 for user_id, row in zip(merged.index, merged[USER_STATE_FIELDS].itertuples(index=False))])
+            conn.executemany(
+                "UPDATE user_state SET OpenRowId = (SELECT MAX(a.id) FROM attendance a "
+                "WHERE a.UserID = user_state.UserID AND a.Timestamp = user_state.OpenCheckIn) "
+                "WHERE UserID = ? AND OpenCheckIn IS NOT NULL", [(str(user_id),) for user_id in merged.index])
+
+            # Giờ công cộng dồn được -> chỉ cộng phần của các dòng mới
+            rollup = compute_daily_rollup(df)
+            conn.executemany(
+                "INSERT INTO daily_rollup (Day, UserID, WorkSeconds, Sessions) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (Day, UserID) DO UPDATE SET WorkSeconds = WorkSeconds + excluded.WorkSeconds, "
+                "Sessions = Sessions + excluded.Sessions",
+                zip(rollup['Day'].dt.strftime('%Y-%m-%d'), rollup['UserID'].astype(str),
+                    rollup['WorkSeconds'].tolist(), rollup['Sessions'].tolist()))
+    finally:
+        conn.close()
+
+def load_daily_rollup(user_id=None, start_date=None, end_date=None):
+    """Giờ công theo (người dùng, ngày) từ bảng daily_rollup (các cột ROLLUP_COLUMNS), lọc theo ngày (tính cả hai đầu) và người dùng."""
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("Day >= ?")
+        params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+    if end_date is not None:
+        conditions.append("Day <= ?")
+        params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+    if user_id:
+        user_sql, user_params = _user_condition(user_id)
+        conditions.append(user_sql)
+        params += user_params
+    sql = "SELECT UserID, Day, WorkSeconds, Sessions FROM daily_rollup"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY Day, UserID"
+
+    conn = _connect()
+    try:
+        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    df['UserID'] = df['UserID'].astype(object)
+    df['Day'] = pd.to_datetime(df['Day'], format='%Y-%m-%d').astype('datetime64[s]')
+    return df[ROLLUP_COLUMNS].astype({'WorkSeconds': 'int64', 'Sessions': 'int64'})
+
+def _read_user_state(conn, user_id):
+    row = conn.execute(
+        f"SELECT {', '.join(USER_STATE_COLUMNS)} FROM user_state WHERE UserID = ?", (user_id,)).fetchone()
+    if row is None:
+        return None, None
+    return row[1], dict(zip(USER_STATE_FIELDS, row[2:]))
+
+def _write_user_state(conn, user_id, open_row_id, state):
+    placeholders = ", ".join("?" for _ in USER_STATE_COLUMNS)
+    conn.execute(
+        f"INSERT OR REPLACE INTO user_state ({', '.join(USER_STATE_COLUMNS)}) VALUES ({placeholders})",
+        (user_id, open_row_id, *[state[field] for field in USER_STATE_FIELDS]))
+
+def _record_punch(conn, user_id, name, check_type, punch_time, dedup_window_seconds=0):
+    """
+    Ghi một lượt chấm công trong transaction đang mở của conn. Trả về False (không ghi gì) nếu lượt trùng với lượt
+    cùng loại gần nhất của người dùng trong dedup_window_seconds giây.
+    """
+    current_time = punch_time.replace(microsecond=0)
+    current_time_str = current_time.strftime(TIME_FORMAT)
+
+    # Dòng check-in đang mở và các tổng của người dùng, tra trực tiếp qua khóa chính của user_state
+    open_row_id, state = _read_user_state(conn, user_id)
+    if is_duplicate_punch(state, check_type, current_time, dedup_window_seconds):
+        print(f"Bỏ qua lượt {check_type} trùng của {name} (ID: {user_id}) lúc {current_time_str}")
+        return False
+    if state is None:
+        state = new_user_state(name)
+
+    if check_type == "Check-in":
+        cursor = conn.execute(
+            "INSERT INTO attendance (UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime) "
+            "VALUES (?, ?, ?, ?, ?, NULL)", (user_id, name, current_time_str, check_type, current_time_str))
+        open_row_id = cursor.lastrowid
+        print(f"{name} (ID: {user_id}) đã Check-in lúc {current_time_str}")
+    elif check_type == "Check-out":
+        if open_row_id is not None and state['OpenCheckIn']:
+            conn.execute("UPDATE attendance SET CheckOutTime = ? WHERE id = ?", (current_time_str, open_row_id))
+            # Ca vừa đóng được cộng vào giờ công của ngày check-in
+            work_seconds = int((current_time - datetime.strptime(state['OpenCheckIn'], TIME_FORMAT)).total_seconds())
+            conn.execute(
+                "INSERT INTO daily_rollup (Day, UserID, WorkSeconds, Sessions) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (Day, UserID) DO UPDATE SET WorkSeconds = WorkSeconds + excluded.WorkSeconds, "
+                "Sessions = Sessions + 1", (state['OpenCheckIn'][:10], user_id, work_seconds))
+            print(f"{name} (ID: {user_id}) đã Check-out lúc {current_time_str} (cập nhật bản ghi cũ)")
+        else:
+            conn.execute(
+                "INSERT INTO attendance (UserID, Name, Timestamp, CheckType, CheckInTime, CheckOutTime) "
+                "VALUES (?, ?, ?, ?, NULL, ?)", (user_id, name, current_time_str, check_type, current_time_str))
+            print(f"{name} (ID: {user_id}) đã Check-out lúc {current_time_str} (bản ghi mới)")
+        open_row_id = None
+
+    # Cập nhật tăng dần trạng thái và các tổng trong cùng transaction
+    apply_punch(state, name, check_type, current_time)
+    _write_user_state(conn, user_id, open_row_id, state)
+    return True
+
+def record_attendance(user_id, name, check_type):
+    return bool(record_attendance_batch([(user_id, name, check_type, datetime.now())]))
+
+def record_attendance_batch(punches, dedup_window_seconds=0):
+    """
+    Ghi nhiều lượt chấm công (user_id, name, check_type, punch_time) trong một transaction (một lần commit),
+    bỏ các lượt trùng trong dedup_window_seconds giây (xem _record_punch). Trả về các lượt đã ghi.
+    """
+    recorded = []
+    conn = _connect()
+    try:
+        with conn:
+            for punch in punches:
+                if _record_punch(conn, *punch, dedup_window_seconds=dedup_window_seconds):
+                    recorded.append(punch)
+    finally:
+        conn.close()
+    return recorded
+
+def get_user_states():
+    """Trạng thái gần nhất và các tổng của từng người dùng đọc từ bảng user_state (không quét bảng attendance)."""
+    conn = _connect()
+    try:
+        rows = conn.execute(f"SELECT UserID, {', '.join(USER_STATE_FIELDS)} FROM user_state").fetchall()
+    finally:
+        conn.close()
+    return {row[0]: dict(zip(USER_STATE_FIELDS, row[1:])) for row in rows}
+
+def apply_attendance_mutations(delete_user_ids=(), delete_records=(), delete_date_ranges=(), renames=None):
+    """Áp dụng một nhóm xóa/đổi tên trong một transaction. Trả về {'deleted': số dòng xóa, 'renamed': số dòng đổi tên}."""
+    renames = renames or {}
+    deleted = 0
+    renamed = 0
+    conn = _connect()
+    try:
+        with conn:
+            for user_id in delete_user_ids:
+                user_sql, user_params = _user_condition(user_id)
+                deleted += conn.execute(f"DELETE FROM attendance WHERE {user_sql}", user_params).rowcount
+                conn.execute(f"DELETE FROM user_state WHERE {user_sql}", user_params)
+                conn.execute(f"DELETE FROM daily_rollup WHERE {user_sql}", user_params)
+
+            rows_before = deleted
+            if delete_records:
+                deleted += conn.executemany(
+                    "DELETE FROM attendance WHERE UserID = ? AND Timestamp = ?",
+                    [(user_id, _format_time(pd.to_datetime(timestamp))) for user_id, timestamp in delete_records]).rowcount
+            for date_range in delete_date_ranges:
+                start_date, end_date = date_range[0], date_range[1]
+                conditions, params = _range_conditions(start_date, end_date)
+                if len(date_range) > 2 and date_range[2]:
+                    user_sql, user_params = _user_condition(date_range[2])
+                    conditions.insert(0, user_sql)
+                    params = user_params + params
+                where_sql = " WHERE " + " AND ".join(conditions) if conditions else ""
+                deleted += conn.execute(f"DELETE FROM attendance{where_sql}", params).rowcount
+
+            if renames:
+                renamed = conn.executemany("UPDATE attendance SET Name = ? WHERE UserID = ?",
+                                           [(new_name, user_id) for user_id, new_name in renames.items()]).rowcount
+                conn.executemany("UPDATE user_state SET Name = ? WHERE UserID = ?",
+                                 [(new_name, user_id) for user_id, new_name in renames.items()])
+
+            # Xóa một phần lịch sử làm thay đổi các tổng -> tính lại user_state một lần cho cả nhóm
+            if deleted > rows_before:
+                _rebuild_user_state(conn)
+    finally:
+        conn.close()
+    return {'deleted': deleted, 'renamed': renamed}
+
+def clear_attendance():
+    """Xóa toàn bộ bản ghi chấm công."""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM attendance")
+            conn.execute("DELETE FROM user_state")
+            conn.execute("DELETE FROM daily_rollup")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # Chạy: python -m database.sqlite_backend  (di chuyển một lần dữ liệu CSV -> SQLite)
+    migrate_from_csv()
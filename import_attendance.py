@@ -0,0 +1,25 @@
+# import_attendance.py
+# Nhập hàng loạt lượt chấm công từ file CSV/xlsx của máy chấm công cũ, ví dụ:
+#   python import_attendance.py old_terminal.csv --map ma_nv.csv
+#   python import_attendance.py old_terminal.xlsx --time-format "%d/%m/%Y %H:%M:%S" --window 120
+import argparse
+
+import config
+from database.database_manager import import_attendance
+from database.attendance_import import read_user_map
+from utils.face_recognizer_utils import load_id_mapping
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nhập hàng loạt dữ liệu chấm công từ CSV/Excel")
+    parser.add_argument('file', help="File .csv hoặc .xlsx (cột mã nhân viên, thời gian, tùy chọn loại vào/ra)")
+    parser.add_argument('--map', dest='map_file',
+                        help="File CSV ánh xạ mã nhân viên bên ngoài -> UserID (hai cột, có dòng tiêu đề)")
+    parser.add_argument('--window', type=int, default=config.IMPORT_DEDUP_WINDOW_SECONDS,
+                        help="Lượt cách lượt khác của cùng người không quá số giây này bị coi là trùng")
+    parser.add_argument('--time-format', help="Định dạng thời gian (strptime), mặc định ISO 8601")
+    args = parser.parse_args()
+
+    user_map = read_user_map(args.map_file) if args.map_file else None
+    # Người dùng đã đăng ký khuôn mặt nhưng chưa có lượt chấm công nào cũng khớp được theo mã
+    import_attendance(args.file, user_map=user_map, known_user_ids=load_id_mapping().values(),
+                      dedup_window_seconds=args.window, time_format=args.time_format)
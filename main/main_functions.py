@@ -8,7 +8,7 @@ import os
 from utils.camera_utils import initialize_camera, release_camera, load_face_detector
 from utils.face_recognizer_utils import load_recognizer_model, load_id_mapping, get_name_for_id
 import config
-from database.database_manager import record_attendance
+from database.attendance_queue import enqueue_attendance
 
 class MainFunctions:
     def __init__(self, root, video_label, status_label, result_label, names):
@@ -144,16 +144,20 @@ class MainFunctions:
                                 predicted_name = "Không xác định"
 
                         if predicted_name != "Không xác định":
-                            # **Đã chấm công thành công**
-                            self.result_label.config(text=f"Đã {self.check_type}: {predicted_name}", foreground="blue")
-                            self.status_label.config(text="Thành công!", foreground="green")
-                            record_attendance(original_user_id, predicted_name, self.check_type)
-                            messagebox.showinfo("Thành công", f"{predicted_name} đã {self.check_type} thành công!")
-                            self.last_recognized_time[original_user_id] = current_time
-
-                            # TỰ ĐỘNG TẮT CAMERA SAU KHI CHẤM CÔNG THÀNH CÔNG
-                            self.stop_recognition()
-                            return # Rất quan trọng để dừng vòng lặp sau khi gọi stop_recognition
+                            # Đưa vào hàng đợi ghi nền, không chờ đĩa trong vòng lặp camera
+                            if not enqueue_attendance(original_user_id, predicted_name, self.check_type):
+                                self.result_label.config(text="Hệ thống đang bận ghi dữ liệu", foreground="red")
+                                self.status_label.config(text="Vui lòng thử lại", foreground="red")
+                            else:
+                                # **Đã chấm công thành công**
+                                self.result_label.config(text=f"Đã {self.check_type}: {predicted_name}", foreground="blue")
+                                self.status_label.config(text="Thành công!", foreground="green")
+                                messagebox.showinfo("Thành công", f"{predicted_name} đã {self.check_type} thành công!")
+                                self.last_recognized_time[original_user_id] = current_time
+
+                                # TỰ ĐỘNG TẮT CAMERA SAU KHI CHẤM CÔNG THÀNH CÔNG
+                                self.stop_recognition()
+                                return # Rất quan trọng để dừng vòng lặp sau khi gọi stop_recognition
 
                         else: # Nếu không thể lấy được tên
                             self.result_label.config(text="Không xác định", foreground="red")
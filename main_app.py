@@ -6,13 +6,18 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
 import pandas as pd
-from datetime import datetime
+import queue
+import threading
+from datetime import datetime, timedelta
 
 # Import playsound cho âm thanh
 from playsound import playsound
 
 # Import các module đã tách
-from database.database_manager import record_attendance, load_attendance, save_attendance
+from database.database_manager import get_user_states, get_today_attendance, start_background_thread, TIME_FORMAT
+from database.attendance_queue import (
+    enqueue_attendance, get_pending_punches, stop_attendance_queue, start_attendance_sync, stop_attendance_sync
+)
 from utils.face_recognizer_utils import load_recognizer_model, load_id_mapping, get_name_for_id
 from utils.camera_utils import load_face_detector, initialize_camera, release_camera
 import config
@@ -20,7 +25,7 @@ import config
 class FaceRecognitionApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("Hệ thống chấm công bằng khuôn mặt")
+        self.root.title("Hệ thống chấm công bằng khuôn mặt" + (f" - Chi nhánh {config.SITE_ID}" if config.SITE_ID else ""))
         # Thay đổi kích thước cửa sổ để có chỗ cho bảng lịch sử
         self.root.geometry("600x550") 
         self.root.resizable(False, False)
@@ -37,13 +42,25 @@ class FaceRecognitionApp:
         self.load_models()
 
         self.last_check_time = {} 
-        # Dictionary để lưu thời gian check-in/out gần nhất của mỗi người
+        # Dictionary để lưu thời gian check-in/out gần nhất trong ngày hôm nay của mỗi người
         # Key: original_user_id_str, Value: {"Name": "Tên", "CheckIn": "HH:MM:SS", "CheckOut": "HH:MM:SS"}
         self.latest_attendance = {}
+        # True khi bảng đang hiển thị lịch sử (nút "Xem lịch sử"), False khi hiển thị chấm công hôm nay
+        self.showing_history = False
+        # Check-in/check-out gần nhất (kèm ngày) của từng người cho chế độ lịch sử: tải trong luồng nền mỗi lần bật
+        # chế độ lịch sử, sau đó cập nhật trong bộ nhớ cùng chỗ với latest_attendance (None = chưa tải xong lần nào).
+        # Các lượt chấm công trong lúc đang tải được giữ ở _history_punches rồi áp vào kết quả tải.
+        self.history_attendance = None
+        self._history_punches = None
+        self._history_results = queue.Queue()
+        self._history_worker = None
 
         self.create_widgets()
-        # Tải và hiển thị lịch sử chấm công ban đầu
+        # Tải và hiển thị chấm công hôm nay (chỉ đọc trạng thái hôm nay, không đọc lịch sử)
         self._load_initial_latest_attendance() 
+        self._schedule_day_rollover()
+        # Gửi lượt chấm công lên kho trung tâm trong nền (nếu có cấu hình config.CENTRAL_STORE_DIR)
+        start_attendance_sync()
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
@@ -101,18 +118,19 @@ class FaceRecognitionApp:
         self.status_label = ttk.Label(main_frame, text="Sẵn sàng để chấm công", font=("Helvetica", 11), foreground="blue")
         self.status_label.pack(pady=10)
 
-        # --- Bảng lịch sử chấm công gần nhất ---
-        history_frame = ttk.LabelFrame(main_frame, text="Lịch sử chấm công gần nhất", padding="10")
-        history_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        # --- Bảng chấm công hôm nay (lịch sử chỉ tải khi bấm "Xem lịch sử") ---
+        self.history_frame = ttk.LabelFrame(main_frame, text="Chấm công hôm nay", padding="10")
+        self.history_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        history_frame = self.history_frame
 
         self.attendance_table = ttk.Treeview(history_frame, columns=("Name", "CheckIn", "CheckOut"), show="headings", height=5) # height giới hạn số dòng hiển thị
         self.attendance_table.heading("Name", text="Tên")
-        self.attendance_table.heading("CheckIn", text="Check-in gần nhất")
-        self.attendance_table.heading("CheckOut", text="Check-out gần nhất")
+        self.attendance_table.heading("CheckIn", text="Check-in")
+        self.attendance_table.heading("CheckOut", text="Check-out")
 
         self.attendance_table.column("Name", width=120, anchor=tk.W)
-        self.attendance_table.column("CheckIn", width=120, anchor=tk.CENTER)
-        self.attendance_table.column("CheckOut", width=120, anchor=tk.CENTER)
+        self.attendance_table.column("CheckIn", width=150, anchor=tk.CENTER)
+        self.attendance_table.column("CheckOut", width=150, anchor=tk.CENTER)
         
         self.attendance_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
@@ -120,7 +138,10 @@ class FaceRecognitionApp:
         scrollbar = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=self.attendance_table.yview)
         self.attendance_table.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        # --- Hết bảng lịch sử ---
+
+        self.history_button = ttk.Button(main_frame, text="Xem lịch sử", command=self.toggle_history)
+        self.history_button.pack(pady=5)
+        # --- Hết bảng chấm công ---
 
     def play_sound(self, sound_file_path):
         """Phát file âm thanh."""
@@ -224,30 +245,28 @@ class FaceRecognitionApp:
                     if last_check_time_for_user is None or \
                        (current_time - last_check_time_for_user).total_seconds() > config.COOLDOWN_TIME:
                         
-                        # ✅ THAY ĐỔI LOGIC PHÁT ÂM THANH Ở ĐÂY
-                        if check_type == "Check-in":
-                            self.play_sound(config.SUCCESS_SOUND) # Phát âm thanh Check-in
-                        elif check_type == "Check-out":
-                            self.play_sound(config.CHECKOUT_SOUND) # Phát âm thanh Check-out
-                        
-                        record_attendance(original_user_id_str, predicted_name, check_type)
-                        self.last_check_time[original_user_id_str] = current_time
-                        
-                        result_label.config(text=f"{check_type} thành công: {predicted_name}", foreground="green")
-                        color = (0, 255, 0)
-                        text = f"{predicted_name} ({confidence:.0f}%)"
-                        recognized_successfully = True
-
-                        # Cập nhật latest_attendance và bảng
-                        if original_user_id_str not in self.latest_attendance:
-                            self.latest_attendance[original_user_id_str] = {"Name": predicted_name, "CheckIn": "-", "CheckOut": "-"}
-
-                        if check_type == "Check-in":
-                            self.latest_attendance[original_user_id_str]["CheckIn"] = current_time.strftime("%H:%M:%S")
-                        elif check_type == "Check-out":
-                            self.latest_attendance[original_user_id_str]["CheckOut"] = current_time.strftime("%H:%M:%S")
-                        
-                        self._update_attendance_table() # Cập nhật bảng
+                        # Chỉ đưa vào hàng đợi ghi nền, vòng lặp camera không chờ đĩa
+                        if not enqueue_attendance(original_user_id_str, predicted_name, check_type, current_time):
+                            result_label.config(text="Hệ thống đang bận ghi dữ liệu, vui lòng thử lại", foreground="red")
+                            color = (0, 0, 255)
+                            text = "He thong ban"
+                        else:
+                            # ✅ THAY ĐỔI LOGIC PHÁT ÂM THANH Ở ĐÂY
+                            if check_type == "Check-in":
+                                self.play_sound(config.SUCCESS_SOUND) # Phát âm thanh Check-in
+                            elif check_type == "Check-out":
+                                self.play_sound(config.CHECKOUT_SOUND) # Phát âm thanh Check-out
+                            
+                            self.last_check_time[original_user_id_str] = current_time
+                            
+                            result_label.config(text=f"{check_type} thành công: {predicted_name}", foreground="green")
+                            color = (0, 255, 0)
+                            text = f"{predicted_name} ({confidence:.0f}%)"
+                            recognized_successfully = True
+
+                            # Cập nhật latest_attendance, lịch sử trong bộ nhớ và bảng
+                            self._record_latest_punch(original_user_id_str, predicted_name, check_type, current_time)
+                            self._update_attendance_table() # Cập nhật bảng
                         
                     else:
                         remaining_time = config.COOLDOWN_TIME - (current_time - last_check_time_for_user).total_seconds()
@@ -301,50 +320,142 @@ class FaceRecognitionApp:
         self.checkout_button.config(state=tk.NORMAL)
         self.status_label.config(text="Sẵn sàng để chấm công", foreground="blue")
 
+    def _display_name(self, user_id_str, default_name):
+        """Tên hiển thị theo names mapping (tìm numeric_id có value là user_id_str trong id_mapping)."""
+        numeric_id = next((k for k, v in self.id_mapping.items() if v == user_id_str), None)
+        return self.names.get(numeric_id, default_name)
+
     def _load_initial_latest_attendance(self):
-        """Tải dữ liệu chấm công gần nhất từ file attendance.csv khi khởi động."""
-        df = load_attendance() # Sử dụng hàm đã có
-        if not df.empty:
-            # Chuyển đổi các cột thời gian nếu chúng chưa phải datetime objects
-            df['CheckInTime'] = pd.to_datetime(df['CheckInTime'], errors='coerce')
-            df['CheckOutTime'] = pd.to_datetime(df['CheckOutTime'], errors='coerce')
-            
-            # Sắp xếp theo UserID và thời gian để lấy bản ghi gần nhất
-            df_sorted = df.sort_values(by=['UserID', 'CheckInTime', 'CheckOutTime'], ascending=[True, False, False])
-
-            for user_id_str in df_sorted['UserID'].unique():
-                user_records = df_sorted[df_sorted['UserID'] == user_id_str]
-                
-                # Tìm check-in gần nhất
-                latest_checkin_record = user_records.dropna(subset=['CheckInTime']).sort_values(by='CheckInTime', ascending=False).head(1)
-                latest_checkin_time = latest_checkin_record['CheckInTime'].iloc[0].strftime("%H:%M:%S") if not latest_checkin_record.empty else "-"
-                
-                # Tìm check-out gần nhất
-                latest_checkout_record = user_records.dropna(subset=['CheckOutTime']).sort_values(by='CheckOutTime', ascending=False).head(1)
-                latest_checkout_time = latest_checkout_record['CheckOutTime'].iloc[0].strftime("%H:%M:%S") if not latest_checkout_record.empty else "-"
-
-                # Lấy tên người dùng (sử dụng names mapping)
-                # Chuyển user_id_str trở lại numeric_id để tìm trong self.names
-                # Tìm key (numeric_id) trong id_mapping mà value là user_id_str
-                numeric_id = next((k for k, v in self.id_mapping.items() if v == user_id_str), None)
-                predicted_name = self.names.get(numeric_id, user_id_str) # Dùng user_id_str nếu không tìm thấy tên
-
-                self.latest_attendance[user_id_str] = {
-                    "Name": predicted_name,
-                    "CheckIn": latest_checkin_time,
-                    "CheckOut": latest_checkout_time
-                }
+        """Tải check-in/check-out trong ngày hôm nay của từng người từ trạng thái hôm nay (không đọc lịch sử)."""
+        self.latest_attendance = {}
+        for user_id_str, entry in get_today_attendance().items():
+            self.latest_attendance[user_id_str] = {
+                "Name": self._display_name(user_id_str, entry['Name'] or user_id_str),
+                "CheckIn": entry['CheckIn'][-8:] if entry['CheckIn'] else "-",
+                "CheckOut": entry['CheckOut'][-8:] if entry['CheckOut'] else "-"
+            }
+
+        # Các lượt chấm công hôm nay còn trong hàng đợi ghi nền (chưa có trong trạng thái hôm nay)
+        today = datetime.now().date()
+        for punch in get_pending_punches():
+            if punch['Timestamp'].date() != today:
+                continue
+            entry = self.latest_attendance.setdefault(punch['UserID'], {"Name": punch['Name'], "CheckIn": "-", "CheckOut": "-"})
+            if punch['CheckType'] == "Check-in":
+                entry["CheckIn"] = punch['Timestamp'].strftime("%H:%M:%S")
+            elif punch['CheckType'] == "Check-out":
+                entry["CheckOut"] = punch['Timestamp'].strftime("%H:%M:%S")
         self._update_attendance_table() # Cập nhật bảng sau khi tải dữ liệu ban đầu
 
+    def _schedule_day_rollover(self):
+        """Hẹn giờ làm mới bảng chấm công hôm nay ngay sau nửa đêm."""
+        now = datetime.now()
+        next_day = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        delay_ms = int((next_day - now).total_seconds() * 1000) + 1000
+        self.root.after(delay_ms, self._roll_over_day)
+
+    def _roll_over_day(self):
+        """Qua ngày mới: bảng chấm công hôm nay bắt đầu lại từ trạng thái (rỗng) của ngày mới."""
+        self._load_initial_latest_attendance()
+        self._schedule_day_rollover()
+
+    def _record_latest_punch(self, user_id_str, name, check_type, punch_time):
+        """Ghi một lượt vừa chấm công vào latest_attendance và vào lịch sử trong bộ nhớ (không đọc lại kho)."""
+        entry = self.latest_attendance.setdefault(user_id_str, {"Name": name, "CheckIn": "-", "CheckOut": "-"})
+        if check_type == "Check-in":
+            entry["CheckIn"] = punch_time.strftime("%H:%M:%S")
+        elif check_type == "Check-out":
+            entry["CheckOut"] = punch_time.strftime("%H:%M:%S")
+
+        punch = (user_id_str, name, check_type, punch_time)
+        if self._history_punches is not None:
+            self._history_punches.append(punch)
+        if self.history_attendance is not None:
+            self._apply_history_punch(self.history_attendance, *punch)
+
+    def _apply_history_punch(self, history, user_id_str, name, check_type, punch_time):
+        """Cập nhật check-in/check-out gần nhất của một người trong history nếu lượt này mới hơn."""
+        column = {"Check-in": "CheckIn", "Check-out": "CheckOut"}.get(check_type)
+        if column is None:
+            return
+        entry = history.setdefault(
+            user_id_str, {"Name": self._display_name(user_id_str, name), "CheckIn": "-", "CheckOut": "-"})
+        # Chuỗi TIME_FORMAT so sánh được như thời gian; áp lại cùng một lượt không đổi kết quả
+        punch_text = punch_time.strftime(TIME_FORMAT)
+        if entry[column] == "-" or entry[column] < punch_text:
+            entry[column] = punch_text
+
+    def toggle_history(self):
+        """Chuyển bảng giữa chấm công hôm nay và lịch sử (check-in/check-out gần nhất của mọi người, tải nền khi bật)."""
+        self.showing_history = not self.showing_history
+        if self.showing_history:
+            self.history_frame.config(text="Lịch sử chấm công gần nhất")
+            self.history_button.config(text="Chấm công hôm nay")
+            self._start_history_load()
+        else:
+            self.history_frame.config(text="Chấm công hôm nay")
+            self.history_button.config(text="Xem lịch sử")
+        self._update_attendance_table()
+
+    def _start_history_load(self):
+        """Tải lịch sử trong luồng nền (đọc chỉ mục trạng thái cần khóa kho, có thể chờ lâu khi đang ghi/nhập/lưu trữ)."""
+        if self._history_worker is not None and self._history_worker.is_alive():
+            return
+        if self.history_attendance is None:
+            self.history_frame.config(text="Lịch sử chấm công gần nhất (đang tải...)")
+        self._history_punches = []
+        self._history_results = queue.Queue()
+        self._history_worker = threading.Thread(target=self._load_history_attendance, name="kiosk-history", daemon=True)
+        # Luồng đọc kho của chi nhánh của tiến trình: đăng ký để use_site không đổi chi nhánh giữa lúc đang tải
+        start_background_thread(self._history_worker)
+        self.root.after(100, self._poll_history_load)
+
+    def _load_history_attendance(self):
+        """Chạy trong luồng nền: check-in/check-out gần nhất từ chỉ mục trạng thái, cộng các lượt còn trong hàng đợi."""
+        try:
+            history = {}
+            for user_id_str, state in get_user_states().items():
+                history[user_id_str] = {
+                    "Name": self._display_name(user_id_str, user_id_str),
+                    "CheckIn": state['LastCheckIn'] or "-",
+                    "CheckOut": state['LastCheckOut'] or "-"
+                }
+            for punch in get_pending_punches():
+                self._apply_history_punch(history, punch['UserID'], punch['Name'], punch['CheckType'], punch['Timestamp'])
+            self._history_results.put(('done', history))
+        except Exception as e:
+            self._history_results.put(('error', e))
+
+    def _poll_history_load(self):
+        """Đọc kết quả tải lịch sử từ luồng chính (Tk chỉ được cập nhật từ luồng chính)."""
+        try:
+            kind, value = self._history_results.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_history_load)
+            return
+        punches, self._history_punches = self._history_punches, None
+        if kind == 'error':
+            print(f"Lỗi khi tải lịch sử chấm công: {value}")
+            if self.showing_history:
+                self.history_frame.config(text="Lịch sử chấm công gần nhất (lỗi khi tải)")
+            return
+        for punch in punches:
+            self._apply_history_punch(value, *punch)
+        self.history_attendance = value
+        if self.showing_history:
+            self.history_frame.config(text="Lịch sử chấm công gần nhất")
+            self._update_attendance_table()
+
     def _update_attendance_table(self):
-        """Cập nhật Treeview với dữ liệu chấm công gần nhất."""
+        """Cập nhật Treeview với dữ liệu chấm công hôm nay (hoặc lịch sử khi đang xem lịch sử)."""
         # Xóa tất cả các mục hiện có trong bảng
         for item in self.attendance_table.get_children():
             self.attendance_table.delete(item)
 
-        # Thêm dữ liệu từ self.latest_attendance vào bảng
+        # Thêm dữ liệu từ self.latest_attendance (hoặc lịch sử) vào bảng
         # Sắp xếp theo tên cho dễ nhìn
-        sorted_items = sorted(self.latest_attendance.items(), key=lambda item: item[1]['Name'])
+        rows = (self.history_attendance or {}) if self.showing_history else self.latest_attendance
+        sorted_items = sorted(rows.items(), key=lambda item: item[1]['Name'])
         for user_id, data in sorted_items:
             self.attendance_table.insert("", tk.END, values=(data["Name"], data["CheckIn"], data["CheckOut"]))
 
@@ -354,8 +465,10 @@ class FaceRecognitionApp:
             if isinstance(widget, tk.Toplevel):
                 widget.destroy() 
         
-        from database.database_manager import save_attendance 
-        save_attendance() 
+        from database.database_manager import compact_attendance_journal 
+        stop_attendance_queue(timeout=10) # Ghi nốt các lượt chấm công còn trong hàng đợi
+        stop_attendance_sync(timeout=10) # Thử gửi nốt outbox lên kho trung tâm
+        compact_attendance_journal() # Gộp journal vào các phân vùng tháng trước khi thoát
         self.root.quit()
         self.root.destroy()
         print("Ứng dụng đã đóng.")
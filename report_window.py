@@ -3,9 +3,134 @@ from tkinter import ttk, messagebox, filedialog
 import pandas as pd
 from datetime import datetime
 import os
+import queue
+import threading
 
 # Import các hàm từ database_manager
-from database.database_manager import load_attendance, summarize_checkin_checkout
+from database.database_manager import (
+    get_attendance_summary, get_attendance_summary_all_sites, list_sites, start_background_thread, current_site, site_scope
+)
+from database.attendance_queue import flush_attendance_queue
+from database.attendance_export import (
+    export_chunks, iter_summary_export_chunks, iter_work_hours_export_chunks, iter_policy_export_chunks,
+    WORK_HOURS_PERIODS, ExportCancelled
+)
+
+# Lựa chọn "mọi chi nhánh" trong cửa sổ báo cáo, và tên hiển thị của chi nhánh mặc định (SITE_ID rỗng)
+ALL_SITES_LABEL = "Tất cả chi nhánh"
+DEFAULT_SITE_LABEL = "(mặc định)"
+
+EXPORT_FILE_TYPES = [("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("All files", "*.*")]
+
+def ask_export_path(title):
+    """Hộp thoại chọn file xuất (.xlsx/.csv/.parquet); trả về '' nếu người dùng hủy."""
+    return filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=EXPORT_FILE_TYPES, title=title)
+
+class ExportProgress:
+    """
+    Thanh tiến trình và nhãn trạng thái cho việc xuất file chạy nền trong một cửa sổ Tk.
+    Việc đọc/ghi chạy trong luồng riêng (export_chunks); luồng đó chỉ đẩy tiến độ vào hàng đợi,
+    giao diện đọc hàng đợi bằng after() vì Tk chỉ được cập nhật từ luồng chính.
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.frame = ttk.Frame(parent)
+        self.progress_bar = ttk.Progressbar(self.frame, mode='indeterminate', length=200)
+        self.status_label = ttk.Label(self.frame, text="")
+        self.cancel_button = ttk.Button(self.frame, text="Hủy", command=self.cancel)
+        self._events = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._worker = None
+        # Đóng cửa sổ khi đang xuất -> dừng luồng xuất (file dở dang bị xóa)
+        self.frame.bind("<Destroy>", lambda event: self._cancel_event.set())
+
+    def is_running(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self, file_path, make_chunks, total_rows=None, before_export=None):
+        """
+        Bắt đầu xuất ra file_path. make_chunks() tạo iterator các khối DataFrame (gọi trong luồng nền).
+        total_rows: tổng số dòng nếu biết trước (thanh tiến trình theo phần trăm), None = chỉ hiện số dòng đã ghi.
+        before_export: hàm gọi trong luồng nền trước khi đọc dữ liệu (ví dụ chờ hàng đợi ghi chấm công).
+        """
+        if self.is_running():
+            messagebox.showwarning("Cảnh báo", "Đang xuất một file khác, vui lòng chờ.", parent=self.parent)
+            return
+        self._cancel_event.clear()
+        self._events = queue.Queue()
+        if total_rows:
+            self.progress_bar.configure(mode='determinate', maximum=total_rows, value=0)
+        else:
+            self.progress_bar.configure(mode='indeterminate')
+            self.progress_bar.start(10)
+        self.status_label.configure(text=f"Đang xuất {os.path.basename(file_path)}...")
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        # Xếp trước các khung khác của cửa sổ để thanh tiến trình luôn có chỗ ở đáy cửa sổ
+        siblings = [widget for widget in self.parent.pack_slaves() if widget is not self.frame]
+        if siblings:
+            self.frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5, before=siblings[0])
+        else:
+            self.frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
+
+        # Luồng xuất đọc kho của chi nhánh mà cửa sổ đang dùng lúc bắt đầu, qua site_scope của chính nó
+        self._worker = threading.Thread(
+            target=self._run, args=(file_path, make_chunks, before_export, current_site()), name="report-export",
+            daemon=True)
+        # Đăng ký với database_manager: không đổi hẳn chi nhánh (use_site) khi đang xuất
+        start_background_thread(self._worker)
+        self.parent.after(100, self._poll, file_path, total_rows)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _run(self, file_path, make_chunks, before_export, site_id):
+        try:
+            if before_export is not None:
+                before_export()
+            with site_scope(site_id):
+                rows = export_chunks(make_chunks(), file_path,
+                                     progress_callback=lambda rows: self._events.put(('progress', rows)),
+                                     cancel_event=self._cancel_event)
+            self._events.put(('done', rows))
+        except ExportCancelled:
+            self._events.put(('cancelled', None))
+        except Exception as e:
+            self._events.put(('error', e))
+
+    def _poll(self, file_path, total_rows):
+        if not self.frame.winfo_exists():
+            return
+        finished = None
+        try:
+            while True:
+                kind, value = self._events.get_nowait()
+                if kind == 'progress':
+                    if total_rows:
+                        self.progress_bar.configure(value=value)
+                    self.status_label.configure(text=f"Đang xuất {os.path.basename(file_path)}: {value} dòng")
+                else:
+                    finished = (kind, value)
+                    break
+        except queue.Empty:
+            pass
+        if finished is None:
+            self.parent.after(100, self._poll, file_path, total_rows)
+            return
+
+        self.progress_bar.stop()
+        self.frame.pack_forget()
+        kind, value = finished
+        if kind == 'done' and value:
+            messagebox.showinfo("Thành công", f"Đã xuất {value} dòng thành công tại:\n{file_path}", parent=self.parent)
+        elif kind == 'done':
+            messagebox.showwarning("Cảnh báo", "Không có dữ liệu để xuất.", parent=self.parent)
+        elif kind == 'cancelled':
+            messagebox.showinfo("Thông báo", "Đã hủy xuất file.", parent=self.parent)
+        else:
+            messagebox.showerror("Lỗi", f"Không thể xuất báo cáo: {str(value)}", parent=self.parent)
 
 class ReportWindow:
     def __init__(self, master):
@@ -17,6 +142,19 @@ class ReportWindow:
         self.report_window.grab_set() # Chặn tương tác với cửa sổ chính
         self.report_window.transient(master) # Đặt cửa sổ chính là cha
 
+        # Chọn chi nhánh khi có nhiều chi nhánh: báo cáo của một chi nhánh hoặc gộp tất cả (thêm cột chi nhánh)
+        self.sites = list_sites()
+        self.site_labels = {(site_id or DEFAULT_SITE_LABEL): site_id for site_id in self.sites}
+        if len(self.sites) > 1:
+            site_frame = ttk.Frame(self.report_window, padding="10 10 10 0")
+            site_frame.pack(side=tk.TOP, fill=tk.X)
+            ttk.Label(site_frame, text="Chi nhánh:").pack(side=tk.LEFT, padx=5)
+            self.site_choice = ttk.Combobox(site_frame, values=[ALL_SITES_LABEL] + list(self.site_labels),
+                                            state="readonly", width=20)
+            self.site_choice.current(0)
+            self.site_choice.pack(side=tk.LEFT)
+            self.site_choice.bind("<<ComboboxSelected>>", lambda event: self._generate_report())
+
         # Khung chứa Treeview và Scrollbar
         tree_frame = ttk.Frame(self.report_window, padding="10")
         tree_frame.pack(fill=tk.BOTH, expand=True)
@@ -25,9 +163,10 @@ class ReportWindow:
         self.report_tree.pack(fill=tk.BOTH, expand=True)
 
         # Cấu hình Treeview
-        cols = ('ID', 'Name', 'TotalCheckIn', 'TotalCheckOut', 'AvgWorkDuration', 'Status')
+        cols = ('Site', 'ID', 'Name', 'TotalCheckIn', 'TotalCheckOut', 'AvgWorkDuration', 'Status')
         self.report_tree['columns'] = cols
         self.report_tree.column("#0", width=0, stretch=tk.NO)
+        self.report_tree.column("Site", anchor=tk.CENTER, width=100)
         self.report_tree.column("ID", anchor=tk.CENTER, width=80)
         self.report_tree.column("Name", anchor=tk.W, width=150)
         self.report_tree.column("TotalCheckIn", anchor=tk.CENTER, width=100)
@@ -36,12 +175,15 @@ class ReportWindow:
         self.report_tree.column("Status", anchor=tk.W, width=200)
 
         self.report_tree.heading("#0", text="")
+        self.report_tree.heading("Site", text="Chi nhánh")
         self.report_tree.heading("ID", text="Mã NV")
         self.report_tree.heading("Name", text="Tên")
         self.report_tree.heading("TotalCheckIn", text="Tổng Check-in")
         self.report_tree.heading("TotalCheckOut", text="Tổng Check-out")
         self.report_tree.heading("AvgWorkDuration", text="TG làm việc TB")
         self.report_tree.heading("Status", text="Trạng thái")
+        if len(self.sites) == 1:
+            self.report_tree['displaycolumns'] = cols[1:]
 
         # Scrollbar cho Treeview
         scrollbar_y = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.report_tree.yview)
@@ -55,7 +197,17 @@ class ReportWindow:
         # Nút xuất Excel
         export_button_frame = ttk.Frame(self.report_window, padding="10")
         export_button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
-        ttk.Button(export_button_frame, text="Xuất báo cáo Excel", command=self._export_report_to_excel).pack(pady=5)
+        ttk.Button(export_button_frame, text="Xuất báo cáo Excel", command=self._export_report_to_excel).pack(side=tk.LEFT, padx=5, pady=5)
+        # Xuất đi muộn/tăng ca theo người dùng và ngày, theo bảng quy định (config.ATTENDANCE_POLICY_FILE)
+        ttk.Button(export_button_frame, text="Xuất đi muộn/tăng ca", command=self._export_policy_report).pack(side=tk.LEFT, padx=5, pady=5)
+        # Xuất giờ công (tính lương) theo ngày/tuần/tháng từ bảng giờ công đã tổng hợp
+        ttk.Button(export_button_frame, text="Xuất giờ công", command=self._export_work_hours).pack(side=tk.RIGHT, padx=5, pady=5)
+        self.work_hours_period = ttk.Combobox(export_button_frame, values=list(WORK_HOURS_PERIODS.values()),
+                                              state="readonly", width=8)
+        self.work_hours_period.current(0)
+        self.work_hours_period.pack(side=tk.RIGHT, pady=5)
+        ttk.Label(export_button_frame, text="Giờ công theo:").pack(side=tk.RIGHT, padx=5, pady=5)
+        self.export_progress = ExportProgress(self.report_window)
         
         # ✅ Tự động tạo báo cáo khi cửa sổ mở
         self._generate_report()
@@ -65,23 +217,18 @@ class ReportWindow:
         for i in self.report_tree.get_children():
             self.report_tree.delete(i) # Xóa dữ liệu cũ
 
-        df_attendance = load_attendance()
-        if df_attendance.empty:
-            messagebox.showinfo("Thông báo", "Không có dữ liệu chấm công để tạo báo cáo.")
-            return
-
-        # Gọi hàm summarize_checkin_checkout từ database_manager
-        # Giả định summarize_checkin_checkout đã được sửa để hoạt động với toàn bộ df
-        df_summary = summarize_checkin_checkout(df_attendance)
-
+        # Lấy báo cáo từ các tổng theo người dùng được duy trì tăng dần (không quét lại toàn bộ dữ liệu)
+        flush_attendance_queue(timeout=5)
+        df_summary = self._summary()
         if df_summary.empty:
-            messagebox.showinfo("Thông báo", "Không có dữ liệu tổng hợp sau khi xử lý.")
+            messagebox.showinfo("Thông báo", "Không có dữ liệu chấm công để tạo báo cáo.")
             return
 
         for index, row in df_summary.iterrows():
             avg_duration_str = str(row['AvgWorkDuration']).split(' days')[-1].strip() if pd.notna(row['AvgWorkDuration']) else '-'
             
             self.report_tree.insert("", "end", values=(
+                row.get('SiteID', ''),
                 row['UserID'],
                 row['Name'],
                 row['TotalCheckIn'],
@@ -91,47 +238,49 @@ class ReportWindow:
             ))
         messagebox.showinfo("Báo cáo", f"Đã tạo báo cáo tổng hợp cho {len(df_summary)} người dùng.")
 
-    def _export_report_to_excel(self):
-        """Xuất báo cáo hiện tại ra file Excel."""
-        df_attendance = load_attendance()
-        if df_attendance.empty:
-            messagebox.showwarning("Cảnh báo", "Không có dữ liệu để xuất.")
-            return
-        
-        df_summary = summarize_checkin_checkout(df_attendance)
+    def _selected_sites(self):
+        """Các chi nhánh đang chọn, hoặc None nếu chỉ có một chi nhánh (báo cáo như trước, không có cột chi nhánh)."""
+        if len(self.sites) == 1:
+            return None
+        label = self.site_choice.get()
+        return self.sites if label == ALL_SITES_LABEL else [self.site_labels[label]]
+
+    def _summary(self):
+        sites = self._selected_sites()
+        return get_attendance_summary() if sites is None else get_attendance_summary_all_sites(sites)
 
+    def _start_export(self, file_path, make_chunks, total_rows=None):
+        """
+        Bắt đầu xuất file trong luồng nền: luồng đó đẩy hàng đợi ghi xuống kho rồi mới đọc, báo cáo gộp nhiều chi nhánh
+        được đọc lần lượt từng chi nhánh và ghi ra theo khối, giao diện không phải chờ.
+        """
+        self.export_progress.start(file_path, make_chunks, total_rows=total_rows,
+                                   before_export=lambda: flush_attendance_queue(timeout=5))
+
+    def _export_report_to_excel(self):
+        """Xuất báo cáo tổng hợp ra file Excel/CSV/Parquet (ghi theo luồng trong luồng nền)."""
+        df_summary = self._summary()
         if df_summary.empty:
-            messagebox.showwarning("Cảnh báo", "Không có dữ liệu tổng hợp để xuất.")
+            messagebox.showwarning("Cảnh báo", "Không có dữ liệu để xuất.")
             return
 
-        # Làm sạch cột thời gian để xuất Excel dễ hơn
-        df_summary_export = df_summary.copy()
-        df_summary_export['AvgWorkDuration'] = df_summary_export['AvgWorkDuration'].apply(
-            lambda x: str(x).split(' days')[-1].strip() if pd.notna(x) else '-'
-        )
-
-        df_summary_export = df_summary_export.rename(columns={
-            'UserID': 'Mã Nhân Viên',
-            'Name': 'Tên Nhân Viên',
-            'TotalCheckIn': 'Tổng số lần Check-in',
-            'TotalCheckOut': 'Tổng số lần Check-out',
-            'AvgWorkDuration': 'Thời gian làm việc trung bình',
-            'Status': 'Trạng thái chung' # Ví dụ: "Đi làm đầy đủ", "Thường xuyên đi muộn", v.v.
-        })
-        
-        cols_to_export = ['Mã Nhân Viên', 'Tên Nhân Viên', 'Tổng số lần Check-in', 
-                          'Tổng số lần Check-out', 'Thời gian làm việc trung bình', 'Trạng thái chung']
-        df_final_export = df_summary_export[cols_to_export]
+        file_path = ask_export_path("Lưu báo cáo tổng hợp chấm công")
+        if file_path:
+            sites = self._selected_sites()
+            self._start_export(file_path, lambda: iter_summary_export_chunks(sites=sites), total_rows=len(df_summary))
 
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-            title="Lưu báo cáo tổng hợp chấm công"
-        )
+    def _export_work_hours(self):
+        """Xuất giờ công theo người dùng và kỳ đã chọn (ngày/tuần/tháng) ra file Excel/CSV/Parquet."""
+        period_label = self.work_hours_period.get()
+        period = next(key for key, label in WORK_HOURS_PERIODS.items() if label == period_label)
+        file_path = ask_export_path(f"Lưu giờ công theo {period_label.lower()}")
+        if file_path:
+            sites = self._selected_sites()
+            self._start_export(file_path, lambda: iter_work_hours_export_chunks(period, sites=sites))
 
+    def _export_policy_report(self):
+        """Xuất đi muộn/tăng ca theo người dùng và ngày trên toàn bộ lịch sử ra file Excel/CSV/Parquet."""
+        file_path = ask_export_path("Lưu bảng đi muộn/tăng ca")
         if file_path:
-            try:
-                df_final_export.to_excel(file_path, index=False)
-                messagebox.showinfo("Thành công", f"Đã xuất báo cáo thành công tại:\n{file_path}")
-            except Exception as e:
-                messagebox.showerror("Lỗi", f"Không thể xuất báo cáo ra Excel: {str(e)}")
\ No newline at end of file
+            sites = self._selected_sites()
+            self._start_export(file_path, lambda: iter_policy_export_chunks(sites=sites))
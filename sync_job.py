@@ -0,0 +1,23 @@
+# sync_job.py
+# Đồng bộ lượt chấm công giữa kiosk và kho trung tâm (xem config.CENTRAL_STORE_DIR), ví dụ:
+#   trên kiosk (gửi ngay phần outbox chưa gửi):   python sync_job.py --push
+#   trên máy trung tâm (cron / Task Scheduler):   python sync_job.py --merge
+import argparse
+
+import config
+from database.database_manager import sync_attendance_outbox, merge_attendance_inbox, fan_out_sites
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đồng bộ dữ liệu chấm công kiosk - kho trung tâm")
+    parser.add_argument('--push', action='store_true', help="Gửi outbox của kiosk này lên kho trung tâm")
+    parser.add_argument('--merge', action='store_true', help="Gộp inbox của mọi chi nhánh vào kho (chạy trên máy trung tâm)")
+    parser.add_argument('--central', default=config.CENTRAL_STORE_DIR,
+                        help="Thư mục kho trung tâm khi --push (mặc định config.CENTRAL_STORE_DIR)")
+    args = parser.parse_args()
+    if not args.push and not args.merge:
+        parser.error("Chọn --push và/hoặc --merge")
+    if args.push:
+        sync_attendance_outbox(args.central)
+    if args.merge:
+        for site_id, stats in fan_out_sites(merge_attendance_inbox):
+            print(f"Chi nhánh '{site_id}': gộp {stats['merged']} lượt từ {stats['batches']} lô")
@@ -3,6 +3,7 @@ import numpy as np
 import os
 from PIL import Image
 import config
+from utils.file_lock import FileLock
 
 # Hàm tải bộ phát hiện khuôn mặt
 def load_face_detector():
@@ -63,13 +64,27 @@ def load_id_mapping():
     print(f"Đã tải ID Mapping: {id_mapping}")
     return id_mapping
 
+# Khóa file id_mapping.txt giữa các tiến trình (admin sửa/xóa người dùng, huấn luyện model)
+_id_mapping_lock = FileLock(config.ID_MAPPING_LOCK_FILE)
+
+def id_mapping_lock():
+    """
+    Khóa dùng cho thao tác đọc - sửa - ghi id_mapping.txt:
+        with id_mapping_lock():
+            mapping = load_id_mapping(); ...; save_id_mapping(mapping)
+    """
+    return _id_mapping_lock
+
 # Hàm lưu ánh xạ ID
 def save_id_mapping(id_map):
-    """Lưu ánh xạ ID vào file."""
+    """Lưu ánh xạ ID vào file (ghi file tạm rồi thay thế, trong khóa id_mapping_lock)."""
     os.makedirs(os.path.dirname(config.ID_MAPPING_FILE), exist_ok=True)
-    with open(config.ID_MAPPING_FILE, 'w') as f:
-        for numeric_id, original_id_name in id_map.items():
-            f.write(f"{numeric_id}:{original_id_name}\n")
+    with _id_mapping_lock:
+        tmp_file = config.ID_MAPPING_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            for numeric_id, original_id_name in id_map.items():
+                f.write(f"{numeric_id}:{original_id_name}\n")
+        os.replace(tmp_file, config.ID_MAPPING_FILE)
     print(f"Đã lưu ID mapping vào {config.ID_MAPPING_FILE}")
 
 # Hàm lấy ảnh và nhãn từ dataset (đã điều chỉnh để đọc từ User.ID_Name.idx.jpg)
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """
+    Khóa độc quyền giữa các tiến trình (kiosk main_app.py, admin_app.py...) dựa trên một file khóa.
+    Dùng được lồng nhau trong cùng tiến trình (reentrant) và an toàn giữa các luồng.
+    Hệ điều hành tự nhả khóa khi tiến trình giữ khóa bị tắt đột ngột.
+
+        with FileLock(path + '.lock'):
+            ... đọc - sửa - ghi file ...
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = self._open_and_lock()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            lock_file, self._file = self._file, None
+            _unlock_file(lock_file)
+            lock_file.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def _open_and_lock(self):
+        lock_dir = os.path.dirname(self.lock_path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            _lock_file(lock_file)
+        except BaseException:
+            lock_file.close()
+            raise
+        return lock_file
+
+def _lock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return
+    # msvcrt chỉ có khóa không chờ (hoặc chờ tối đa 10 giây) -> thử lại cho tới khi được
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(0.005)
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)